@@ -0,0 +1,69 @@
+import json
+import re
+import statistics
+import subprocess
+import sys
+
+from cases import ROOT
+
+"""
+Measures the cost of 'import urm' with 'python -X importtime', in fresh interpreters, and checks that
+it loads none of the heavy optional dependencies: the web stack of the GUI, NumPy and multiprocessing
+are only imported once 'urm.gui', 'urm.forward_batch' or 'urm.parallel' is used.
+
+Run directly, it exits with status 1 if one of them is imported, so that a regression is noticed.
+"""
+
+# Modules 'import urm' must not load.
+FORBIDDEN = ('fastapi', 'starlette', 'pydantic', 'uvicorn', 'click', 'numpy', 'multiprocessing',
+             'concurrent.futures')
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def import_profile(statement="import urm"):
+    """
+    The cumulative import time of every module imported by 'statement', in microseconds.
+    """
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], cwd=ROOT, capture_output=True,
+                            text=True, check=True).stderr
+    modules = {}
+    for match in _LINE.finditer(output):
+        modules[match.group(4)] = int(match.group(2))
+    return modules
+
+
+def run_import_benchmark(repeats=5, verbose=True):
+    """
+    The import time of 'urm' and of its heaviest children, as a JSON-serialisable dictionary.
+    """
+    baseline = set(import_profile("pass"))
+    profiles = [import_profile() for _ in range(repeats)]
+    loaded = set(profiles[0]) - baseline
+    record = {
+        "urm_us": statistics.median(profile["urm"] for profile in profiles),
+        "modules": len(loaded),
+        "submodules_us": {name: statistics.median(profile.get(name, 0) for profile in profiles)
+                          for name in sorted(loaded) if name.startswith("urm.")},
+        "forbidden_loaded": sorted(name for name in FORBIDDEN if name in loaded),
+    }
+    if verbose:
+        print(f"import urm: {record['urm_us'] / 1000:.1f} ms, {record['modules']} modules")
+        for name, us in sorted(record["submodules_us"].items(), key=lambda item: -item[1]):
+            print(f"  {name:<24}{us / 1000:>8.1f} ms")
+        if record["forbidden_loaded"]:
+            print(f"  loaded by 'import urm': {', '.join(record['forbidden_loaded'])}")
+    return record
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Measure the import time of the urm package.")
+    parser.add_argument("-o", "--output", help="JSON file to write")
+    args = parser.parse_args()
+    result = run_import_benchmark()
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"import": result}, f, indent=2)
+    sys.exit(1 if result["forbidden_loaded"] else 0)
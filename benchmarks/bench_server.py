@@ -0,0 +1,101 @@
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import time
+
+import httpx
+
+from cases import PROGRAMS_DIR
+
+"""
+An in-process load test of the GUI server: the FastAPI app is called through httpx's ASGI transport,
+with no network in between, by a number of concurrent clients. Each scenario reports the requests
+per second and the latency percentiles.
+
+Requests to '/run_urm_program' use distinct input registers, so that they miss the server's result
+cache, except in the "cached" scenario, which repeats one request.
+"""
+
+
+def _program(name):
+    with open(os.path.join(PROGRAMS_DIR, f"{name}.json")) as f:
+        program = json.load(f)
+    program["safetyLimit"] = 10 ** 7
+    return program
+
+
+def _scenarios(size):
+    add = _program("Add")
+    mul = _program("Mul")
+    return {
+        "run_urm_program": ("/run_urm_program", lambda i: {"program": add, "initialRegisters": [0, size, i, 0]}),
+        "run_urm_program-cached": ("/run_urm_program", lambda i: {"program": add, "initialRegisters": [0, size, 0, 0]}),
+        "run_urm_program-mul": ("/run_urm_program", lambda i: {"program": mul, "initialRegisters": [0, 10, 10 + i % 50, 0, 0, 0]}),
+        "profile_urm_program": ("/profile_urm_program", lambda i: {"program": add, "initialRegisters": [0, size, i, 0]}),
+        "get_max_register": ("/get_max_register", lambda i: add),
+    }
+
+
+async def _client_loop(client, path, body, indices, latencies):
+    for i in indices:
+        t1 = time.perf_counter()
+        response = await client.post(path, json=body(i))
+        latencies.append(time.perf_counter() - t1)
+        payload = response.json()
+        if response.status_code != 200 or "error" in payload:
+            raise RuntimeError(f"{path} failed: {payload}")
+
+
+async def _load(app, path, body, requests, concurrency):
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        t1 = time.perf_counter()
+        await asyncio.gather(*(_client_loop(client, path, body, range(k, requests, concurrency), latencies)
+                               for k in range(concurrency)))
+        elapsed = time.perf_counter() - t1
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "elapsed_s": elapsed,
+        "requests_per_s": requests / elapsed,
+        "latency_p50_s": statistics.median(latencies),
+        "latency_p95_s": latencies[int(0.95 * (len(latencies) - 1))],
+        "latency_max_s": latencies[-1],
+    }
+
+
+def run_load_test(requests=200, concurrency=(1, 8, 32), size=100, verbose=True):
+    """
+    The load test results of every scenario at every concurrency, as JSON-serialisable dictionaries.
+    """
+    # The server prints every request it handles; that output is not part of what is measured.
+    with contextlib.redirect_stdout(io.StringIO()):
+        from urm.gui.server import app, result_cache
+    records = []
+    for scenario, (path, body) in _scenarios(size).items():
+        for clients in concurrency:
+            result_cache.clear()
+            with contextlib.redirect_stdout(io.StringIO()):
+                record = asyncio.run(_load(app, path, body, requests, clients))
+            record = {"scenario": scenario, "endpoint": path, **record}
+            records.append(record)
+            if verbose:
+                print(f"{scenario:<26}{clients:>4} clients{record['requests_per_s']:>10.1f} req/s"
+                      f"{record['latency_p50_s'] * 1000:>10.2f} ms p50{record['latency_p95_s'] * 1000:>10.2f} ms p95")
+    return records
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Load test the URM GUI server in-process.")
+    parser.add_argument("-o", "--output", default="bench_server.json", help="JSON file to write")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario and concurrency")
+    args = parser.parse_args()
+    with open(args.output, "w") as f:
+        json.dump({"server": run_load_test(requests=args.requests)}, f, indent=2)
@@ -0,0 +1,126 @@
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+# 'cases' puts the repository root on the path, so it is imported first.
+from cases import load_cases
+import urm
+
+"""
+Measures every execution mode of the simulator on every benchmark case: the best and mean wall-clock
+time over a few repeats, the steps per second, the peak memory allocated during a run (measured in a
+separate run with 'tracemalloc', which slows execution down) and the size of the trace it keeps.
+
+All modes must agree on the final registers and the number of steps.
+"""
+
+SAFETY_COUNT = 10 ** 9
+
+
+def _forward(trace):
+    def execute(case, compiled):
+        return urm.forward(case.param, case.registers(), case.instructions, safety_count=SAFETY_COUNT, trace=trace())
+    return execute
+
+
+def _run(**kwargs):
+    def execute(case, compiled):
+        return urm.run(case.param, case.registers(), case.instructions, safety_count=SAFETY_COUNT, **kwargs)
+    return execute
+
+
+def _python(case, compiled):
+    return compiled(case.param, case.registers(), safety_count=SAFETY_COUNT)
+
+
+# Execution modes, by name.
+MODES = {
+    'forward': _forward(lambda: "full"),
+    'forward-none': _forward(lambda: "none"),
+    'forward-delta': _forward(urm.trace.delta),
+    'run': _run(),
+    'run-accelerated': _run(accelerate=True),
+    'python': _python,
+}
+
+
+def trace_bytes(result):
+    """
+    The size of what the run keeps of its steps: the JSON the GUI server would send for a full trace,
+    the file a delta trace is saved to, and nothing for the other modes.
+    """
+    if isinstance(result.trace, urm.trace.DeltaTrace):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "trace.urmd")
+            result.trace.save(path)
+            return os.path.getsize(path)
+    if result.trace is None or not len(result.trace.entries):
+        return 0
+    return len(json.dumps({"registers_from_steps": [registers.registers for registers in result.registers_from_steps],
+                           "ops_from_steps": list(result.ops_from_steps)}))
+
+
+def measure(case, mode, repeats=3):
+    execute = MODES[mode]
+    compiled = urm.compile_to_python(case.instructions) if mode == 'python' else None
+    times = []
+    for _ in range(repeats):
+        t1 = time.perf_counter()
+        result = execute(case, compiled)
+        times.append(time.perf_counter() - t1)
+    tracemalloc.start()
+    try:
+        execute(case, compiled)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    best = min(times)
+    return result, {
+        "case": case.id,
+        "program": case.name,
+        "source": case.source,
+        "size": case.size,
+        "mode": mode,
+        "steps": result.num_of_steps,
+        "best_s": best,
+        "mean_s": sum(times) / len(times),
+        "steps_per_s": result.num_of_steps / best if best > 0 else None,
+        "peak_memory_bytes": peak,
+        "trace_entries": len(result.trace.entries) if result.trace is not None else 0,
+        "trace_bytes": trace_bytes(result),
+    }
+
+
+def run_benchmarks(quick=False, repeats=3, modes=None, names=None, verbose=True):
+    """
+    The measurements of every mode on every case, as a list of JSON-serialisable dictionaries.
+    """
+    records = []
+    for case in load_cases(quick=quick, names=names):
+        reference = None
+        for mode in modes or MODES:
+            result, record = measure(case, mode, repeats)
+            outcome = (result.num_of_steps, result.last_registers.registers)
+            if reference is None:
+                reference = outcome
+            assert outcome == reference, f"{mode} disagrees on {case.id}"
+            records.append(record)
+            if verbose:
+                print(f"{case.id:<28}{mode:<17}{record['steps']:>10}{record['best_s']:>11.4f}s"
+                      f"{record['steps_per_s'] or 0:>14.0f} steps/s{record['peak_memory_bytes'] / 1024:>11.0f} KiB"
+                      f"{record['trace_bytes'] / 1024:>11.0f} KiB trace")
+    return records
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the URM simulator's execution modes.")
+    parser.add_argument("-o", "--output", default="bench_simulator.json", help="JSON file to write")
+    parser.add_argument("--quick", action="store_true", help="Only the smallest input size of each program")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    with open(args.output, "w") as f:
+        json.dump({"simulator": run_benchmarks(quick=args.quick, repeats=args.repeats)}, f, indent=2)
@@ -0,0 +1,119 @@
+import glob
+import importlib
+import json
+import os
+import sys
+
+# The benchmarks measure the checkout they are in, whether or not 'urm' is installed.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import urm
+
+"""
+The programs the benchmarks run: the ones shipped with the GUI in 'urm/gui/programs/*.json' and
+the ones defined in 'example/*.py', each with its input registers for a range of input sizes.
+"""
+
+PROGRAMS_DIR = os.path.join(ROOT, "urm", "gui", "programs")
+EXAMPLES_DIR = os.path.join(ROOT, "example")
+
+
+def _two(n):
+    return {1: n, 2: n}
+
+
+# Input registers of each program for an input size n, by the lower-cased name of its file.
+INPUTS = {
+    'add': _two,
+    'plus': _two,
+    'mul': _two,
+    'fibb': lambda n: {1: n},
+    'minus': lambda n: {1: 2 * n, 2: n},
+    'greaterthan': lambda n: {1: n + 1, 2: n},
+    'gt': lambda n: {1: n + 1, 2: n},
+    'pred': lambda n: {1: n},
+    'pred_vit': lambda n: {1: n},
+}
+
+# Input sizes, chosen so that the largest run of each program takes roughly 10^4 to 10^5 steps.
+SIZES = {
+    'mul': (10, 50, 150),
+    'fibb': (10, 15, 20),
+    'minus': (10, 30, 100),
+    'greaterthan': (10, 30, 100),
+    'gt': (10, 30, 100),
+}
+DEFAULT_SIZES = (100, 1000, 10000)
+
+
+class Case(object):
+    """
+    One program run on one input size.
+    """
+
+    def __init__(self, source, name, instructions, size):
+        self.source = source  # "gui" or "example"
+        self.name = name
+        self.instructions = instructions
+        self.size = size
+        self.param = INPUTS[name](size)
+        self.num_registers = max(urm.haddr(instructions) + 1, max(self.param) + 1)
+
+    @property
+    def id(self):
+        return f"{self.source}/{self.name}[{self.size}]"
+
+    def registers(self):
+        return urm.allocate(self.num_registers)
+
+
+def gui_programs():
+    """
+    The programs of 'urm/gui/programs', by name.
+    """
+    from urm.gui.urm_dec import build_urm_program_from_data
+
+    programs = {}
+    for path in sorted(glob.glob(os.path.join(PROGRAMS_DIR, "*.json"))):
+        with open(path) as f:
+            instructions, _ = build_urm_program_from_data(json.load(f))
+        programs[os.path.splitext(os.path.basename(path))[0].lower()] = instructions
+    return programs
+
+
+def example_programs():
+    """
+    The programs defined at the top level of the modules in 'example', by module name.
+    """
+    if EXAMPLES_DIR not in sys.path:
+        sys.path.insert(0, EXAMPLES_DIR)
+    programs = {}
+    for path in sorted(glob.glob(os.path.join(EXAMPLES_DIR, "*.py"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        if name not in INPUTS:
+            continue
+        module = importlib.import_module(name)
+        for value in vars(module).values():
+            if isinstance(value, urm.Instructions):
+                programs[name] = value
+                break
+    return programs
+
+
+def load_cases(quick=False, names=None):
+    """
+    Every benchmark case, the smallest size only with 'quick'.
+
+    :param names: If given, only the programs with these lower-cased names.
+    """
+    cases = []
+    for source, programs in (("gui", gui_programs()), ("example", example_programs())):
+        for name, instructions in programs.items():
+            if name not in INPUTS or (names and name not in names):
+                continue
+            sizes = SIZES.get(name, DEFAULT_SIZES)
+            for size in sizes[:1] if quick else sizes:
+                cases.append(Case(source, name, instructions, size))
+    return cases
@@ -0,0 +1,80 @@
+import datetime
+import json
+import platform
+import subprocess
+import sys
+
+from bench_import import run_import_benchmark
+from bench_simulator import run_benchmarks
+from bench_server import run_load_test
+from cases import ROOT
+
+"""
+Runs the import-time check, the simulator benchmarks and the server load test and writes their
+results to one JSON file, e.g. from the repository root:
+
+    python benchmarks/run_all.py -o results.json
+    python benchmarks/run_all.py -o new.json --compare results.json
+
+With '--compare', every measurement is printed next to the one of an earlier results file, with
+the ratio of the two; a ratio above 1 means the new run is faster.
+"""
+
+
+def metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+    }
+
+
+def compare(new, old):
+    """
+    Print the throughput of every measurement of 'new' found in 'old', with the ratio of the two.
+    """
+    keyed = {(record["case"], record["mode"]): record for record in old.get("simulator", [])}
+    print(f"{'Case':<28}{'Mode':<17}{'old steps/s':>14}{'new steps/s':>14}{'Ratio':>8}")
+    for record in new.get("simulator", []):
+        before = keyed.get((record["case"], record["mode"]))
+        if before and before["steps_per_s"] and record["steps_per_s"]:
+            print(f"{record['case']:<28}{record['mode']:<17}{before['steps_per_s']:>14.0f}"
+                  f"{record['steps_per_s']:>14.0f}{record['steps_per_s'] / before['steps_per_s']:>7.2f}x")
+    keyed = {(record["scenario"], record["concurrency"]): record for record in old.get("server", [])}
+    print(f"{'Scenario':<28}{'Clients':>8}{'old req/s':>14}{'new req/s':>14}{'Ratio':>8}")
+    for record in new.get("server", []):
+        before = keyed.get((record["scenario"], record["concurrency"]))
+        if before:
+            print(f"{record['scenario']:<28}{record['concurrency']:>8}{before['requests_per_s']:>14.1f}"
+                  f"{record['requests_per_s']:>14.1f}{record['requests_per_s'] / before['requests_per_s']:>7.2f}x")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the URM benchmark suite.")
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="JSON file to write")
+    parser.add_argument("--quick", action="store_true", help="Smallest input sizes, one repeat, fewer requests")
+    parser.add_argument("--no-server", action="store_true", help="Skip the server load test")
+    parser.add_argument("--compare", help="An earlier results file to compare with")
+    args = parser.parse_args()
+
+    results = {"meta": metadata(), "import": run_import_benchmark()}
+    results["simulator"] = run_benchmarks(quick=args.quick, repeats=1 if args.quick else 3)
+    if not args.no_server:
+        results["server"] = run_load_test(requests=50 if args.quick else 200)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    if results["import"]["forbidden_loaded"]:
+        sys.exit(1)
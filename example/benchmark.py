@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+
+# Run from a checkout, the package is imported from it rather than from an install.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import urm
+from plus import add_instruct
+from mul import mul_instruct
+from fibb import fibb_instructions
+from minus import sub_instruct
+from gt import gt_instruct
+
+"""
+Compares the traced simulator ('urm.forward') with the fast path ('urm.run') on the example programs,
+with and without counting-loop acceleration, and with the programs compiled to Python functions by
+'urm.compile_to_python' (compiled once, before timing).
+
+All modes must agree on the final registers and the number of steps; the fast path only skips
+the per-step register copies and op strings.
+"""
+
+# (name, instructions, input registers, safety count)
+cases = [
+    ('add', add_instruct, {1: 3000, 2: 4000}, 100000),
+    ('mul', mul_instruct, {1: 60, 2: 70}, 100000),
+    ('fibb', fibb_instructions, {1: 18}, 100000),
+    ('sub', sub_instruct, {1: 300, 2: 120}, 1000000),
+    ('gt', gt_instruct, {1: 40, 2: 39}, 100000),
+]
+
+
+def timed(fn, *args, **kwargs):
+    t1 = time.perf_counter()
+    res = fn(*args, **kwargs)
+    return res, time.perf_counter() - t1
+
+
+if __name__ == '__main__':
+    print(f"{'Program':<8}{'Steps':>10}{'forward (s)':>14}{'run (s)':>12}{'Speedup':>10}"
+          f"{'accelerated (s)':>18}{'Speedup':>10}{'python (s)':>13}{'Speedup':>10}")
+    for name, instructions, input_nodes, safety_count in cases:
+        registers = urm.allocate(urm.haddr(instructions) + 1)
+        traced, t_traced = timed(urm.forward, input_nodes, registers, instructions, safety_count=safety_count)
+        fast, t_fast = timed(urm.run, input_nodes, registers, instructions, safety_count=safety_count)
+        accelerated, t_accelerated = timed(urm.run, input_nodes, registers, instructions,
+                                           safety_count=safety_count, accelerate=True)
+        program = urm.compile_to_python(instructions)
+        compiled, t_compiled = timed(program, input_nodes, registers, safety_count=safety_count)
+        for res in (fast, accelerated, compiled):
+            assert traced.num_of_steps == res.num_of_steps
+            assert traced.last_registers.registers == res.last_registers.registers
+        print(f"{name:<8}{fast.num_of_steps:>10}{t_traced:>14.3f}{t_fast:>12.3f}{t_traced / t_fast:>9.1f}x"
+              f"{t_accelerated:>18.4f}{t_traced / t_accelerated:>9.1f}x"
+              f"{t_compiled:>13.4f}{t_traced / t_compiled:>9.1f}x")
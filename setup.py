@@ -20,8 +20,12 @@ setup(
     install_requires=[
         'fastapi',
         'uvicorn',
+        'websockets',
         'click',
     ],
+    extras_require={
+        'batch': ['numpy'],
+    },
     python_requires='>=3.7',
     zip_safe=False,
     entry_points="""
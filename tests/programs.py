@@ -0,0 +1,78 @@
+"""
+Programs shared by the tests: the ones shipped with the GUI and random ones, for differential tests
+of the executors against 'forward'.
+"""
+
+import glob
+import json
+import os
+import random
+
+import urm
+
+PROGRAMS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "urm", "gui", "programs")
+
+# Inputs of each shipped program, by name.
+INPUTS = {
+    'Add': [{1: a, 2: b} for a in range(4) for b in range(4)],
+    'Mul': [{1: a, 2: b} for a in range(4) for b in range(4)],
+    'Minus': [{1: a, 2: b} for a in range(5) for b in range(a + 1)],
+    'GreaterThan': [{1: a, 2: b} for a in range(4) for b in range(4)],
+    'Pred': [{1: a} for a in range(5)],
+    'Fibb': [{1: a} for a in range(7)],
+}
+
+
+def shipped_programs():
+    """
+    (name, instructions, inputs) for every program in 'urm/gui/programs'.
+    """
+    programs = []
+    for path in sorted(glob.glob(os.path.join(PROGRAMS_DIR, "*.json"))):
+        name = os.path.basename(path)[:-len(".json")]
+        with open(path) as f:
+            data = json.load(f)
+        instructions = urm.Instructions(*[(item["operator"], *item["params"]) for item in data["instructions"]])
+        programs.append((name, instructions, INPUTS.get(name, [{}])))
+    return programs
+
+
+def random_program(rng: random.Random, registers: int = 4) -> urm.Instructions:
+    """
+    A program of up to 8 Z, S, C and J instructions on 'registers' registers, with jump targets
+    anywhere from 0 to past the END line.
+    """
+    n = rng.randint(1, 8)
+    instructions = []
+    for _ in range(n):
+        op = rng.choice('ZSCJJ')
+        if op in 'ZS':
+            instructions.append((op, rng.randrange(registers)))
+        elif op == 'C':
+            instructions.append((op, rng.randrange(registers), rng.randrange(registers)))
+        else:
+            instructions.append((op, rng.randrange(registers), rng.randrange(registers), rng.randint(0, n + 2)))
+    return urm.Instructions(*instructions)
+
+
+def random_cases(count: int, seed: int = 0, registers: int = 4):
+    """
+    'count' (instructions, param) pairs, from a fixed seed.
+    """
+    rng = random.Random(seed)
+    return [(random_program(rng, registers), {r: rng.randrange(4) for r in range(registers)}) for _ in range(count)]
+
+
+def outcome(execute, *args, **kwargs):
+    """
+    What a run gives, to compare executors: its step count and final registers, or the class of the
+    exception it raised, with the step count of an exceeded safety count.
+    """
+    try:
+        result = execute(*args, **kwargs)
+    except urm.SafetyLimitExceeded as e:
+        return "exceeded", e.num_of_steps
+    except (ValueError, RuntimeError) as e:
+        return "error", type(e).__name__
+    last = result.last_registers
+    return result.num_of_steps, None if last is None else list(last.registers)
@@ -0,0 +1,31 @@
+import pytest
+
+import urm
+from programs import outcome, random_cases, shipped_programs
+
+
+@pytest.mark.parametrize("name, instructions, inputs", shipped_programs())
+def test_compiled_run_matches_forward_on_shipped_programs(name, instructions, inputs):
+    compiled = urm.analyze(instructions)
+    assert compiled.halts
+    registers = urm.Registers.allocate(instructions.haddr() + 1)
+    for param in inputs:
+        assert outcome(compiled.run, param, registers, safety_count=10000) == \
+            outcome(urm.forward, param, registers, instructions, safety_count=10000)
+
+
+def test_compiled_run_matches_forward_on_random_programs():
+    for instructions, param in random_cases(500, seed=4):
+        registers = urm.Registers.allocate(4)
+        assert outcome(urm.analyze(instructions).run, param, registers, safety_count=200) == \
+            outcome(urm.forward, param, registers, instructions, safety_count=200)
+
+
+def test_infinite_loops_and_unreachable_lines():
+    compiled = urm.analyze(urm.Instructions(('S', 0), ('J', 0, 0, 2), ('S', 1)))
+    assert not compiled.halts
+    assert compiled.infinite_loops == ((1,),)
+    assert compiled.unreachable == (2,)
+    with pytest.raises(urm.SafetyLimitExceeded) as info:
+        compiled.run(None, urm.Registers.allocate(2), safety_count=100)
+    assert info.value.num_of_steps == 101
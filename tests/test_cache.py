@@ -0,0 +1,93 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import urm
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# R1 + R2 into R1.
+ADD = urm.Instructions(('J', 3, 2, 5), ('S', 1), ('S', 3), ('J', 1, 1, 1))
+
+
+def test_hits_are_equal_and_independent():
+    cache = urm.ResultCache()
+    first = cache.forward({1: 3, 2: 4}, urm.Registers.allocate(4), ADD)
+    second = cache.forward({1: 3, 2: 4}, urm.Registers.allocate(4), ADD)
+    assert cache.stats()["hits"] == 1
+    plain = urm.forward({1: 3, 2: 4}, urm.Registers.allocate(4), ADD)
+    assert second.num_of_steps == plain.num_of_steps
+    assert [r.registers for r in second.registers_from_steps] == [r.registers for r in plain.registers_from_steps]
+    assert list(second.ops_from_steps) == list(plain.ops_from_steps)
+    # Modifying a result leaves the cache as it was.
+    first.last_registers[1] = 100
+    second.registers_from_steps[0][1] = 100
+    third = cache.forward({1: 3, 2: 4}, urm.Registers.allocate(4), ADD)
+    assert third.last_registers.registers == plain.last_registers.registers
+    assert third.registers_from_steps[0].registers == plain.registers_from_steps[0].registers
+
+
+def test_forward_accepts_no_trace():
+    cache = urm.ResultCache()
+    result = cache.forward({1: 3, 2: 4}, urm.Registers.allocate(4), ADD, trace=None)
+    assert result.last_registers.registers == [0, 7, 4, 4]
+    with pytest.raises(ValueError):
+        cache.forward({1: 3, 2: 4}, urm.Registers.allocate(4), ADD, trace="delta")
+
+
+def test_exceeded_runs_are_cached_with_the_plain_step_count():
+    cache = urm.ResultCache()
+    for accelerate in (True, False, True):
+        with pytest.raises(urm.SafetyLimitExceeded) as info:
+            cache.run({1: 3, 2: 10 ** 6}, urm.Registers.allocate(4), ADD, safety_count=1000, accelerate=accelerate)
+        assert info.value.num_of_steps == 1001
+    assert cache.stats()["hits"] == 1
+
+
+def test_run_keeps_sparse_registers():
+    cache = urm.ResultCache()
+    for _ in range(2):
+        result = cache.run({1: 3, 2: 4}, urm.SparseRegisters(), ADD)
+        plain = urm.run({1: 3, 2: 4}, urm.SparseRegisters(), ADD)
+        assert isinstance(result.last_registers, urm.SparseRegisters)
+        assert result.last_registers.values == plain.last_registers.values
+        assert result.num_of_steps == plain.num_of_steps
+    assert cache.stats()["hits"] == 1
+
+
+def test_entries_survive_a_new_process(tmp_path):
+    script = (
+        "import sys, urm\n"
+        "cache = urm.ResultCache(path=sys.argv[1])\n"
+        "add = urm.Instructions(('J', 3, 2, 5), ('S', 1), ('S', 3), ('J', 1, 1, 1))\n"
+        "cache.forward({1: 3, 2: 4}, urm.Registers.allocate(4), add)\n"
+        "cache.run({1: 3, 2: 4}, urm.Registers.allocate(4), add)\n"
+    )
+    subprocess.run([sys.executable, "-c", script, str(tmp_path)], cwd=ROOT, check=True)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+    cache = urm.ResultCache(path=str(tmp_path))
+    traced = cache.forward({1: 3, 2: 4}, urm.Registers.allocate(4), ADD)
+    fast = cache.run({1: 3, 2: 4}, urm.Registers.allocate(4), ADD)
+    assert cache.stats()["hits"] == 2
+    plain = urm.forward({1: 3, 2: 4}, urm.Registers.allocate(4), ADD)
+    assert list(traced.ops_from_steps) == list(plain.ops_from_steps)
+    assert fast.last_registers.registers == plain.last_registers.registers == [0, 7, 4, 4]
+
+
+def test_unreadable_file_is_a_miss(tmp_path):
+    cache = urm.ResultCache(path=str(tmp_path))
+    cache.run({1: 3, 2: 4}, urm.Registers.allocate(4), ADD)
+    [name] = os.listdir(tmp_path)
+    # As left by a write cut short.
+    with open(tmp_path / name, 'w') as f:
+        f.write('["ok", 1')
+    cache = urm.ResultCache(path=str(tmp_path))
+    result = cache.run({1: 3, 2: 4}, urm.Registers.allocate(4), ADD)
+    assert result.last_registers.registers == [0, 7, 4, 4]
+    assert cache.stats()["misses"] == 1
+    # Written again, whole.
+    cache = urm.ResultCache(path=str(tmp_path))
+    cache.run({1: 3, 2: 4}, urm.Registers.allocate(4), ADD)
+    assert cache.stats()["hits"] == 1
@@ -0,0 +1,97 @@
+import pytest
+
+import urm
+from programs import shipped_programs
+
+# Counts R0 up to R1.
+COUNT = urm.Instructions(('J', 0, 1, 4), ('S', 0), ('J', 0, 0, 1))
+
+
+class Recorder(urm.Checkpointer):
+    """
+    A Checkpointer saving on every check and keeping every checkpoint it saved.
+    """
+
+    def __init__(self, path, instructions, safety_count, interval):
+        super().__init__(path, instructions, safety_count=safety_count, every=0, interval=interval)
+        self.saved = []
+
+    def save(self, num_of_steps, line, values):
+        self.saved.append(super().save(num_of_steps, line, values))
+        return self.saved[-1]
+
+
+def test_checkpoint_round_trip(tmp_path):
+    path = str(tmp_path / "run.json")
+    for registers in (urm.Registers([0, 3, 4]), urm.SparseRegisters({2: 5, 1000: 1})):
+        checkpoint = urm.Checkpoint(program=tuple(COUNT), program_hash=urm.checkpoint.program_hash(COUNT),
+                                    line=2, num_of_steps=17, registers=registers, safety_count=500)
+        checkpoint.save(path)
+        loaded = urm.Checkpoint.load(path)
+        assert type(loaded.registers) is type(registers)
+        assert loaded.registers.registers == registers.registers
+        assert (loaded.program, loaded.program_hash, loaded.line, loaded.num_of_steps, loaded.safety_count) == \
+            (checkpoint.program, checkpoint.program_hash, 2, 17, 500)
+        assert list(loaded.instructions()) == list(COUNT)
+
+
+def test_load_rejects_other_files(tmp_path):
+    path = tmp_path / "other.json"
+    path.write_text('{"format": "something else"}')
+    with pytest.raises(ValueError):
+        urm.Checkpoint.load(str(path))
+
+
+@pytest.mark.parametrize("accelerate", [False, True])
+@pytest.mark.parametrize("name, instructions, inputs", shipped_programs())
+def test_resume_from_every_checkpoint(tmp_path, name, instructions, inputs, accelerate):
+    path = str(tmp_path / "run.json")
+    param = inputs[-1]
+    registers = urm.Registers.allocate(instructions.haddr() + 1)
+    expected = urm.forward(param, registers, instructions, safety_count=10000)
+    recorder = Recorder(path, instructions, safety_count=10000, interval=3)
+    result = urm.run(param, registers, instructions, safety_count=10000, accelerate=accelerate, budget=recorder)
+    assert result.num_of_steps == expected.num_of_steps
+    for checkpoint in recorder.saved:
+        resumed = urm.resume(checkpoint, accelerate=accelerate)
+        assert resumed.num_of_steps == expected.num_of_steps
+        assert resumed.last_registers.registers == expected.last_registers.registers
+    # The file holds the last one.
+    assert urm.resume(path).last_registers.registers == expected.last_registers.registers
+
+
+def test_resume_a_cancelled_forward(tmp_path):
+    path = str(tmp_path / "run.json")
+    token = urm.CancellationToken()
+    token.cancel()
+    budget = urm.Checkpointer(path, COUNT, safety_count=10 ** 6, token=token, interval=1000)
+    with pytest.raises(urm.RunCancelled) as info:
+        urm.forward({1: 5000}, urm.Registers.allocate(2), COUNT, safety_count=10 ** 6, budget=budget)
+    checkpoint = urm.Checkpoint.load(path)
+    assert checkpoint.num_of_steps == info.value.num_of_steps > 0
+    resumed = urm.resume(path)
+    expected = urm.run({1: 5000}, urm.Registers.allocate(2), COUNT, safety_count=10 ** 6)
+    assert resumed.num_of_steps == expected.num_of_steps
+    assert resumed.last_registers.registers == [5000, 5000]
+
+
+def test_resume_with_memoised_calls(tmp_path):
+    function = urm.PureFunction(COUNT, inputs=[0, 1])
+    program = urm.concat(urm.concat(function.call((2, 1)), urm.Instructions(('S', 3), ('Z', 2))),
+                         function.call((2, 1)))
+    expected = urm.run({1: 300}, urm.Registers.allocate(4), program, safety_count=10 ** 6)
+    recorder = Recorder(str(tmp_path / "run.json"), program, safety_count=10 ** 6, interval=50)
+    urm.run({1: 300}, urm.Registers.allocate(4), program, safety_count=10 ** 6, budget=recorder)
+    assert len(recorder.saved) > 5
+    for checkpoint in recorder.saved:
+        for memoize in (False, True):
+            resumed = urm.resume(checkpoint, instructions=program, memoize=memoize)
+            assert resumed.num_of_steps == expected.num_of_steps
+            assert resumed.last_registers.registers == expected.last_registers.registers
+
+
+def test_resume_rejects_another_program(tmp_path):
+    path = str(tmp_path / "run.json")
+    urm.Checkpointer(path, COUNT).save(0, 0, [0, 3])
+    with pytest.raises(ValueError):
+        urm.resume(path, instructions=urm.Instructions(('S', 0)))
@@ -0,0 +1,37 @@
+import pytest
+
+import urm
+from programs import outcome, random_cases, shipped_programs
+
+
+@pytest.mark.parametrize("name, instructions, inputs", shipped_programs())
+def test_compiled_python_matches_forward_on_shipped_programs(name, instructions, inputs):
+    program = urm.compile_to_python(instructions)
+    registers = urm.Registers.allocate(instructions.haddr() + 1)
+    for param in inputs:
+        for safety_count in (20, 10000):
+            assert outcome(program, param, registers, safety_count=safety_count) == \
+                outcome(urm.forward, param, registers, instructions, safety_count=safety_count)
+
+
+def test_compiled_python_matches_forward_on_random_programs():
+    for instructions, param in random_cases(500, seed=6):
+        registers = urm.Registers.allocate(4)
+        assert outcome(urm.compile_to_python(instructions), param, registers, safety_count=200) == \
+            outcome(urm.forward, param, registers, instructions, safety_count=200)
+
+
+def test_compiled_python_falls_back_for_other_registers():
+    instructions = urm.Instructions(('S', 3), ('C', 3, 0))
+    program = urm.compile_to_python(instructions)
+    sparse = program({1: 2}, urm.SparseRegisters())
+    assert sparse.last_registers.values == urm.run({1: 2}, urm.SparseRegisters(), instructions).last_registers.values
+    assert outcome(program, None, urm.Registers.allocate(2)) == \
+        outcome(urm.forward, None, urm.Registers.allocate(2), instructions)
+
+
+def test_compiled_code_is_shared_by_equivalent_programs():
+    first = urm.compile_to_python(urm.Instructions(('S', 0), ('J', 0, 0, 0)))
+    second = urm.compile_to_python(urm.Instructions(('S', 0), ('J', 0, 0, 7)))
+    assert first.function is second.function
+    assert "def " in first.source
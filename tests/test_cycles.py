@@ -0,0 +1,17 @@
+import pytest
+
+import urm
+
+
+@pytest.mark.parametrize("execute", [urm.URMSimulator.forward, urm.URMSimulator.run_fast])
+def test_unknown_op_self_loop_is_detected(execute):
+    program = urm.Instructions(('S', 1), ('X', 1))
+    with pytest.raises(urm.NonTerminating) as info:
+        execute(None, urm.Registers.allocate(2), program, safety_count=100000, detect_cycles=True)
+    assert info.value.line == 1
+    assert info.value.num_of_steps < 10
+
+
+def test_backward_jumps_include_self_loops_of_any_op():
+    table = urm.URMSimulator.decode(urm.Instructions(('S', 1), ('X', 1), ('J', 0, 0, 1)))
+    assert urm.cycles.backward_jumps(table) == {1, 2}
@@ -0,0 +1,95 @@
+import pytest
+
+import urm
+from urm.gui.debug import DebugSessionStore
+
+# R1 * R2 into R0, as in the GUI's Mul program.
+MUL = urm.Instructions(('J', 1, 3, 12), ('J', 2, 3, 11), ('C', 1, 3), ('S', 5), ('J', 2, 5, 11), ('Z', 4), ('S', 3),
+                       ('S', 4), ('J', 1, 4, 4), ('J', 1, 1, 7), ('C', 3, 1), ('Z', 2), ('Z', 3), ('Z', 4), ('Z', 5),
+                       ('C', 1, 0))
+
+
+def session(a=7, b=9):
+    return urm.debug(MUL, urm.Registers.allocate(6), param={1: a, 2: b})
+
+
+def test_step_executes_only_the_steps_asked_for():
+    debug = session()
+    state = debug.step()
+    assert (state.num_of_steps, state.line, state.reason, state.halted) == (1, 1, "step", False)
+    state = debug.step(5)
+    assert state.num_of_steps == 6
+    final = urm.forward({1: 7, 2: 9}, urm.Registers.allocate(6), MUL)
+    assert state.registers.registers == final.registers_from_steps[6].registers
+    with pytest.raises(ValueError):
+        debug.step(0)
+
+
+def test_step_stops_at_the_halt():
+    debug = session(2, 3)
+    final = urm.forward({1: 2, 2: 3}, urm.Registers.allocate(6), MUL)
+    state = debug.step(10 ** 6)
+    assert (state.num_of_steps, state.reason, state.halted) == (final.num_of_steps, "halted", True)
+    assert state.registers.registers == final.last_registers.registers
+    assert debug.step().num_of_steps == final.num_of_steps
+
+
+def test_run_to_line_and_breakpoints():
+    debug = session()
+    state = debug.run_to(line=6)
+    assert (state.line, state.reason) == (6, "breakpoint")
+    debug.add_breakpoint(7)
+    first = debug.resume()
+    assert (first.num_of_steps, first.line, first.reason) == (state.num_of_steps + 1, 7, "breakpoint")
+    # Resuming from a breakpoint executes its line before stopping at it again.
+    second = debug.resume()
+    assert (second.line, second.reason) == (7, "breakpoint")
+    assert second.num_of_steps > first.num_of_steps
+    debug.clear()
+    assert debug.resume().reason == "halted"
+    with pytest.raises(ValueError):
+        debug.run_to(line=len(MUL))
+
+
+def test_condition_hit_on_the_last_step():
+    # R0 is only written by the last instruction, which halts the program.
+    state = session().run_to(condition='R0 >= 10')
+    assert (state.reason, state.halted, state.registers[0]) == ("condition", True, 63)
+
+
+def test_condition_only_stops_when_it_becomes_true():
+    # R4 counts up to R1 for each of the R2 - 1 additions of R1, and is reset before each.
+    debug = session()
+    debug.add_condition('R4 >= 2')
+    hits = []
+    state = debug.resume()
+    while state.reason == "condition":
+        assert state.registers[4] == 2
+        hits.append(state.num_of_steps)
+        state = debug.resume()
+    assert state.reason == "halted"
+    assert len(hits) == 8
+
+
+def test_goto_and_back():
+    debug = session()
+    final = urm.forward({1: 7, 2: 9}, urm.Registers.allocate(6), MUL)
+    debug.resume()
+    for step in (0, 1, 37, final.num_of_steps - 1):
+        state = debug.goto(step)
+        assert state.num_of_steps == step
+        assert state.registers.registers == final.registers_from_steps[step].registers
+    assert debug.back(10).num_of_steps == final.num_of_steps - 11
+
+
+def test_store_keeps_sessions_running_a_command():
+    store = DebugSessionStore(max_sessions=1)
+    busy = store.create(MUL, urm.Registers.allocate(6))
+    with busy.lock:
+        other = store.create(MUL, urm.Registers.allocate(6))
+        assert store.get(busy.session_id) is busy
+        assert store.get(other.session_id) is other
+    store.create(MUL, urm.Registers.allocate(6))
+    assert len(store) == 1
+    with pytest.raises(ValueError):
+        store.get(busy.session_id)
@@ -0,0 +1,28 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules 'import urm' must not load, as in benchmarks/bench_import.py.
+FORBIDDEN = ('fastapi', 'starlette', 'pydantic', 'uvicorn', 'click', 'numpy', 'multiprocessing',
+             'concurrent.futures', 'urm.gui', 'urm.batch', 'urm.parallel')
+
+
+def loaded_modules(statement):
+    script = f"import json, sys\n{statement}\nprint(json.dumps(sorted(sys.modules)))"
+    output = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout)
+
+
+def test_import_urm_loads_no_heavy_module():
+    modules = loaded_modules("import urm")
+    loaded = [module for module in modules
+              if any(module == name or module.startswith(name + '.') for name in FORBIDDEN)]
+    assert loaded == []
+
+
+def test_lazy_attributes_load_on_first_access():
+    modules = loaded_modules("import urm\nurm.parallel")
+    assert "urm.parallel" in modules
@@ -0,0 +1,122 @@
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+import urm
+from urm.gui import jobs
+from urm.gui.jobs import JobQueue, JobRejected
+
+# R1 + R2 into R1.
+ADD = urm.Instructions(('J', 3, 2, 5), ('S', 1), ('S', 3), ('J', 1, 1, 1))
+# Never halts.
+FOREVER = urm.Instructions(('S', 1), ('J', 1, 1, 1))
+
+
+@pytest.fixture
+def gate(monkeypatch):
+    """
+    Holds every job until set, recording the order in which they start by their R2.
+    """
+    gate = threading.Event()
+    gate.order = []
+    execute_job = jobs.execute_job
+
+    def held(urm_program, registers, *args):
+        gate.order.append(registers[2])
+        gate.wait(5)
+        return execute_job(urm_program, registers, *args)
+
+    monkeypatch.setattr(jobs, "execute_job", held)
+    return gate
+
+
+def wait_idle(queue):
+    deadline = time.monotonic() + 5
+    while (queue.running or queue.queued) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def registers(r2):
+    return urm.Registers([0, 1, r2, 0])
+
+
+def test_admission_control(gate):
+    queue = JobQueue(max_workers=1, max_queued=4, max_queued_per_client=2, max_steps=1000,
+                     executor=ThreadPoolExecutor(1))
+    queue.submit("a", ADD, registers(0))  # Running
+    queue.submit("a", ADD, registers(1))
+    queue.submit("a", ADD, registers(2))
+    with pytest.raises(JobRejected):
+        queue.submit("a", ADD, registers(3))
+    queue.submit("b", ADD, registers(4))
+    queue.submit("b", ADD, registers(5))
+    with pytest.raises(JobRejected):
+        queue.submit("c", ADD, registers(6))
+    with pytest.raises(JobRejected):
+        queue.submit("c", ADD, registers(7), safety_count=1001)
+    assert queue.stats() == {"queued": 4, "running": 1, "clients": 2, "jobs": 5}
+    gate.set()
+    wait_idle(queue)
+
+
+def test_round_robin_across_clients(gate):
+    queue = JobQueue(max_workers=1, executor=ThreadPoolExecutor(1))
+    submitted = [queue.submit("a", ADD, registers(r2)) for r2 in (0, 1, 2, 3)]
+    submitted += [queue.submit("b", ADD, registers(r2)) for r2 in (10, 11)]
+    submitted += [queue.submit("c", ADD, registers(20))]
+    gate.set()
+    wait_idle(queue)
+    assert gate.order == [0, 1, 10, 20, 2, 11, 3]
+    assert all(job.state == "done" for job in submitted)
+    assert submitted[0].result == {"num_of_steps": 1, "last_registers": [0, 1, 0, 0]}
+
+
+def test_cancel_queued_and_running(gate):
+    queue = JobQueue(max_workers=1, executor=ThreadPoolExecutor(1))
+    running = queue.submit("a", ADD, registers(2))
+    queued = queue.submit("a", ADD, registers(3))
+    queue.cancel(queued.job_id)
+    assert queued.state == "cancelled"
+    assert queue.stats()["queued"] == 0
+    queue.cancel(running.job_id)
+    assert running.state == "cancelled"
+    # The running job keeps its worker until it stops, and its result is discarded.
+    assert running.status()["stopping"]
+    assert queue.stats()["running"] == 1
+    gate.set()
+    wait_idle(queue)
+    assert running.state == "cancelled"
+    assert not running.status()["stopping"]
+    assert running.result is None
+    assert gate.order == [2]
+
+
+@pytest.mark.parametrize("executor", [lambda: ThreadPoolExecutor(1), lambda: ProcessPoolExecutor(1)],
+                         ids=["threads", "processes"])
+def test_cancel_stops_the_worker(executor):
+    queue = JobQueue(max_workers=1, max_steps=10 ** 12, executor=executor())
+    try:
+        job = queue.submit("a", FOREVER, urm.Registers([0, 0]), safety_count=10 ** 12)
+        assert job.state == "running"
+        time.sleep(0.2)
+        queue.cancel(job.job_id)
+        started = time.monotonic()
+        wait_idle(queue)
+        assert queue.stats()["running"] == 0
+        assert time.monotonic() - started < 5
+        assert job.state == "cancelled"
+        assert not job.status()["stopping"]
+    finally:
+        queue.close()
+
+
+def test_failed_submit_frees_the_worker():
+    executor = ThreadPoolExecutor(1)
+    executor.shutdown()
+    queue = JobQueue(max_workers=1, executor=executor)
+    job = queue.submit("a", ADD, registers(2))
+    assert job.state == "failed"
+    assert "error" in job.result
+    assert queue.stats()["running"] == 0
@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+import urm
+from programs import outcome, random_cases, shipped_programs
+
+# R1 + R2 into R1, a counting loop on R3 up to R2.
+ADD = urm.Instructions(('J', 3, 2, 5), ('S', 1), ('S', 3), ('J', 1, 1, 1))
+
+
+@pytest.mark.parametrize("b", [0, 1, 333, 334, 1000, 10 ** 6])
+def test_accelerated_run_matches_plain_run(b):
+    results = []
+    for accelerate in (False, True):
+        try:
+            result = urm.run({1: 3, 2: b}, urm.Registers.allocate(4), ADD, safety_count=1000, accelerate=accelerate)
+            results.append((result.num_of_steps, result.last_registers.registers))
+        except urm.SafetyLimitExceeded as e:
+            results.append(("exceeded", e.num_of_steps))
+    assert results[0] == results[1]
+
+
+def test_accelerated_skip_past_the_safety_count_reports_the_plain_count():
+    with pytest.raises(urm.SafetyLimitExceeded) as info:
+        urm.run({1: 3, 2: 10 ** 6}, urm.Registers.allocate(4), ADD, safety_count=1000, accelerate=True)
+    assert info.value.num_of_steps == 1001
+
+
+@pytest.mark.parametrize("name, instructions, inputs", shipped_programs())
+def test_accelerated_run_matches_forward_on_shipped_programs(name, instructions, inputs):
+    registers = urm.Registers.allocate(instructions.haddr() + 1)
+    assert urm.find_counting_loops(instructions)
+    for param in inputs + [{r: 10 * v for r, v in param.items()} for param in inputs]:
+        for safety_count in (50, 10000):
+            assert outcome(urm.run, param, registers, instructions, safety_count=safety_count, accelerate=True) == \
+                outcome(urm.forward, param, registers, instructions, safety_count=safety_count)
+
+
+def test_accelerated_run_matches_forward_on_random_programs():
+    for instructions, param in random_cases(500, seed=1):
+        registers = urm.Registers.allocate(4)
+        assert outcome(urm.run, param, registers, instructions, safety_count=200, accelerate=True) == \
+            outcome(urm.forward, param, registers, instructions, safety_count=200)
+
+
+def test_accelerated_run_matches_forward_on_random_counting_loops():
+    rng = random.Random(2)
+    for _ in range(300):
+        counter, bound, *others = rng.sample(range(5), 5)
+        body = [('S', rng.choice(others)) for _ in range(rng.randint(0, 3))]
+        prefix = [rng.choice([('Z', rng.choice(others)), ('C', bound, rng.choice(others))])
+                  for _ in range(rng.randint(0, 2))]
+        start = len(prefix) + 1
+        # The loop exits past its last line, to the END line or past it.
+        loop = [('J', counter, bound, start + len(body) + rng.randint(3, 4))] + body + \
+               [('S', counter), ('J', 0, 0, start)]
+        instructions = urm.Instructions(*(prefix + loop))
+        assert urm.find_counting_loops(instructions)
+        param = {r: rng.randrange(30) for r in range(5)}
+        param[bound] = param[counter] + rng.randrange(30)
+        for safety_count in (rng.randrange(1, 200), 10000):
+            assert outcome(urm.run, param, urm.Registers.allocate(5), instructions, safety_count=safety_count,
+                           accelerate=True) == \
+                outcome(urm.forward, param, urm.Registers.allocate(5), instructions, safety_count=safety_count)
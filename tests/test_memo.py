@@ -0,0 +1,73 @@
+import pytest
+
+import urm
+
+# Counts R0 up to R1.
+COUNT = urm.Instructions(('J', 0, 1, 4), ('S', 0), ('J', 0, 0, 1))
+
+
+def test_budget_stops_a_memoised_call():
+    function = urm.PureFunction(COUNT, inputs=[0, 1])
+    program = function.call((0, 1))
+    token = urm.CancellationToken()
+    token.cancel()
+    with pytest.raises(urm.RunCancelled) as info:
+        urm.run({1: 100000}, urm.Registers.allocate(2), program, safety_count=10 ** 6, memoize=True,
+                budget=urm.Budget(token=token, interval=100))
+    # The run stops before the call, where it can be resumed from.
+    assert info.value.num_of_steps == 0
+    assert info.value.line == 0
+    assert info.value.registers.registers == [0, 100000]
+    assert len(function.memo) == 0
+
+
+def test_memoised_call_within_budget():
+    function = urm.PureFunction(COUNT, inputs=[0, 1])
+    program = function.call((0, 1))
+    result = urm.run({1: 500}, urm.Registers.allocate(2), program, safety_count=10 ** 6, memoize=True,
+                     budget=urm.Budget(seconds=60, interval=100))
+    assert result.last_registers.registers == [500, 500]
+    assert result.num_of_steps == urm.run({1: 500}, urm.Registers.allocate(2), COUNT, safety_count=10 ** 6).num_of_steps
+
+
+def test_checkpoints_hold_the_state_of_the_run_not_of_its_calls(tmp_path):
+    function = urm.PureFunction(COUNT, inputs=[0, 1])
+    program = urm.concat(function.call((0, 1)), urm.Instructions(('S', 5), ('S', 5)))
+    path = str(tmp_path / "run.json")
+    saved = []
+
+    class Recorder(urm.Checkpointer):
+        def save(self, num_of_steps, line, values):
+            saved.append(super().save(num_of_steps, line, values))
+            return saved[-1]
+
+    # Saves on every check, most of which fall within the call.
+    checkpointer = Recorder(path, program, safety_count=10 ** 6, every=0, interval=100)
+    result = urm.run({1: 5000}, urm.Registers.allocate(6), program, safety_count=10 ** 6, memoize=True,
+                     budget=checkpointer)
+    assert saved
+    for checkpoint in saved:
+        assert len(checkpoint.registers) == 6
+        assert checkpoint.line >= len(COUNT)
+    resumed = urm.resume(path, instructions=program, memoize=True)
+    assert resumed.last_registers.registers == result.last_registers.registers
+    assert resumed.num_of_steps == result.num_of_steps
+
+
+def test_cancelled_call_is_checkpointed_before_the_call(tmp_path):
+    function = urm.PureFunction(COUNT, inputs=[0, 1])
+    program = urm.concat(urm.Instructions(('S', 5)), function.call((0, 1)))
+    path = str(tmp_path / "run.json")
+    token = urm.CancellationToken()
+    checkpointer = urm.Checkpointer(path, program, safety_count=10 ** 6, token=token, interval=100)
+    token.cancel()
+    with pytest.raises(urm.RunCancelled):
+        urm.run({1: 5000}, urm.Registers.allocate(6), program, safety_count=10 ** 6, memoize=True,
+                budget=checkpointer)
+    checkpoint = urm.Checkpoint.load(path)
+    assert (checkpoint.line, checkpoint.num_of_steps) == (1, 1)
+    assert checkpoint.registers.registers == [0, 5000, 0, 0, 0, 1]
+    expected = urm.run({1: 5000}, urm.Registers.allocate(6), program, safety_count=10 ** 6)
+    resumed = urm.resume(path, instructions=program, memoize=True)
+    assert resumed.last_registers.registers == expected.last_registers.registers
+    assert resumed.num_of_steps == expected.num_of_steps
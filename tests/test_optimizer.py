@@ -0,0 +1,61 @@
+import pytest
+
+import urm
+from urm.optimizer import PASSES
+from programs import random_cases, shipped_programs
+
+
+def final(instructions, param, registers, safety_count):
+    """
+    The final registers and step count of a run, or None if it exceeds the safety count.
+    """
+    try:
+        result = urm.forward(param, registers, instructions, safety_count=safety_count)
+    except urm.SafetyLimitExceeded:
+        return None
+    if result.last_registers is None:
+        return result.registers_from_steps[0].registers, 0
+    return result.last_registers.registers, result.num_of_steps
+
+
+def check(original, optimized, inputs, registers, safety_count):
+    for param in inputs:
+        before = final(original, param, registers, safety_count)
+        if before is None:
+            continue
+        after = final(optimized, param, registers, safety_count)
+        assert after is not None
+        assert after[0] == before[0]
+        assert after[1] <= before[1]
+
+
+@pytest.mark.parametrize("name, instructions, inputs", shipped_programs())
+def test_optimized_programs_keep_their_results(name, instructions, inputs):
+    result = urm.optimize(instructions, inputs=inputs)
+    assert len(result.instructions) <= len(instructions)
+    check(instructions, result.instructions, inputs, urm.Registers.allocate(instructions.haddr() + 1), 10000)
+
+
+@pytest.mark.parametrize("passes", [[name] for name in PASSES] + [list(PASSES)])
+def test_passes_keep_the_results_of_random_programs(passes):
+    changes = 0
+    for instructions, param in random_cases(500, seed=5):
+        result = urm.optimize(instructions, passes=passes)
+        changes += sum(result.changes.values())
+        check(instructions, result.instructions, [param], urm.Registers.allocate(4), 200)
+    # The random programs hold enough redundant code for every pass to change some.
+    assert changes > 0
+
+
+def test_redundant_instructions_are_removed():
+    instructions = urm.Instructions(('C', 1, 1), ('J', 0, 1, 3), ('Z', 2), ('Z', 2), ('S', 2), ('J', 0, 0, 8),
+                                    ('S', 1))
+    result = urm.optimize(instructions, inputs=[{0: a, 1: b} for a in range(3) for b in range(3)])
+    assert list(result.instructions) == [('Z', 2), ('S', 2)]
+    assert result.changes["self_copies"] == 1
+    assert all(after <= before for before, after in result.steps)
+
+
+def test_verification_rejects_unknown_passes():
+    with pytest.raises(ValueError):
+        urm.optimize(urm.Instructions(('S', 0)), passes=["inline"])
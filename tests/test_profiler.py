@@ -0,0 +1,75 @@
+import json
+import re
+
+import pytest
+
+import urm
+from programs import random_cases, shipped_programs
+
+
+def expected_profile(param, registers, instructions, safety_count):
+    """
+    The counts of a profile, worked out from the full trace of the run.
+    """
+    result = urm.forward(param, registers, instructions, safety_count=safety_count)
+    states = [r.registers for r in result.registers_from_steps]
+    continues = [int(re.match(r"\[(\d+)\]", op).group(1)) for op in list(result.ops_from_steps)[1:]]
+    n = len(instructions)
+    hits, taken, not_taken, writes = [0] * n, [0] * n, [0] * n, [0] * len(registers)
+    line = 0
+    for step, following in enumerate(continues, 1):
+        instruction = instructions[line]
+        hits[line] += 1
+        if instruction[0] == 'J':
+            if states[step][instruction[1]] == states[step][instruction[2]]:
+                taken[line] += 1
+            else:
+                not_taken[line] += 1
+        else:
+            writes[instruction[2] if instruction[0] == 'C' else instruction[1]] += 1
+        line = following
+    return result.num_of_steps, hits, taken, not_taken, writes
+
+
+def cases():
+    for _, instructions, inputs in shipped_programs():
+        yield instructions, inputs[-1], instructions.haddr() + 1
+    for instructions, param in random_cases(300, seed=7):
+        try:
+            urm.run(param, urm.Registers.allocate(4), instructions, safety_count=200)
+        except urm.SafetyLimitExceeded:
+            continue
+        yield instructions, param, 4
+
+
+def test_profile_counts_match_the_trace():
+    for instructions, param, size in cases():
+        registers = urm.Registers.allocate(size)
+        profile = urm.profile(param, registers, instructions, safety_count=10000)
+        counts = (profile.num_of_steps, profile.hits.tolist(), profile.taken.tolist(), profile.not_taken.tolist(),
+                  profile.writes.tolist())
+        assert counts == expected_profile(param, registers, instructions, 10000)
+        assert sum(profile.hits) == profile.num_of_steps
+
+
+def test_hot_loops_and_report():
+    # R1 + R2 into R1: lines 1 to 4 loop R2 times.
+    instructions = urm.Instructions(('J', 3, 2, 5), ('S', 1), ('S', 3), ('J', 1, 1, 1))
+    profile = urm.profile({1: 3, 2: 10}, urm.Registers.allocate(4), instructions)
+    [loop] = profile.hot_loops()
+    assert (loop.start, loop.end, loop.iterations, loop.steps) == (0, 3, 10, 41)
+    assert "Lines 1-4: 10 iterations" in profile.summary()
+    data = json.loads(profile.to_json())
+    assert data["hits"] == [11, 10, 10, 10]
+    assert data["heat"] == [1.0, 10 / 11, 10 / 11, 10 / 11]
+    assert data["writes"] == [0, 10, 0, 10]
+
+
+def test_profile_of_an_exceeded_run():
+    instructions = urm.Instructions(('S', 0), ('J', 0, 0, 1))
+    with pytest.raises(urm.SafetyLimitExceeded) as info:
+        urm.profile(None, urm.Registers.allocate(1), instructions, safety_count=100)
+    profile = info.value.trace
+    assert isinstance(profile, urm.Profile)
+    assert profile.hits.tolist() == [51, 50]
+    assert profile.hot_loops()[0].iterations == 50
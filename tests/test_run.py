@@ -0,0 +1,34 @@
+import pytest
+
+import urm
+from programs import outcome, random_cases, shipped_programs
+
+
+@pytest.mark.parametrize("name, instructions, inputs", shipped_programs())
+def test_run_matches_forward_on_shipped_programs(name, instructions, inputs):
+    registers = urm.Registers.allocate(instructions.haddr() + 1)
+    for param in inputs:
+        assert outcome(urm.run, param, registers, instructions, safety_count=10000) == \
+            outcome(urm.forward, param, registers, instructions, safety_count=10000)
+
+
+def test_run_matches_forward_on_random_programs():
+    for instructions, param in random_cases(500):
+        registers = urm.Registers.allocate(4)
+        assert outcome(urm.run, param, registers, instructions, safety_count=200) == \
+            outcome(urm.forward, param, registers, instructions, safety_count=200)
+
+
+def test_run_leaves_the_initial_registers_unchanged():
+    instructions = urm.Instructions(('S', 1), ('S', 1))
+    registers = urm.Registers([0, 5])
+    assert urm.run(None, registers, instructions).last_registers.registers == [0, 7]
+    assert registers.registers == [0, 5]
+
+
+def test_run_on_sparse_registers():
+    instructions = urm.Instructions(('S', 1000), ('C', 1000, 3))
+    result = urm.run({2: 4}, urm.SparseRegisters(), instructions)
+    assert isinstance(result.last_registers, urm.SparseRegisters)
+    assert result.last_registers.values == {2: 4, 1000: 1, 3: 1}
+    assert result.num_of_steps == 2
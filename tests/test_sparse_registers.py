@@ -0,0 +1,55 @@
+import copy
+import pickle
+
+import pytest
+
+import urm
+
+# R1 + R2 into R1, counting up in R3.
+ADD = urm.Instructions(('J', 3, 2, 5), ('S', 1), ('S', 3), ('J', 1, 1, 1))
+# R1 * R2 into R0, as in the GUI's Mul program.
+MUL = urm.Instructions(('J', 1, 3, 12), ('J', 2, 3, 11), ('C', 1, 3), ('S', 5), ('J', 2, 5, 11), ('Z', 4), ('S', 3),
+                       ('S', 4), ('J', 1, 4, 4), ('J', 1, 1, 7), ('C', 3, 1), ('Z', 2), ('Z', 3), ('Z', 4), ('Z', 5),
+                       ('C', 1, 0))
+
+
+def test_execute_instructions_updates_sparse_registers():
+    registers = urm.SparseRegisters({1: 3, 2: 4})
+    states = list(urm.URMSimulator.execute_instructions(ADD, registers))
+    assert registers[1] == 7
+    assert registers[3] == 4
+    assert isinstance(states[-1][0], urm.SparseRegisters)
+    assert states[-1][0][1] == 7
+
+    dense = urm.Registers([0, 3, 4, 0])
+    dense_states = list(urm.URMSimulator.execute_instructions(ADD, dense))
+    assert [op for _, op in states] == [op for _, op in dense_states]
+    for (state, _), (dense_state, _) in zip(states, dense_states):
+        assert [state[index] for index in range(4)] == dense_state.registers
+
+
+def test_steps_rejects_sparse_registers():
+    with pytest.raises(TypeError):
+        next(urm.URMSimulator._steps(ADD, urm.SparseRegisters({1: 3}), 1000))
+
+
+def test_forward_batch_expands_sparse_registers():
+    pytest.importorskip("numpy")
+    inputs = [{1: a, 2: b} for a in range(4) for b in range(4)]
+    results = urm.forward_batch(MUL, inputs, initial_registers=urm.SparseRegisters())
+    for index, param in enumerate(inputs):
+        result = results.result(index)
+        assert result.last_registers[0] == param[1] * param[2]
+        assert result.num_of_steps == urm.forward(param, urm.Registers.allocate(6), MUL).num_of_steps
+
+
+def test_registers_have_no_instance_dictionary():
+    dense = urm.Registers([1, 2])
+    sparse = urm.SparseRegisters({3: 4})
+    assert not hasattr(dense, '__dict__')
+    assert not hasattr(sparse, '__dict__')
+    for copied in (copy.deepcopy(sparse), pickle.loads(pickle.dumps(sparse))):
+        assert isinstance(copied, urm.SparseRegisters)
+        assert copied.values == {3: 4}
+        assert copied[5] == 0
+    assert pickle.loads(pickle.dumps(dense)).registers == [1, 2]
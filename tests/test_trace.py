@@ -0,0 +1,107 @@
+import pytest
+
+import urm
+from programs import random_cases, shipped_programs
+
+
+def full_trace(param, registers, instructions, safety_count=10000):
+    result = urm.forward(param, registers, instructions, safety_count=safety_count)
+    return [r.registers for r in result.registers_from_steps], list(result.ops_from_steps)
+
+
+def traced_cases():
+    """
+    (instructions, param, number of registers) of halting runs.
+    """
+    cases = [(instructions, param, instructions.haddr() + 1)
+             for _, instructions, inputs in shipped_programs() for param in inputs[-3:]]
+    # Random programs that halt.
+    for instructions, param in random_cases(200, seed=3):
+        try:
+            urm.run(param, urm.Registers.allocate(4), instructions, safety_count=200)
+        except urm.SafetyLimitExceeded:
+            continue
+        cases.append((instructions, param, 4))
+    return cases
+
+
+@pytest.mark.parametrize("interval", [1, 3, 256])
+def test_delta_trace_matches_the_full_trace(interval):
+    for instructions, param, size in traced_cases():
+        registers = urm.Registers.allocate(size)
+        expected_registers, expected_ops = full_trace(param, registers, instructions)
+        result = urm.forward(param, registers, instructions, safety_count=10000, trace=urm.trace.delta(interval))
+        trace = result.trace
+        assert len(trace) == len(expected_registers)
+        assert [r.registers for r in result.registers_from_steps] == expected_registers
+        assert list(result.ops_from_steps) == expected_ops
+        # Random access, backwards and by page.
+        for step in reversed(range(len(trace))):
+            assert trace[step].registers == expected_registers[step]
+        offset = len(trace) // 3
+        assert trace.page(offset, 5) == (expected_registers[offset:offset + 5], expected_ops[offset:offset + 5])
+
+
+def test_delta_trace_round_trip(tmp_path):
+    for index, (instructions, param, size) in enumerate(traced_cases()):
+        registers = urm.Registers.allocate(size)
+        trace = urm.forward(param, registers, instructions, safety_count=10000, trace=urm.trace.delta(4)).trace
+        path = str(tmp_path / f"{index}.urmd")
+        trace.save(path)
+        loaded = urm.trace.DeltaTrace.load(path)
+        assert loaded.checkpoint_interval == 4
+        assert len(loaded) == len(trace)
+        assert [loaded[step].registers for step in range(len(loaded))] == \
+            [trace[step].registers for step in range(len(trace))]
+        assert list(loaded.ops_from_steps) == list(trace.ops_from_steps)
+
+
+def test_delta_trace_rejects_other_files(tmp_path):
+    path = tmp_path / "other.urmd"
+    path.write_bytes(b"not a trace")
+    with pytest.raises(ValueError):
+        urm.trace.DeltaTrace.load(str(path))
+
+
+def test_trace_file_round_trip(tmp_path):
+    pytest.importorskip("numpy")
+    for index, (instructions, param, size) in enumerate(traced_cases()):
+        registers = urm.Registers.allocate(size)
+        expected_registers, expected_ops = full_trace(param, registers, instructions)
+        path = str(tmp_path / f"{index}.urmt")
+        with urm.trace.to_file(path) as writer:
+            result = urm.forward(param, registers, instructions, safety_count=10000, trace=writer)
+            assert result.num_of_steps == len(expected_registers) - 1
+            assert [r.registers for r in result.registers_from_steps] == expected_registers
+            assert list(result.ops_from_steps) == expected_ops
+        with urm.trace.TraceFile(path) as trace:
+            assert len(trace) == len(expected_registers)
+            assert [trace[step].registers for step in reversed(range(len(trace)))] == expected_registers[::-1]
+            offset = len(trace) // 2
+            assert trace.page(offset, 4) == (expected_registers[offset:offset + 4], expected_ops[offset:offset + 4])
+            for register in range(size):
+                steps, values = trace.register_history(register)
+                for step, value in zip(steps, values):
+                    assert expected_registers[step][register] == value
+                first = trace.first_step(register, lambda v: v > 1)
+                expected = next((step for step, values in enumerate(expected_registers) if values[register] > 1), None)
+                assert first == expected
+
+
+def test_trace_file_writer_can_be_reused(tmp_path):
+    pytest.importorskip("numpy")
+    instructions = urm.Instructions(('S', 1), ('S', 1), ('S', 0))
+    writer = urm.trace.to_file(str(tmp_path / "run.urmt"))
+    first = urm.forward(None, urm.Registers.allocate(2), instructions, trace=writer)
+    assert first.registers_from_steps[-1].registers == [1, 2]
+    second = urm.forward({1: 5}, urm.Registers.allocate(2), instructions, trace=writer)
+    assert [r.registers for r in second.registers_from_steps] == [[0, 5], [0, 6], [0, 7], [1, 7]]
+    writer.close()
+
+
+def test_trace_file_rejects_other_files(tmp_path):
+    pytest.importorskip("numpy")
+    path = tmp_path / "other.urmt"
+    path.write_bytes(b"not a trace file, but long enough to hold a header")
+    with pytest.raises(ValueError):
+        urm.trace.TraceFile(str(path))
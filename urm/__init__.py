@@ -1,4 +1,40 @@
 from .urm_simulation import C, J, Z, S
-from .urm_simulation import size, haddr, normalize, concat, reloc, allocate, forward, cost
-from .urm_simulation import Instructions, Registers, URMSimulator
-import urm.gui
\ No newline at end of file
+from .urm_simulation import size, haddr, normalize, concat, reloc, allocate, forward, run, cost
+from .urm_simulation import Instructions, InstructionArray, Registers, SparseRegisters, URMSimulator, SafetyLimitExceeded
+from .loops import CountingLoop, find_counting_loops
+from . import trace
+from .cache import ResultCache
+from .memo import PureFunction
+from .analysis import CompiledProgram, analyze
+from .optimizer import OptimizationResult, optimize
+from .codegen import PythonProgram, compile_to_python
+from .cycles import NonTerminating
+from .budget import Budget, CancellationToken, RunInterrupted, RunTimeout, RunCancelled
+from .checkpoint import Checkpoint, Checkpointer, resume
+from .profiler import Profile, profile
+from .debugger import Condition, DebugSession, DebugState, debug
+import importlib
+
+# Loaded on first access instead of by 'import urm': the batch evaluator needs NumPy, the parallel
+# runner multiprocessing and the GUI the web stack, none of which plain simulation uses.
+_LAZY = {
+    'batch': ('.batch', None),
+    'URMBatchResult': ('.batch', 'URMBatchResult'),
+    'forward_batch': ('.batch', 'forward_batch'),
+    'parallel': ('.parallel', None),
+    'gui': ('.gui', None),
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name, attribute = _LAZY[name]
+    module = importlib.import_module(module_name, __name__)
+    value = module if attribute is None else getattr(module, attribute)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
@@ -0,0 +1,223 @@
+"""
+Static analysis of URM programs, compiling them once into a checked, directly executable form.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Tuple
+
+from .urm_simulation import Instructions, Registers, SparseRegisters, URMResult, URMSimulator
+from .urm_simulation import OP_Z, OP_S, OP_C, OP_J, OP_END, OP_DIVERGE
+
+
+@dataclass(frozen=True)
+class BasicBlock(object):
+    """
+    A maximal run of lines only entered at its first line and only left from its last one.
+    """
+    start: int  # Zero-based index of the first line
+    end: int  # Zero-based index one past the last line
+    successors: Tuple[int, ...]  # First lines of the blocks it continues to; n is END, n + 1 leaves unchecked
+
+
+@dataclass(frozen=True)
+class CompiledProgram(object):
+    """
+    The result of 'analyze': a URM program with its jump targets resolved and its structure worked out.
+
+    'table' is the decoded program, in which every line the program can no longer halt from is marked
+    so that a run stops there at once with the SafetyLimitExceeded naive execution would eventually
+    raise. 'run' checks the registers once against 'num_registers' and then executes the table with no
+    further checks than the safety count.
+    """
+    instructions: Instructions
+    table: Tuple[Tuple[int, int, int, int], ...]
+    num_registers: int  # Registers needed to address every register the program uses
+    reads: FrozenSet[int]
+    writes: FrozenSet[int]
+    successors: Tuple[Tuple[int, ...], ...]  # The lines each line may continue to
+    blocks: Tuple[BasicBlock, ...]
+    unreachable: Tuple[int, ...]  # Lines no run can reach
+    never_halts: FrozenSet[int]  # Lines from which no run can halt
+    infinite_loops: Tuple[Tuple[int, ...], ...]  # Reachable cycles no run can leave, as sorted lines
+
+    @property
+    def halts(self) -> bool:
+        """
+        False if the program cannot halt on any input.
+        """
+        return 0 not in self.never_halts
+
+    def run(self, param: Dict[int, int] = None, initial_registers: Registers = None,
+            safety_count: int = 1000) -> URMResult:
+        """
+        Execute the program like 'urm.run'.
+
+        :param param: A dictionary mapping register indices (int) to their input values (int).
+        :param initial_registers: The initial registers, copied and left unmodified. Defaults to
+                                  'num_registers' zeroed registers.
+        :param safety_count: An integer specifying the maximum number of steps to simulate.
+
+        :raises ValueError: If the registers cannot hold every register the program uses, even one
+                            that would not be reached.
+        """
+        if initial_registers is None:
+            initial_registers = Registers.allocate(self.num_registers)
+        registers = URMSimulator._prepare_registers(param, initial_registers, self.instructions, sparse=True)
+        sparse = isinstance(registers, SparseRegisters)
+        if not sparse and len(registers) < self.num_registers:
+            raise ValueError("The number of registers requested cannot satisfy this set of instructions.")
+        values = registers.values if sparse else list(registers.registers)
+        num_of_steps = URMSimulator._execute_table(self.table, values, safety_count=safety_count)
+        if num_of_steps == 0:
+            last_registers = None
+        else:
+            last_registers = registers if sparse else Registers(values)
+        return URMResult(ops_from_steps=[], registers_from_steps=[], last_registers=last_registers,
+                         num_of_steps=num_of_steps)
+
+
+def _successors(table: Tuple[Tuple[int, int, int, int], ...]) -> Tuple[Tuple[int, ...], ...]:
+    successors = []
+    for line, (op, a, b, target) in enumerate(table):
+        if op == OP_J:
+            # J(k, k, q) always jumps; other tests may go either way.
+            successors.append((target,) if a == b or target == line + 1 else (target, line + 1))
+        elif op == OP_END:
+            successors.append(())
+        else:
+            successors.append((target,))
+    return tuple(successors)
+
+
+def _reachable(successors: Tuple[Tuple[int, ...], ...]) -> set:
+    n = len(successors)
+    seen = {0} if n else set()
+    stack = list(seen)
+    while stack:
+        for successor in successors[stack.pop()]:
+            if successor < n and successor not in seen:
+                seen.add(successor)
+                stack.append(successor)
+    return seen
+
+
+def _can_halt(table, successors: Tuple[Tuple[int, ...], ...]) -> set:
+    n = len(successors)
+    predecessors: List[List[int]] = [[] for _ in range(n)]
+    halting = set()
+    for line, targets in enumerate(successors):
+        if table[line][0] == OP_END or any(target >= n for target in targets):
+            halting.add(line)
+        for target in targets:
+            if target < n:
+                predecessors[target].append(line)
+    stack = list(halting)
+    while stack:
+        for predecessor in predecessors[stack.pop()]:
+            if predecessor not in halting:
+                halting.add(predecessor)
+                stack.append(predecessor)
+    return halting
+
+
+def _closed_cycles(successors: Tuple[Tuple[int, ...], ...], lines: set) -> List[Tuple[int, ...]]:
+    """
+    The strongly connected components of 'lines' that no edge leaves, by Tarjan's algorithm.
+    """
+    index: Dict[int, int] = {}
+    low: Dict[int, int] = {}
+    on_stack = set()
+    stack: List[int] = []
+    components = []
+    for root in sorted(lines):
+        if root in index:
+            continue
+        work = [(root, 0)]
+        while work:
+            line, i = work.pop()
+            if i == 0:
+                index[line] = low[line] = len(index)
+                stack.append(line)
+                on_stack.add(line)
+            targets = successors[line]
+            if i < len(targets):
+                work.append((line, i + 1))
+                target = targets[i]
+                if target not in index:
+                    work.append((target, 0))
+                elif target in on_stack:
+                    low[line] = min(low[line], index[target])
+                continue
+            if low[line] == index[line]:
+                component = set()
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.add(member)
+                    if member == line:
+                        break
+                components.append(component)
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[line])
+    return [tuple(sorted(component)) for component in components
+            if all(target in component for line in component for target in successors[line])]
+
+
+def analyze(instructions: Instructions) -> CompiledProgram:
+    """
+    Analyses a URM program once, so that it can be checked and run without any per-line work.
+
+    All jump targets are resolved to absolute line indices, the registers read and written are
+    collected, and the program is split into basic blocks linked by its control-flow graph. From the
+    graph, the analysis finds the lines no run can reach and the lines from which no run can halt,
+    such as an unconditional jump to itself or a cycle of jumps with no exit, whatever the registers.
+
+    :param instructions: An Instructions object representing a URM program.
+    :return: A frozen CompiledProgram.
+
+    Raises:
+        ValueError: If an instruction is malformed or jumps to a negative line.
+    """
+    table = URMSimulator.decode(instructions)
+    n = len(table)
+    successors = _successors(table)
+
+    reads, writes, used = set(), set(), [-1]
+    for op, a, b, _ in table:
+        if op == OP_Z:
+            writes.add(a)
+        elif op == OP_S:
+            reads.add(a)
+            writes.add(a)
+        elif op == OP_C:
+            reads.add(a)
+            writes.add(b)
+        elif op == OP_J and a != b:
+            reads.update((a, b))
+        if op in (OP_Z, OP_S):
+            used.append(a)
+        elif op in (OP_C, OP_J):
+            used += [a, b]
+    # A negative index -k addresses the k-th register from the end, so it needs k registers.
+    num_registers = max(r + 1 if r >= 0 else -r for r in used) if len(used) > 1 else 0
+
+    leaders = {0} if n else set()
+    for line, (op, _, _, _) in enumerate(table):
+        if op not in (OP_Z, OP_S, OP_C):
+            leaders.update(target for target in successors[line] if target < n)
+            if line + 1 < n:
+                leaders.add(line + 1)
+    starts = sorted(leaders)
+    blocks = tuple(BasicBlock(start=start, end=end, successors=successors[end - 1])
+                   for start, end in zip(starts, starts[1:] + [n]))
+
+    reachable = _reachable(successors)
+    never_halts = frozenset(range(n)) - _can_halt(table, successors)
+    infinite_loops = tuple(sorted(_closed_cycles(successors, never_halts & reachable)))
+    marked = tuple((OP_DIVERGE, 0, 0, line) if line in never_halts else entry for line, entry in enumerate(table))
+
+    return CompiledProgram(instructions=instructions, table=marked, num_registers=num_registers,
+                           reads=frozenset(reads), writes=frozenset(writes), successors=successors,
+                           blocks=blocks, unreachable=tuple(line for line in range(n) if line not in reachable),
+                           never_halts=never_halts, infinite_loops=infinite_loops)
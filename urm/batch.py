@@ -0,0 +1,131 @@
+"""
+Lockstep evaluation of one URM program over many inputs, backed by NumPy.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Union
+
+from .urm_simulation import Instructions, Registers, SparseRegisters, URMResult, URMSimulator, SafetyLimitExceeded
+from .urm_simulation import OP_Z, OP_S, OP_C, OP_J, OP_END
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is an optional dependency, see the 'batch' extra
+    np = None
+
+
+@dataclass
+class URMBatchResult(object):
+    """
+    Store the results of running one URM program over a batch of inputs, one row per input.
+    """
+    num_of_steps: "np.ndarray"  # Steps executed by each row
+    last_registers: "np.ndarray"  # Registers of each row when it halted or exceeded its safety count
+    exceeded: "np.ndarray"  # True for the rows that exceeded their safety count
+
+    def __len__(self):
+        return len(self.num_of_steps)
+
+    def result(self, index: int) -> URMResult:
+        """
+        The result of one row, as 'URMSimulator.run_fast' would have returned it.
+
+        :raises SafetyLimitExceeded: If the row exceeded its safety count.
+        """
+        if self.exceeded[index]:
+            raise SafetyLimitExceeded(num_of_steps=int(self.num_of_steps[index]))
+        num_of_steps = int(self.num_of_steps[index])
+        last_registers = Registers([int(v) for v in self.last_registers[index]]) if num_of_steps > 0 else None
+        return URMResult(ops_from_steps=[], registers_from_steps=[], last_registers=last_registers,
+                         num_of_steps=num_of_steps)
+
+
+def forward_batch(instructions: Instructions, inputs: Sequence[Dict[int, int]],
+                  initial_registers: Registers = None,
+                  safety_count: Union[int, Sequence[int]] = 1000) -> URMBatchResult:
+    """
+    Executes one URM program over a batch of inputs in lockstep.
+
+    The registers of all inputs are held in a 2-D array (inputs x registers) with a program counter
+    per row. Each round, the running rows are grouped by their current line and every group executes
+    its instruction as a single array operation, so the interpreter dispatch is paid once per line
+    rather than once per input. Rows retire as soon as they halt or exceed their safety count; unlike
+    'forward', exceeding the safety count does not raise but is reported per row.
+
+    :param instructions: An Instructions object representing the set of URM instructions to be executed.
+    :param inputs: A sequence of dictionaries, one per row, mapping register indices to input values.
+    :param initial_registers: A Registers object the inputs are applied to. Defaults to zeroed registers
+                              covering every register used by the instructions. SparseRegisters are
+                              expanded to dense registers covering them first.
+    :param safety_count: The maximum number of steps to simulate, either for all rows or one per row.
+
+    :return: An URMBatchResult object with the step count, final registers and overflow flag of each row.
+
+    Raises:
+        ImportError: If NumPy is not installed.
+        ValueError: If the registers cannot hold every register used by the instructions.
+    """
+    if np is None:
+        raise ImportError("forward_batch requires NumPy, install it with 'pip install urm[batch]'.")
+    highest = instructions.haddr()
+    if initial_registers is None:
+        initial_registers = Registers.allocate(highest + 1 if highest is not None else 0)
+    if isinstance(initial_registers, SparseRegisters):
+        initial_registers = initial_registers.dense(highest + 1 if highest is not None else 0)
+    if highest is not None and len(initial_registers) <= highest:
+        raise ValueError("The number of registers requested cannot satisfy this set of instructions.")
+
+    rows: List[List[int]] = []
+    for param in inputs:
+        rows.append(URMSimulator._prepare_registers(param, initial_registers, instructions).registers)
+    batch = len(rows)
+    registers = np.array(rows, dtype=np.int64).reshape(batch, len(initial_registers))
+    limits = np.broadcast_to(np.asarray(safety_count, dtype=np.int64), (batch,))
+
+    table = URMSimulator.decode(instructions)
+    n = len(table)
+    pc = np.zeros(batch, dtype=np.int64)
+    steps = np.zeros(batch, dtype=np.int64)
+    exceeded = np.zeros(batch, dtype=bool)
+    running = np.arange(batch)
+
+    while running.size:
+        # Same checks as the top of the interpreter loop: leave past the end, overflow at or before it.
+        line_of = pc[running]
+        over = (steps[running] > limits[running]) & (line_of <= n)
+        exceeded[running[over]] = True
+        keep = ~over & (line_of < n)
+        running = running[keep]
+        if not running.size:
+            break
+        line_of = line_of[keep]
+
+        order = np.argsort(line_of, kind='stable')
+        running, line_of = running[order], line_of[order]
+        starts = np.flatnonzero(np.r_[True, line_of[1:] != line_of[:-1]])
+        ends = np.r_[starts[1:], running.size]
+        halted = []
+        for start, end in zip(starts, ends):
+            line = int(line_of[start])
+            rows_at = running[start:end]
+            op, a, b, target = table[line]
+            if op == OP_S:
+                registers[rows_at, a] += 1
+                pc[rows_at] = target
+            elif op == OP_J:
+                equal = registers[rows_at, a] == registers[rows_at, b]
+                pc[rows_at] = np.where(equal, target, line + 1)
+            elif op == OP_Z:
+                registers[rows_at, a] = 0
+                pc[rows_at] = target
+            elif op == OP_C:
+                registers[rows_at, b] = registers[rows_at, a]
+                pc[rows_at] = target
+            elif op == OP_END:
+                halted.append(rows_at)
+                continue
+            steps[rows_at] += 1
+        if halted:
+            running = np.setdiff1d(running, np.concatenate(halted), assume_unique=True)
+
+    return URMBatchResult(num_of_steps=steps, last_registers=registers, exceeded=exceeded)
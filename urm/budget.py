@@ -0,0 +1,118 @@
+"""
+Wall-clock budgets and cooperative cancellation of URM runs.
+"""
+
+import threading
+import time
+from typing import Dict, List, Union
+
+from .urm_simulation import Registers, SparseRegisters
+
+
+class RunInterrupted(RuntimeError):
+    """
+    Raised when a run is stopped by its Budget before it halts.
+
+    'num_of_steps' is the number of steps executed, 'line' the zero-based line the run would have
+    continued from and 'registers' a copy of the registers at that point. When raised by 'forward',
+    'trace' holds the trace policy of the run, as for SafetyLimitExceeded.
+    """
+
+    def __init__(self, message: str, num_of_steps: int, line: int, registers: Registers, trace=None):
+        super().__init__(message)
+        self.num_of_steps = num_of_steps
+        self.line = line
+        self.registers = registers
+        self.trace = trace
+
+
+class RunTimeout(RunInterrupted, TimeoutError):
+    """
+    Raised when a run exceeds the wall-clock time of its Budget.
+    """
+
+
+class RunCancelled(RunInterrupted):
+    """
+    Raised when the CancellationToken of a run's Budget is cancelled.
+    """
+
+
+class CancellationToken(object):
+    """
+    A flag another thread sets to stop the runs it was given to, e.g. when their client disconnects.
+    """
+
+    def __init__(self, event=None):
+        """
+        :param event: The event the flag is kept in, e.g. a 'multiprocessing.Manager().Event()' to stop a
+                      run in another process. Defaults to a new 'threading.Event'.
+        """
+        self._event = event if event is not None else threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+
+class Budget(object):
+    """
+    Limits on a run beyond its safety count, checked every 'interval' steps.
+
+    The executors fold the check into their safety check, so a run with a budget executes its steps
+    as fast as one without; 'interval' only bounds how late a timeout or a cancellation is noticed.
+    The time limit is measured from the start of each run the budget is given to.
+    """
+
+    def __init__(self, seconds: float = None, token: CancellationToken = None, interval: int = 10000):
+        """
+        :param seconds: The wall-clock time a run may take, or None for no limit.
+        :param token: A CancellationToken stopping the run once cancelled.
+        :param interval: The number of steps between two checks.
+        """
+        if interval < 1:
+            raise ValueError("The check interval must be at least one step.")
+        self.seconds = seconds
+        self.token = token
+        self.interval = interval
+        self.deadline = None
+
+    def start(self):
+        self.deadline = time.monotonic() + self.seconds if self.seconds is not None else None
+
+    def check(self, num_of_steps: int, line: int, values: Union[List[int], Dict[int, int]]):
+        """
+        Raise RunCancelled or RunTimeout if the run must stop.
+
+        :param values: The register values of the run, a list or, for sparse registers, a dictionary.
+        """
+        if self.token is not None and self.token.cancelled:
+            raise RunCancelled(f"The run was cancelled after {num_of_steps} steps.", num_of_steps, line,
+                               _snapshot(values))
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise RunTimeout(f"The run exceeded its time limit of {self.seconds} s after {num_of_steps} steps.",
+                             num_of_steps, line, _snapshot(values))
+
+
+class _CallBudget(Budget):
+    """
+    The view of a started Budget given to the memoised function calls of its run. It stops a call on
+    the budget's timeout or cancellation, but never restarts its clock, and it skips whatever else the
+    budget does on a check, such as saving a Checkpoint, since the state of a call is not the run's.
+    """
+
+    def __init__(self, budget: Budget):
+        super().__init__(seconds=budget.seconds, token=budget.token, interval=budget.interval)
+        self.deadline = budget.deadline
+
+    def start(self):
+        pass
+
+
+def _snapshot(values: Union[List[int], Dict[int, int]]) -> Registers:
+    if isinstance(values, dict):
+        return SparseRegisters(dict(values))
+    return Registers(list(values))
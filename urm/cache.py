@@ -0,0 +1,244 @@
+"""
+Content-addressed cache of URM run results.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict
+
+from .urm_simulation import Instructions, Registers, SparseRegisters, URMResult, URMSimulator, SafetyLimitExceeded
+from .trace import TracePolicy, FullTrace, FinalTrace
+from .cycles import NonTerminating
+
+_CACHEABLE_TRACES = ('full', 'final', 'none')
+
+
+def program_key(instructions: Instructions, traced: bool = True) -> list:
+    """
+    A canonical, JSON-serialisable form of a URM program, independent of how it was built.
+
+    :param traced: If False, the program is normalised to its decoded form, in which jumps with
+                   equivalent targets are identical. Traced runs keep the targets as written, since
+                   they show up in the op strings.
+    """
+    if not traced:
+        return [list(entry) for entry in URMSimulator.decode(instructions)]
+    return [[str(instruction[0])] + [int(arg) for arg in instruction[1:]] for instruction in instructions]
+
+
+def result_key(program: list, registers: Registers, safety_count: int, mode: str) -> str:
+    """
+    The SHA-256 hex digest identifying a run of a program from 'registers'.
+
+    :param program: The program, as returned by 'program_key'.
+    :param registers: The registers once the input parameters have been applied. SparseRegisters are
+                      keyed on the registers they hold, which 'mode' must tell apart from dense ones.
+    :param mode: How the run is executed and traced, e.g. "full" for a fully traced 'forward'.
+    """
+    if isinstance(registers, SparseRegisters):
+        values = [[int(index), int(value)] for index, value in sorted(registers.values.items())]
+    else:
+        values = [int(v) for v in registers.registers]
+    canonical = json.dumps({
+        "program": program,
+        "registers": values,
+        "safety_count": safety_count,
+        "mode": mode,
+    }, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ResultCache(object):
+    """
+    An LRU cache of URM run results keyed on the program, the initial registers and the safety count.
+
+    Entries are kept as immutable tuples and every hit builds a fresh URMResult, so callers cannot
+    corrupt the cache by modifying a result. Exceeded safety counts are cached as well and raised
+    again on a hit, as a NonTerminating if cycle detection found them. The cache is bounded by both
+    its number of entries and their size in bytes, estimated from their number of steps and registers
+    rather than by serialising them; with 'path', entries are also persisted as JSON files in that
+    directory and found there by later processes. A file that cannot be read counts as a miss.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024, path: str = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "bytes": self.bytes}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.json")
+
+    def get(self, key: str):
+        """
+        The entry stored under 'key', or None. Counts a hit or a miss.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+        if self.path is not None and os.path.exists(self._file(key)):
+            try:
+                with open(self._file(key), 'rb') as f:
+                    data = f.read()
+                entry = _entry_from_json(json.loads(data.decode('utf-8')))
+            except (OSError, ValueError, TypeError):
+                # Removed or unreadable, e.g. written by a version with another format: the run is executed again.
+                entry = None
+            if entry is not None:
+                self._store(key, entry, _entry_size(entry))
+                with self._lock:
+                    self.hits += 1
+                return entry
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, entry: tuple):
+        if self.path is not None:
+            # Written under a name of its own and then replaced atomically, so that a reader never sees a
+            # partial file, even from another thread or process writing the same key.
+            temporary = f"{self._file(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporary, 'wb') as f:
+                f.write(json.dumps(entry, separators=(',', ':')).encode('utf-8'))
+            os.replace(temporary, self._file(key))
+        self._store(key, entry, _entry_size(entry))
+
+    def _store(self, key: str, entry: tuple, size: int):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (entry, size)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self.bytes -= self._entries.popitem(last=False)[1][1]
+
+    def forward(self, param: Dict[int, int], initial_registers: Registers, instructions: Instructions,
+                safety_count: int = 1000, trace="full", detect_cycles: bool = False, budget=None) -> URMResult:
+        """
+        'forward' through the cache. Only the "full", "final" and "none" trace policies can be cached,
+        None being "none". A run stopped by its budget is not cached.
+        """
+        if trace is None:
+            trace = "none"
+        if trace not in _CACHEABLE_TRACES:
+            raise ValueError(f"Only the {', '.join(_CACHEABLE_TRACES)} trace policies can be cached")
+        registers = URMSimulator._prepare_registers(param, initial_registers, instructions)
+        mode = trace + ("+cycles" if detect_cycles else "")
+        key = result_key(program_key(instructions), registers, safety_count, mode)
+        return self._lookup(key, lambda: URMSimulator.forward(None, registers, instructions,
+                                                              safety_count=safety_count, trace=trace,
+                                                              detect_cycles=detect_cycles, budget=budget))
+
+    def run(self, param: Dict[int, int], initial_registers: Registers, instructions: Instructions,
+            safety_count: int = 1000, accelerate: bool = False, memoize: bool = False,
+            detect_cycles: bool = False, budget=None) -> URMResult:
+        """
+        'run' through the cache. Accelerated and memoised runs have entries of their own, since cycle
+        detection may find a cycle at another step in them. SparseRegisters give SparseRegisters back,
+        as with 'run'.
+        """
+        registers = URMSimulator._prepare_registers(param, initial_registers, instructions, sparse=True)
+        sparse = isinstance(registers, SparseRegisters)
+        mode = "fast" + "".join(f"+{flag}" for flag, used in (("sparse", sparse), ("accelerate", accelerate),
+                                                              ("memoize", memoize), ("cycles", detect_cycles))
+                                if used)
+        key = result_key(program_key(instructions, traced=False), registers, safety_count, mode)
+        return self._lookup(key, lambda: URMSimulator.run_fast(None, registers, instructions,
+                                                               safety_count=safety_count, accelerate=accelerate,
+                                                               memoize=memoize, detect_cycles=detect_cycles,
+                                                               budget=budget), sparse=sparse)
+
+    def _lookup(self, key: str, execute, sparse: bool = False) -> URMResult:
+        entry = self.get(key)
+        if entry is None:
+            try:
+                entry = _entry_from_result(execute())
+            except NonTerminating as e:
+                entry = ('exceeded', str(e), e.num_of_steps, e.first_step, e.line)
+            except SafetyLimitExceeded as e:
+                entry = ('exceeded', str(e), e.num_of_steps)
+            self.put(key, entry)
+        return _result_from_entry(entry, sparse)
+
+
+_POLICIES = {'full': FullTrace, 'final': FinalTrace, 'none': TracePolicy}
+
+
+def _entry_from_result(result: URMResult) -> tuple:
+    kind, entries = None, ()
+    if result.trace is not None:
+        kind = next(name for name, policy in _POLICIES.items() if type(result.trace) is policy)
+        entries = tuple((step, line, tuple(instruction) if instruction is not None else None, tuple(values))
+                        for step, line, instruction, values in result.trace.entries)
+    last = result.last_registers
+    if isinstance(last, SparseRegisters):
+        # The registers that hold a value, as (index, value) pairs.
+        last = tuple(sorted(last.values.items()))
+    elif last is not None:
+        last = tuple(last.registers)
+    return 'ok', result.num_of_steps, kind, entries, last
+
+
+def _entry_size(entry: tuple) -> int:
+    # About the size of the entry in memory: a tuple per step, holding 8-byte references and small
+    # integers, and a tuple of register values per step.
+    if entry[0] == 'exceeded':
+        return 64 + len(entry[1])
+    _, _, _, entries, last = entry
+    width = len(entries[0][3]) if entries else 0
+    return 64 + len(entries) * (96 + 8 * width) + 8 * len(last or ())
+
+
+def _entry_from_json(data: list) -> tuple:
+    if data[0] == 'exceeded':
+        return tuple(data)
+    status, num_of_steps, kind, entries, last = data
+    entries = tuple((step, line, tuple(instruction) if instruction is not None else None, tuple(values))
+                    for step, line, instruction, values in entries)
+    if last is not None:
+        last = tuple(tuple(value) if isinstance(value, list) else value for value in last)
+    return status, num_of_steps, kind, entries, last
+
+
+def _result_from_entry(entry: tuple, sparse: bool = False) -> URMResult:
+    if entry[0] == 'exceeded' and len(entry) > 3:
+        raise NonTerminating(first_step=entry[3], repeat_step=entry[2], line=entry[4])
+    if entry[0] == 'exceeded':
+        raise SafetyLimitExceeded(entry[1], num_of_steps=entry[2])
+    _, num_of_steps, kind, entries, last = entry
+    last_registers = None
+    if last is not None and sparse:
+        last_registers = SparseRegisters(dict(last))
+    elif last is not None:
+        last_registers = Registers(list(last))
+    if kind is None:
+        return URMResult(num_of_steps=num_of_steps, ops_from_steps=[], registers_from_steps=[],
+                         last_registers=last_registers)
+    policy = _POLICIES[kind]()
+    policy.entries = list(entries)
+    return URMResult(num_of_steps=num_of_steps, ops_from_steps=policy.ops_from_steps,
+                     registers_from_steps=policy.registers_from_steps, last_registers=last_registers, trace=policy)
@@ -0,0 +1,165 @@
+"""
+Checkpoints of long URM runs, saved to disk so that a run can be resumed in another process.
+"""
+
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Union
+
+from .urm_simulation import Instructions, Registers, SparseRegisters, URMResult, URMSimulator
+from .budget import Budget, CancellationToken, RunInterrupted, _snapshot
+from .cache import program_key
+
+_FORMAT = "urm-checkpoint"
+_VERSION = 1
+
+
+def program_hash(instructions: Instructions) -> str:
+    """
+    The SHA-256 hex digest of a program's decoded form, shared by programs that execute identically.
+    """
+    canonical = json.dumps(program_key(instructions, traced=False), separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+@dataclass(frozen=True)
+class Checkpoint(object):
+    """
+    The state of a run between two steps: the line about to be executed, the registers and the
+    number of steps executed so far, with the program it belongs to.
+    """
+    program: tuple  # The instructions, as tuples
+    program_hash: str
+    line: int  # Zero-based; len(program) is the END line
+    num_of_steps: int
+    registers: Registers  # A SparseRegisters for runs on sparse registers
+    safety_count: int
+
+    def instructions(self) -> Instructions:
+        return Instructions(*self.program)
+
+    def save(self, path: str):
+        """
+        Write the checkpoint as compact JSON, replacing 'path' atomically so that a crash while
+        saving leaves the previous checkpoint intact.
+        """
+        data = {
+            "format": _FORMAT,
+            "version": _VERSION,
+            "program": [list(instruction) for instruction in self.program],
+            "program_hash": self.program_hash,
+            "line": self.line,
+            "num_of_steps": self.num_of_steps,
+            "safety_count": self.safety_count,
+        }
+        if isinstance(self.registers, SparseRegisters):
+            data["sparse"] = sorted(self.registers.values.items())
+        else:
+            data["registers"] = list(self.registers.registers)
+        temporary = f"{path}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(temporary, path)
+
+    @staticmethod
+    def load(path: str) -> "Checkpoint":
+        """
+        Read a checkpoint written by 'Checkpoint.save'.
+        """
+        with open(path) as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or data.get("format") != _FORMAT:
+            raise ValueError(f"{path} is not a URM checkpoint file")
+        if data["version"] != _VERSION:
+            raise ValueError(f"Unsupported checkpoint version: {data['version']}")
+        if "sparse" in data:
+            registers = SparseRegisters({index: value for index, value in data["sparse"]})
+        else:
+            registers = Registers(data["registers"])
+        return Checkpoint(program=tuple(tuple(instruction) for instruction in data["program"]),
+                          program_hash=data["program_hash"], line=data["line"], num_of_steps=data["num_of_steps"],
+                          registers=registers, safety_count=data["safety_count"])
+
+
+class Checkpointer(Budget):
+    """
+    A Budget that also saves a Checkpoint of the run to 'path' every 'every' seconds.
+
+    Like any budget it is given to 'run', 'forward' or 'resume' and checked every 'interval' steps.
+    A run it stops on a timeout or a cancellation is checkpointed first, so 'resume' picks it up
+    exactly where it stopped; 'checkpoint' is the last one saved.
+    """
+
+    def __init__(self, path: str, instructions: Instructions, safety_count: int = 1000, every: float = 60.0,
+                 seconds: float = None, token: CancellationToken = None, interval: int = 10000):
+        """
+        :param path: The file the checkpoints are written to, each replacing the previous one.
+        :param instructions: The program being run.
+        :param safety_count: The safety count of the run, kept in the checkpoints as the default for 'resume'.
+        :param every: The wall-clock time between two checkpoints, in seconds.
+        """
+        super().__init__(seconds=seconds, token=token, interval=interval)
+        self.path = path
+        self.program = tuple(tuple(instruction) for instruction in instructions)
+        self.program_hash = program_hash(instructions)
+        self.safety_count = safety_count
+        self.every = every
+        self.checkpoint = None
+        self.next_save = None
+
+    def start(self):
+        super().start()
+        self.next_save = time.monotonic() + self.every
+
+    def check(self, num_of_steps, line, values):
+        try:
+            super().check(num_of_steps, line, values)
+        except RunInterrupted:
+            self.save(num_of_steps, line, values)
+            raise
+        if time.monotonic() >= self.next_save:
+            self.save(num_of_steps, line, values)
+            self.next_save = time.monotonic() + self.every
+
+    def save(self, num_of_steps: int, line: int, values) -> Checkpoint:
+        """
+        Save the state of the run after 'num_of_steps' steps, about to execute 'line'.
+        """
+        self.checkpoint = Checkpoint(program=self.program, program_hash=self.program_hash, line=line,
+                                     num_of_steps=num_of_steps, registers=_snapshot(values),
+                                     safety_count=self.safety_count)
+        self.checkpoint.save(self.path)
+        return self.checkpoint
+
+
+def resume(checkpoint: Union[Checkpoint, str], instructions: Instructions = None, safety_count: int = None,
+           accelerate: bool = False, memoize: bool = False, detect_cycles: bool = False,
+           budget: Budget = None) -> URMResult:
+    """
+    Continues a run from a checkpoint, giving the result the uninterrupted run would have given.
+
+    The run continues on the fast path of 'urm.run', whichever of 'run' and 'forward' it was started
+    with; the step count of the result includes the steps taken before the checkpoint.
+
+    :param checkpoint: A Checkpoint, or the path of a checkpoint file.
+    :param instructions: The program, checked against the checkpoint. Defaults to the program saved
+                         in the checkpoint; memoised calls are only kept by passing the program.
+    :param safety_count: Defaults to the safety count saved in the checkpoint.
+    :param budget: An optional Budget, e.g. a new Checkpointer to keep saving checkpoints.
+
+    :raises ValueError: If 'instructions' is not the program the checkpoint was taken from.
+    """
+    if isinstance(checkpoint, str):
+        checkpoint = Checkpoint.load(checkpoint)
+    if instructions is None:
+        instructions = checkpoint.instructions()
+    elif program_hash(instructions) != checkpoint.program_hash:
+        raise ValueError("The checkpoint was taken from a different program.")
+    if safety_count is None:
+        safety_count = checkpoint.safety_count
+    return URMSimulator.run_fast(None, checkpoint.registers, instructions, safety_count=safety_count,
+                                 accelerate=accelerate, memoize=memoize, detect_cycles=detect_cycles, budget=budget,
+                                 start=(checkpoint.line, checkpoint.num_of_steps))
@@ -0,0 +1,159 @@
+"""
+Compilation of URM programs into specialised Python functions.
+"""
+
+import functools
+from typing import Dict, List, Tuple
+
+from .urm_simulation import Instructions, Registers, SparseRegisters, URMResult, URMSimulator, SafetyLimitExceeded
+from .urm_simulation import OP_Z, OP_S, OP_C, OP_J, OP_END
+
+_INDENT = "    "
+
+
+def _name(register: int) -> str:
+    # Negative indices get names of their own; programs using them are never run compiled.
+    return f"r{register}" if register >= 0 else f"r_{-register}"
+
+
+def _blocks(table: Tuple[Tuple[int, int, int, int], ...]) -> List[Tuple[int, int]]:
+    n = len(table)
+    leaders = {0}
+    for line, (op, _, _, target) in enumerate(table):
+        if op in (OP_Z, OP_S, OP_C):
+            continue
+        if op == OP_J and target < n:
+            leaders.add(target)
+        if line + 1 < n:
+            leaders.add(line + 1)
+    starts = sorted(leaders)
+    return list(zip(starts, starts[1:] + [n]))
+
+
+def _block_source(table, start: int, end: int, indent: str) -> List[str]:
+    n = len(table)
+    lines = [f"{indent}# Lines {start}-{end - 1}"]
+    op = table[end - 1][0]
+    if op not in (OP_Z, OP_S, OP_C, OP_J, OP_END):
+        # An unrecognised op counts a step without ever advancing.
+        return lines + [f"{indent}raise SafetyLimitExceeded(num_of_steps=max(count, safety_count + 1))"]
+    # Each line of the block, an END included, is checked against the safety count before it runs,
+    # at counts count .. count + end - start - 1; the first failing check is at the larger of count
+    # and safety_count + 1.
+    steps = end - start - (op == OP_END)
+    lines += [f"{indent}if count + {end - start - 1} > safety_count:",
+              f"{indent}{_INDENT}raise SafetyLimitExceeded(num_of_steps=max(count, safety_count + 1))"]
+    for line in range(start, end):
+        op, a, b, target = table[line]
+        if op == OP_Z:
+            lines.append(f"{indent}{_name(a)} = 0")
+        elif op == OP_S:
+            lines.append(f"{indent}{_name(a)} += 1")
+        elif op == OP_C:
+            lines.append(f"{indent}{_name(b)} = {_name(a)}")
+    if steps:
+        lines.append(f"{indent}count += {steps}")
+    op, a, b, target = table[end - 1]
+    if op == OP_J and a != b and target != end:
+        lines.append(f"{indent}pc = {target} if {_name(a)} == {_name(b)} else {end}")
+    elif op == OP_J:
+        lines.append(f"{indent}pc = {target}")
+    elif op == OP_END:
+        lines.append(f"{indent}pc = {n + 1}")
+    else:
+        lines.append(f"{indent}pc = {end}")
+    return lines
+
+
+def _dispatch_source(table, blocks: List[Tuple[int, int]], indent: str) -> List[str]:
+    # A balanced tree of comparisons finds the block of 'pc' in log(blocks) tests.
+    if len(blocks) == 1:
+        return _block_source(table, *blocks[0], indent)
+    middle = len(blocks) // 2
+    return ([f"{indent}if pc < {blocks[middle][0]}:"] + _dispatch_source(table, blocks[:middle], indent + _INDENT) +
+            [f"{indent}else:"] + _dispatch_source(table, blocks[middle:], indent + _INDENT))
+
+
+def generate_source(table: Tuple[Tuple[int, int, int, int], ...], name: str = "urm_program") -> str:
+    """
+    The Python source of a function 'name(values, safety_count)' running a decoded program.
+
+    Every register the program uses is held in a local variable, loaded from 'values' on entry, and
+    the ones it writes are stored back on return. The program is split into basic blocks, each executed as straight-line
+    code with a single safety check, and a 'while' loop moves from block to block on 'pc'. The
+    function returns the number of steps, exactly as 'URMSimulator._execute_table' would.
+    """
+    n = len(table)
+    used = sorted({a for op, a, _, _ in table if op in (OP_Z, OP_S, OP_C, OP_J)} |
+                  {b for op, _, b, _ in table if op in (OP_C, OP_J)})
+    body = [f"def {name}(values, safety_count):"]
+    body += [f"{_INDENT}{_name(r)} = values[{r}]" for r in used]
+    body += [f"{_INDENT}count = 0", f"{_INDENT}pc = 0"]
+    if n:
+        body.append(f"{_INDENT}while pc < {n}:")
+        body += _dispatch_source(table, _blocks(table), _INDENT * 2)
+    body += [f"{_INDENT}if pc == {n} and count > safety_count:",
+             f"{_INDENT * 2}raise SafetyLimitExceeded(num_of_steps=count)"]
+    written = sorted({a if op != OP_C else b for op, a, b, _ in table if op in (OP_Z, OP_S, OP_C)})
+    body += [f"{_INDENT}values[{r}] = {_name(r)}" for r in written]
+    body.append(f"{_INDENT}return count")
+    return "\n".join(body) + "\n"
+
+
+class PythonProgram(object):
+    """
+    A URM program compiled into a Python function by 'compile_to_python'.
+
+    Calling it runs the program like 'urm.run', with the same final registers, step count and
+    safety limit. Registers the program would address out of range (or by negative indices) make
+    the call fall back to the interpreter, so that it fails the way 'run' does, on the same line;
+    SparseRegisters, which grow as they are written, are run by the interpreter as well.
+    """
+
+    def __init__(self, instructions: Instructions, table: Tuple[Tuple[int, int, int, int], ...], source: str,
+                 function):
+        self.instructions = instructions
+        self.table = table
+        self.source = source
+        self.function = function
+        registers = [r for op, a, b, _ in table if op in (OP_Z, OP_S, OP_C, OP_J)
+                     for r in ((a, b) if op in (OP_C, OP_J) else (a,))]
+        self.lowest = min(registers, default=0)
+        self.highest = max(registers, default=-1)
+
+    def __call__(self, param: Dict[int, int] = None, initial_registers: Registers = None,
+                 safety_count: int = 1000) -> URMResult:
+        if initial_registers is None:
+            initial_registers = Registers.allocate(self.highest + 1)
+        registers = URMSimulator._prepare_registers(param, initial_registers, self.instructions, sparse=True)
+        if isinstance(registers, SparseRegisters) or self.lowest < 0 or self.highest >= len(registers):
+            return URMSimulator.run_fast(None, registers, self.instructions, safety_count=safety_count)
+        values = list(registers.registers)
+        num_of_steps = self.function(values, safety_count)
+        last_registers = Registers(values) if num_of_steps > 0 else None
+        return URMResult(ops_from_steps=[], registers_from_steps=[], last_registers=last_registers,
+                         num_of_steps=num_of_steps)
+
+
+@functools.lru_cache(maxsize=256)
+def _compile(table: Tuple[Tuple[int, int, int, int], ...]):
+    source = generate_source(table)
+    namespace = {"SafetyLimitExceeded": SafetyLimitExceeded}
+    exec(compile(source, "<urm_program>", "exec"), namespace)
+    return source, namespace["urm_program"]
+
+
+def compile_to_python(instructions: Instructions) -> PythonProgram:
+    """
+    Compiles a URM program into a specialised Python function, with its registers as local variables.
+
+    The generated code is cached on the decoded program, so compiling the same program again, or
+    one differing only in how its jumps to the end are written, reuses it.
+
+    :param instructions: An Instructions object representing a URM program.
+    :return: A PythonProgram, called like 'urm.run' without the instructions, whose 'source' is the
+             generated code.
+    """
+    table = URMSimulator.decode(instructions)
+    source, function = _compile(table)
+    return PythonProgram(instructions, table, source, function)
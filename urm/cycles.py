@@ -0,0 +1,84 @@
+"""
+Detection of URM runs that provably never halt, by finding a repeated machine state.
+"""
+
+from typing import Dict, List, Tuple, Union
+
+from .urm_simulation import SafetyLimitExceeded, OP_J, OP_END, OP_WATCH
+
+
+class NonTerminating(SafetyLimitExceeded):
+    """
+    Raised when a run reaches a state, i.e. a line and register values, it has already been in.
+
+    The machine is deterministic, so from then on it repeats the same 'repeat_step - first_step'
+    steps forever. 'num_of_steps' is the number of steps executed when the repeat was found.
+    """
+
+    def __init__(self, first_step: int, repeat_step: int, line: int, trace=None):
+        super().__init__(f"Provably non-terminating: the state at step {first_step} repeats at step {repeat_step} "
+                         f"(line {line}).", num_of_steps=repeat_step, trace=trace)
+        self.first_step = first_step
+        self.repeat_step = repeat_step
+        self.line = line
+
+
+def backward_jumps(table: Tuple[Tuple[int, int, int, int], ...]) -> set:
+    """
+    The lines of a decoded table continuing to themselves or to an earlier line, whatever their op, e.g.
+    the unrecognised ops that never advance as well as backward jumps.
+
+    Every other line continues forward, so every cycle of a run passes through one of these, and
+    observing the state only there is enough to find any repeat.
+    """
+    return {line for line, (op, _, _, target) in enumerate(table) if op != OP_END and target <= line}
+
+
+def watch_table(table: Tuple[Tuple[int, int, int, int], ...]) -> tuple:
+    """
+    The decoded table with its backward jumps marked with OP_WATCH, for '_execute_table' with a detector.
+
+    Lines already marked otherwise, e.g. the exit tests of accelerated loops, are left as they are, and
+    unrecognised ops are observed by '_execute_table' itself.
+    """
+    watched = backward_jumps(table)
+    return tuple((OP_WATCH, a, b, target) if line in watched and op == OP_J else (op, a, b, target)
+                 for line, (op, a, b, target) in enumerate(table))
+
+
+class CycleDetector(object):
+    """
+    Brent's cycle-finding algorithm over the states of a run, using constant memory.
+
+    A single state is kept. Every observed state is compared with it, and it is replaced by the
+    current state whenever the number of observations since it was taken reaches a power of two.
+    Once the run has entered a cycle of length L, the kept state is inside the cycle as soon as
+    that power reaches L, and the state L observations later is equal to it; a run that never
+    repeats a state costs one comparison per observation.
+    """
+
+    def __init__(self):
+        self.power = 1
+        self.length = 0
+        self.line = None
+        self.values = None
+        self.step = None
+
+    def observe(self, step: int, line: int, values: Union[List[int], Dict[int, int]]):
+        """
+        Compare the state at 'step' with the kept one.
+
+        :param step: The number of steps executed so far.
+        :param line: The line about to be executed.
+        :param values: The register values, a list or, for sparse registers, a dictionary.
+        :raises NonTerminating: If the state is the kept one.
+        """
+        if line == self.line and values == self.values:
+            raise NonTerminating(first_step=self.step, repeat_step=step, line=line)
+        self.length += 1
+        if self.length == self.power:
+            self.line = line
+            self.values = values.copy()
+            self.step = step
+            self.power *= 2
+            self.length = 0
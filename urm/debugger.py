@@ -0,0 +1,310 @@
+"""
+Step-through debugging of URM programs, executing only as many steps as are asked for.
+"""
+
+import bisect
+import operator
+import re
+import sys
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from .urm_simulation import Instructions, Registers, SafetyLimitExceeded, URMSimulator
+
+_COMPARISONS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<=': operator.le,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '>': operator.gt,
+}
+_CONDITION = re.compile(r"\s*R(\d+)\s*(==|!=|<=|>=|<|>)\s*(\d+)\s*", re.IGNORECASE)
+_INT_SIZE = sys.getsizeof(1)
+
+
+@dataclass(frozen=True)
+class Condition(object):
+    """
+    A register condition such as 'R1 >= 5', used as a breakpoint.
+    """
+    register: int
+    comparison: str
+    value: int
+
+    @staticmethod
+    def parse(text: str) -> 'Condition':
+        """
+        :raises ValueError: If 'text' is not of the form 'R<register> <comparison> <value>'.
+        """
+        match = _CONDITION.fullmatch(text)
+        if match is None:
+            raise ValueError(f"Invalid condition {text!r}, expected e.g. 'R1 >= 5'.")
+        return Condition(int(match.group(1)), match.group(2), int(match.group(3)))
+
+    def holds(self, values: List[int]) -> bool:
+        return _COMPARISONS[self.comparison](values[self.register], self.value)
+
+    def __str__(self):
+        return f"R{self.register} {self.comparison} {self.value}"
+
+
+@dataclass(frozen=True)
+class DebugState(object):
+    """
+    The state of a debug session between two steps.
+    """
+    num_of_steps: int
+    line: int  # Zero-based line about to be executed
+    op: Optional[str]  # The last executed instruction, as 'execute_instructions' reports it
+    registers: Registers
+    halted: bool
+    reason: str  # Why execution stopped: 'start', 'step', 'breakpoint', 'condition', 'halted' or 'error'
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "num_of_steps": self.num_of_steps,
+            "line": self.line,
+            "op": self.op,
+            "registers": self.registers.registers,
+            "halted": self.halted,
+            "reason": self.reason,
+            "error": self.error,
+        }
+
+
+class DebugSession(object):
+    """
+    A URM program paused between two steps, advanced on demand.
+
+    The session holds the live generator of 'execute_instructions' (without its per-step copy of the
+    registers), so stepping through the first steps of a long run never executes the rest of it.
+
+    Breakpoints are zero-based lines, hit before the line executes, and register conditions, hit on the
+    step that makes them true; a condition that stays true does not stop every following step.
+
+    'goto' travels back to any earlier step. The registers are saved every 'checkpoint_interval' steps
+    and an earlier step is reached by executing forward from the last checkpoint before it. The interval
+    starts at one step and doubles, dropping every other checkpoint, whenever the checkpoints outgrow
+    'memory_budget', so that it grows with the length of the run and the size of the registers. Going
+    back costs at most one interval of steps.
+    """
+
+    def __init__(self, instructions: Instructions, initial_registers: Registers, param: Dict[int, int] = None,
+                 safety_count: int = 1000, memory_budget: int = 64 * 1024 * 1024):
+        """
+        :param instructions: The program to debug.
+        :param initial_registers: The initial registers, left unchanged.
+        :param param: Optional inputs, as for 'forward'.
+        :param safety_count: The number of steps after which the program is stopped as for 'forward'.
+        :param memory_budget: The number of bytes the checkpoints of 'goto' may take, approximately.
+        """
+        self.instructions = instructions
+        self.safety_count = safety_count
+        self.registers = URMSimulator._prepare_registers(param, initial_registers, instructions)
+        self.breakpoints = set()
+        self.conditions = []
+        self.num_of_steps = 0
+        self.line = 0
+        self.instruction = None  # The last executed instruction
+        self.halted = False
+        self.error = None
+        self._steps = URMSimulator._steps(instructions, self.registers, safety_count)
+        self.memory_budget = memory_budget
+        self.checkpoint_interval = 1
+        # (num_of_steps, previous line, line, register values, size in bytes), by number of steps.
+        self._checkpoints = []
+        self._checkpoint_bytes = 0
+        self._checkpoint(-1)
+
+    def add_breakpoint(self, line: int):
+        if not 0 <= line < len(self.instructions):
+            raise ValueError(f"There is no line {line} to break at.")
+        self.breakpoints.add(line)
+
+    def add_condition(self, condition):
+        """
+        :param condition: A Condition or its text, e.g. 'R1 >= 5'.
+        """
+        condition = Condition.parse(condition) if isinstance(condition, str) else condition
+        self._check_register(condition)
+        self.conditions.append(condition)
+
+    def clear(self):
+        """
+        Remove every breakpoint and condition.
+        """
+        self.breakpoints.clear()
+        self.conditions.clear()
+
+    def _check_register(self, condition: Condition):
+        if condition.register >= len(self.registers):
+            raise ValueError(f"The condition {condition} tests a register the program does not have.")
+
+    @property
+    def op(self) -> Optional[str]:
+        # Formatted only when a state is reported, not on every step.
+        return URMSimulator.format_op(self.line, self.instruction) if self.instruction is not None else None
+
+    def state(self, reason: str = "step") -> DebugState:
+        return DebugState(num_of_steps=self.num_of_steps, line=self.line, op=self.op,
+                          registers=Registers(list(self.registers.registers)), halted=self.halted,
+                          reason="error" if self.error is not None else reason, error=self.error)
+
+    def _checkpoint(self, previous: int):
+        values = tuple(self.registers.registers)
+        # Estimated from the number of registers alone, as if every value were a small int object.
+        size = sys.getsizeof(values) + _INT_SIZE * len(values)
+        self._checkpoints.append((self.num_of_steps, previous, self.line, values, size))
+        self._checkpoint_bytes += size
+        while self._checkpoint_bytes > self.memory_budget and len(self._checkpoints) > 1:
+            self.checkpoint_interval *= 2
+            self._checkpoints = [checkpoint for checkpoint in self._checkpoints
+                                 if checkpoint[0] % self.checkpoint_interval == 0]
+            self._checkpoint_bytes = sum(checkpoint[4] for checkpoint in self._checkpoints)
+
+    def _finish(self):
+        # A halt is detected as soon as the next line is the END line, so the state is never reported as
+        # paused before a line that does not exist.
+        try:
+            next(self._steps, None)
+        except SafetyLimitExceeded as e:
+            self.error = str(e)
+        self.halted = True
+
+    def _advance(self) -> bool:
+        # One step; False once the program has halted.
+        previous = self.line
+        try:
+            self.line, instruction = next(self._steps)
+        except StopIteration:
+            self.halted = True
+            return False
+        except SafetyLimitExceeded as e:
+            self.halted = True
+            self.error = str(e)
+            return False
+        self.num_of_steps += 1
+        self.instruction = instruction
+        # Steps executed again after going back were saved the first time.
+        if self.num_of_steps % self.checkpoint_interval == 0 and self.num_of_steps > self._checkpoints[-1][0]:
+            self._checkpoint(previous)
+        if self.line >= len(self.instructions):
+            self._finish()
+        return not self.halted
+
+    def _run(self, max_steps: int = None, lines: Iterable[int] = (), conditions: Iterable[Condition] = (),
+             budget=None, breakpoints: bool = True) -> DebugState:
+        if self.halted:
+            return self.state("halted")
+        lines, conditions = set(lines), list(conditions)
+        if breakpoints:
+            lines, conditions = lines | self.breakpoints, self.conditions + conditions
+        for condition in conditions:
+            self._check_register(condition)
+        values = self.registers.registers
+        held = [condition.holds(values) for condition in conditions]
+        if budget is not None:
+            budget.start()
+        executed = 0
+        while max_steps is None or executed < max_steps:
+            if budget is not None and executed and executed % budget.interval == 0:
+                budget.check(self.num_of_steps, self.line, values)
+            steps_before = self.num_of_steps
+            advanced = self._advance()
+            if self.num_of_steps == steps_before:
+                return self.state("halted")
+            executed += 1
+            # The step that halts the program can still make a condition true.
+            if self.line in lines:
+                return self.state("breakpoint")
+            if conditions:
+                now = [condition.holds(values) for condition in conditions]
+                if any(holds and not before for holds, before in zip(now, held)):
+                    return self.state("condition")
+                held = now
+            if not advanced:
+                return self.state("halted")
+        return self.state("step")
+
+    def step(self, count: int = 1, budget=None) -> DebugState:
+        """
+        Execute 'count' steps, or fewer if the program halts first. Breakpoints are not checked.
+
+        :param budget: An optional 'urm.budget.Budget' limiting the time the steps may take.
+        :raises RunInterrupted: If the budget runs out; the session stays usable at the step reached.
+        """
+        if count < 1:
+            raise ValueError("At least one step must be executed.")
+        return self._run(max_steps=count, budget=budget, breakpoints=False)
+
+    def run_to(self, line: int = None, condition=None, budget=None) -> DebugState:
+        """
+        Execute until 'line' is about to run or 'condition' becomes true, stopping at the breakpoints on
+        the way, or until the program halts.
+
+        :param condition: A Condition or its text, e.g. 'R1 >= 5'.
+        :param budget: An optional 'urm.budget.Budget' limiting the time the steps may take.
+        :raises RunInterrupted: If the budget runs out; the session stays usable at the step reached.
+        """
+        if line is not None and not 0 <= line < len(self.instructions):
+            raise ValueError(f"There is no line {line} to run to.")
+        condition = Condition.parse(condition) if isinstance(condition, str) else condition
+        return self._run(lines=() if line is None else (line,), conditions=() if condition is None else (condition,),
+                         budget=budget)
+
+    def resume(self, budget=None) -> DebugState:
+        """
+        Execute until a breakpoint is hit or the program halts.
+
+        :param budget: An optional 'urm.budget.Budget' limiting the time the steps may take.
+        :raises RunInterrupted: If the budget runs out; the session stays usable at the step reached.
+        """
+        return self._run(budget=budget)
+
+    def goto(self, step: int, budget=None) -> DebugState:
+        """
+        Move to the state after 'step' steps, before or after the current one, or to the halt if the program
+        halts first. Breakpoints are not checked.
+
+        :param budget: An optional 'urm.budget.Budget' limiting the time the steps may take.
+        :raises RunInterrupted: If the budget runs out; the session stays usable at the step reached.
+        """
+        if step < 0:
+            raise ValueError("The step to go to cannot be negative.")
+        if step < self.num_of_steps:
+            self._restore(step)
+        if step > self.num_of_steps:
+            return self._run(max_steps=step - self.num_of_steps, budget=budget, breakpoints=False)
+        return self.state("halted" if self.halted else "step")
+
+    def back(self, count: int = 1, budget=None) -> DebugState:
+        """
+        Go back 'count' steps, or to the start.
+        """
+        if count < 1:
+            raise ValueError("At least one step must be undone.")
+        return self.goto(max(0, self.num_of_steps - count), budget=budget)
+
+    def _restore(self, step: int):
+        # The last checkpoint at or before 'step'.
+        num_of_steps, previous, line, values, _ = self._checkpoints[bisect.bisect_left(self._checkpoints,
+                                                                                        (step + 1,)) - 1]
+        self.registers = Registers(list(values))
+        self.num_of_steps, self.line = num_of_steps, line
+        self.instruction = self.instructions[previous] if previous >= 0 else None
+        self.halted, self.error = False, None
+        self._steps = URMSimulator._steps(self.instructions, self.registers, self.safety_count,
+                                          start=(line, num_of_steps))
+        if line >= len(self.instructions):
+            self._finish()
+
+
+def debug(instructions: Instructions, initial_registers: Registers, param: Dict[int, int] = None,
+          safety_count: int = 1000, memory_budget: int = 64 * 1024 * 1024) -> DebugSession:
+    """
+    Start a DebugSession of 'instructions', paused before its first step.
+    """
+    return DebugSession(instructions, initial_registers, param=param, safety_count=safety_count,
+                        memory_budget=memory_budget)
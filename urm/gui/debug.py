@@ -0,0 +1,81 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import urm
+
+
+class DebugEntry(object):
+    """
+    A debug session of the server, with the lock its commands hold and the time it was last used.
+    """
+
+    def __init__(self, session):
+        self.session_id = uuid.uuid4().hex
+        self.session = session
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+
+class DebugSessionStore(object):
+    """
+    Keeps the debug sessions by ID. Sessions unused for 'idle_timeout' seconds are evicted, and the least
+    recently used ones beyond 'max_sessions', so that abandoned sessions do not hold the server's memory.
+    Each session keeps its checkpoints for going back within 'memory_budget' bytes.
+    """
+
+    def __init__(self, idle_timeout=600.0, max_sessions=64, memory_budget=8 * 1024 * 1024):
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.memory_budget = memory_budget
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self._sweeper = None
+
+    def _sweep(self):
+        # Evicts idle sessions even when no request comes to do it.
+        while True:
+            time.sleep(self.idle_timeout / 4)
+            with self.lock:
+                self._evict()
+
+    def create(self, urm_program, registers, param=None, safety_count=1000):
+        entry = DebugEntry(urm.DebugSession(urm_program, registers, param=param, safety_count=safety_count,
+                                            memory_budget=self.memory_budget))
+        with self.lock:
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(target=self._sweep, name="urm-debug-sweeper", daemon=True)
+                self._sweeper.start()
+            self._evict()
+            self.entries[entry.session_id] = entry
+            # Sessions running a command are kept, even if that leaves more than 'max_sessions'.
+            idle = [session_id for session_id, stored in self.entries.items()
+                    if stored is not entry and not stored.lock.locked()]
+            for session_id in idle[:max(0, len(self.entries) - self.max_sessions)]:
+                del self.entries[session_id]
+        return entry
+
+    def get(self, session_id):
+        with self.lock:
+            self._evict()
+            entry = self.entries.get(session_id)
+            if entry is None:
+                raise ValueError("Unknown or expired debug session.")
+            entry.last_used = time.monotonic()
+            self.entries.move_to_end(session_id)
+        return entry
+
+    def close(self, session_id):
+        with self.lock:
+            self.entries.pop(session_id, None)
+
+    def _evict(self):
+        now = time.monotonic()
+        expired = [session_id for session_id, entry in self.entries.items()
+                   if now - entry.last_used > self.idle_timeout and not entry.lock.locked()]
+        for session_id in expired:
+            del self.entries[session_id]
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,223 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Manager
+
+import urm
+
+
+def execute_job(urm_program, registers, param, safety_count, time_limit, cancel_event=None):
+    """
+    Run one job on the fast path. Executed in a worker process, so it returns plain data;
+    errors are returned rather than raised, since not every exception of 'urm' can be pickled back.
+    The job stops once 'cancel_event' is set.
+    """
+    try:
+        budget = None
+        if time_limit is not None or cancel_event is not None:
+            token = urm.CancellationToken(cancel_event) if cancel_event is not None else None
+            budget = urm.Budget(seconds=time_limit, token=token)
+        result = urm.run(param, registers, urm_program, safety_count=safety_count,
+                         detect_cycles=True, budget=budget)
+        last_registers = result.last_registers.registers if result.last_registers is not None else None
+        return {"num_of_steps": result.num_of_steps, "last_registers": last_registers}
+    except Exception as e:
+        return {"error": str(e), "num_of_steps": getattr(e, 'num_of_steps', None)}
+
+
+class JobRejected(RuntimeError):
+    """
+    Raised by 'JobQueue.submit' when admission control turns a job away.
+    """
+
+
+class Job(object):
+    """
+    A URM program submitted to a JobQueue, run to completion without a trace.
+    """
+
+    def __init__(self, client, urm_program, registers, param, safety_count, time_limit):
+        self.job_id = uuid.uuid4().hex
+        self.client = client
+        self.urm_program = urm_program
+        self.registers = registers
+        self.param = dict(param or {})
+        self.safety_count = safety_count
+        self.time_limit = time_limit
+        self.state = "queued"
+        self.stopping = False  # Cancelled while running, until its worker stops
+        self.cancel_event = None
+        self.result = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    @property
+    def done(self):
+        return self.state in ("done", "failed", "cancelled")
+
+    def status(self):
+        return {
+            "job_id": self.job_id,
+            "client": self.client,
+            "state": self.state,
+            "stopping": self.stopping,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+
+class JobQueue(object):
+    """
+    Runs jobs on a bounded pool of worker processes, at most 'max_workers' at a time.
+
+    Admission control rejects jobs beyond 'max_queued' waiting jobs, 'max_queued_per_client' waiting
+    jobs of one client, or with a safety limit above 'max_steps'. Waiting jobs are queued per client
+    and started round-robin across clients, so a client submitting many jobs delays only its own.
+
+    A queued job is cancelled at once. A running job is stopped by its worker within the check
+    interval of its budget, through an event shared with the worker process; until then it is
+    reported as 'stopping' and keeps its worker.
+
+    'executor' replaces the process pool, e.g. by a ThreadPoolExecutor to run every job in-process,
+    in which case the jobs share plain threading events with it.
+    """
+
+    def __init__(self, max_workers=4, max_queued=256, max_queued_per_client=16, max_steps=10 ** 9, max_jobs=1024,
+                 executor=None):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.max_queued_per_client = max_queued_per_client
+        self.max_steps = max_steps
+        self.max_jobs = max_jobs
+        self.jobs = OrderedDict()
+        self.queues = OrderedDict()  # Client to its deque of waiting jobs, in round-robin order
+        self.queued = 0
+        self.running = 0
+        self.lock = threading.Lock()
+        self._executor = executor
+        self._manager = None
+
+    @property
+    def executor(self):
+        # The process pool is only started by the first job.
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def _cancel_event(self):
+        if not isinstance(self.executor, ProcessPoolExecutor):
+            return threading.Event()
+        # Events shared with the worker processes are served by a manager process, started with the first job.
+        if self._manager is None:
+            self._manager = Manager()
+        return self._manager.Event()
+
+    def close(self):
+        """
+        Shut the process pool and the manager of the cancel events down, without waiting for the running jobs.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+    def submit(self, client, urm_program, registers, param=None, safety_count=1000, time_limit=None):
+        if safety_count > self.max_steps:
+            raise JobRejected(f"The safety limit of a job cannot exceed {self.max_steps} steps.")
+        job = Job(client, urm_program, registers, param, safety_count, time_limit)
+        with self.lock:
+            if self.queued >= self.max_queued:
+                raise JobRejected("Too many jobs are waiting, try again later.")
+            queue = self.queues.setdefault(client, deque())
+            if len(queue) >= self.max_queued_per_client:
+                raise JobRejected(f"A client cannot have more than {self.max_queued_per_client} waiting jobs.")
+            queue.append(job)
+            self.queued += 1
+            self.jobs[job.job_id] = job
+            finished = [job_id for job_id, stored in self.jobs.items() if stored.done]
+            while len(self.jobs) > self.max_jobs and finished:
+                del self.jobs[finished.pop(0)]
+        self._dispatch()
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            raise ValueError("Unknown job id.")
+        return job
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        with self.lock:
+            if job.state == "queued":
+                self.queues[job.client].remove(job)
+                self.queued -= 1
+                if not self.queues[job.client]:
+                    del self.queues[job.client]
+            if job.state == "running":
+                job.stopping = True
+                if job.cancel_event is not None:
+                    job.cancel_event.set()
+            if not job.done:
+                job.state = "cancelled"
+                job.finished = time.time()
+        return job
+
+    def stats(self):
+        with self.lock:
+            return {"queued": self.queued, "running": self.running, "clients": len(self.queues),
+                    "jobs": len(self.jobs)}
+
+    def _dispatch(self):
+        started = []
+        with self.lock:
+            while self.running < self.max_workers and self.queues:
+                client, queue = next(iter(self.queues.items()))
+                job = queue.popleft()
+                # The client goes to the back of the round, or leaves it once it has nothing waiting.
+                del self.queues[client]
+                if queue:
+                    self.queues[client] = queue
+                self.queued -= 1
+                self.running += 1
+                job.state = "running"
+                job.started = time.time()
+                started.append(job)
+        for job in started:
+            try:
+                job.cancel_event = self._cancel_event()
+                with self.lock:
+                    # Cancelled before its event existed.
+                    if job.stopping:
+                        job.cancel_event.set()
+                future = self.executor.submit(execute_job, job.urm_program, job.registers, job.param,
+                                              job.safety_count, job.time_limit, job.cancel_event)
+            except Exception as e:
+                # E.g. a BrokenProcessPool after a worker died: the job fails instead of holding its worker.
+                with self.lock:
+                    self.running -= 1
+                    if job.state == "running":
+                        job.result = {"error": str(e), "num_of_steps": None}
+                        job.state = "failed"
+                        job.finished = time.time()
+                continue
+            future.add_done_callback(lambda future, job=job: self._finished(job, future))
+
+    def _finished(self, job, future):
+        with self.lock:
+            self.running -= 1
+            job.stopping = False
+            if job.state == "running":
+                try:
+                    job.result = future.result()
+                except Exception as e:
+                    job.result = {"error": str(e), "num_of_steps": None}
+                job.state = "failed" if "error" in job.result else "done"
+                job.finished = time.time()
+        self._dispatch()
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import urm
+from .urm_dec import build_urm_program_from_data
+
+_OPERATORS = {'Z', 'S', 'C', 'J'}
+
+
+def _etag(data):
+    return '"' + hashlib.sha256(data).hexdigest()[:32] + '"'
+
+
+class ProgramEntry(object):
+    """
+    A program of the registry: its JSON as served by /get_programs, compiled and hashed once.
+    """
+
+    def __init__(self, name, data):
+        for instruction in data['instructions']:
+            if instruction.get('operator') not in _OPERATORS:
+                raise ValueError(f"Unknown operator {instruction.get('operator')!r}.")
+        self.name = name
+        self.data = dict(data, name=name)
+        self.instructions, self.safety_count = build_urm_program_from_data(data)
+        # Decoding checks the arity and jump targets of every instruction.
+        urm.URMSimulator.decode(self.instructions)
+        self.num_registers = urm.haddr(self.instructions) + 1 if len(self.instructions) else 0
+        self.etag = _etag(json.dumps(self.data, sort_keys=True).encode('utf-8'))
+
+
+class ProgramRegistry(object):
+    """
+    The programs of a directory of JSON files, parsed and compiled once instead of on every request.
+
+    The directory is checked at most every 'check_interval' seconds, by the names, sizes and mtimes
+    of its files; only when they change is it loaded again. Files that cannot be loaded are left out
+    and reported in 'errors'.
+    """
+
+    def __init__(self, path, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.entries = {}
+        self.errors = {}
+        self.etag = None
+        self._signature = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self.refresh(force=True)
+
+    def _scan(self):
+        with os.scandir(self.path) as files:
+            return tuple(sorted((f.name, f.stat().st_mtime_ns, f.stat().st_size)
+                                for f in files if f.name.endswith(".json") and f.is_file()))
+
+    def refresh(self, force=False):
+        """
+        Load the directory again if its files changed since it was last loaded.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._checked < self.check_interval:
+                return
+            self._checked = now
+            signature = self._scan()
+            if signature == self._signature:
+                return
+            entries, errors = {}, {}
+            for file_name, _, _ in signature:
+                name = file_name[:-len(".json")]
+                try:
+                    with open(os.path.join(self.path, file_name), "r") as f:
+                        entries[name] = ProgramEntry(name, json.load(f))
+                except Exception as e:
+                    errors[name] = str(e)
+            self.entries, self.errors, self._signature = entries, errors, signature
+            self.etag = _etag(" ".join(entry.etag for entry in entries.values()).encode('utf-8'))
+
+    def programs(self):
+        """
+        The JSON of every program, in the order of their file names.
+        """
+        self.refresh()
+        return [entry.data for entry in self.entries.values()]
+
+    def get(self, name):
+        self.refresh()
+        entry = self.entries.get(name)
+        if entry is None:
+            raise ValueError(f"Unknown program {name!r}.")
+        return entry
+
+
+class CachedFile(object):
+    """
+    A text file kept in memory with its ETag, read again only when its mtime or size changes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.content = None
+        self.etag = None
+        self._signature = None
+        self._lock = threading.Lock()
+
+    def read(self):
+        stat = os.stat(self.path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if signature != self._signature:
+                with open(self.path, "r") as f:
+                    self.content = f.read()
+                self.etag = _etag(self.content.encode('utf-8'))
+                self._signature = signature
+            return self.content, self.etag
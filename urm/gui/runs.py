@@ -0,0 +1,164 @@
+import os
+import re
+import shutil
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import urm
+
+# Runs execute on these threads so that a long program never blocks the event loop.
+executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="urm-run")
+
+
+class Run(object):
+    """
+    A URM program run in the background, whose steps can be read while it executes.
+
+    Steps are recorded in a delta trace, so a page of steps can be served as soon as it has run.
+    Runs stop as soon as they provably never halt, so a generous safety count costs nothing on a stuck program,
+    and can be given a time limit or cancelled.
+    """
+
+    def __init__(self, urm_program, registers, safety_count, time_limit=None, checkpoint_interval=256):
+        self.run_id = uuid.uuid4().hex
+        self.urm_program = urm_program
+        self.registers = registers
+        self.safety_count = safety_count
+        self.trace = urm.trace.delta(checkpoint_interval)
+        self.token = urm.CancellationToken()
+        self.budget = urm.Budget(seconds=time_limit, token=self.token)
+        self.done = threading.Event()
+        self.error = None
+        self.num_of_steps = None
+
+    def execute(self):
+        try:
+            result = urm.forward(None, self.registers, self.urm_program, safety_count=self.safety_count,
+                                 trace=self.trace, detect_cycles=True, budget=self.budget)
+            self.num_of_steps = result.num_of_steps
+        except urm.RunInterrupted as e:
+            # The steps up to the interruption stay readable.
+            self.error = str(e)
+            self.num_of_steps = e.num_of_steps
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self.done.set()
+
+    def cancel(self):
+        """
+        Stop the run within 'budget.interval' steps, if it has not finished yet.
+        """
+        self.token.cancel()
+
+    def available(self):
+        """
+        Number of states that can be read so far, the initial one included.
+        """
+        return len(self.trace) if self.trace.checkpoints else 0
+
+    def status(self):
+        return {
+            "run_id": self.run_id,
+            "done": self.done.is_set(),
+            "cancelled": self.token.cancelled,
+            "error": self.error,
+            "num_of_steps": self.num_of_steps,
+            "available": self.available(),
+        }
+
+    def steps(self, offset, limit):
+        registers_from_steps, ops_from_steps = self.trace.page(offset, min(limit, self.available() - offset))
+        return {
+            "registers_from_steps": registers_from_steps,
+            "ops_from_steps": ops_from_steps,
+            "offset": offset,
+            **self.status(),
+        }
+
+
+class RunStore(object):
+    """
+    Keeps the most recent runs by ID, dropping the oldest finished ones beyond 'max_runs'.
+
+    At most 'max_running' runs may be unfinished at a time; 'start' refuses more, so that clients
+    cannot hold the server's memory with runs that never get evicted.
+    """
+
+    def __init__(self, max_runs=64, max_running=16):
+        self.max_runs = max_runs
+        self.max_running = max_running
+        self.runs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def start(self, urm_program, registers, safety_count, time_limit=None):
+        run = Run(urm_program, registers, safety_count, time_limit)
+        with self.lock:
+            running = sum(1 for stored in self.runs.values() if not stored.done.is_set())
+            if running >= self.max_running:
+                raise RuntimeError("Too many runs are in progress, try again later.")
+            self.runs[run.run_id] = run
+            finished = [run_id for run_id, stored in self.runs.items() if stored.done.is_set()]
+            while len(self.runs) > self.max_runs and finished:
+                del self.runs[finished.pop(0)]
+        executor.submit(run.execute)
+        return run
+
+    def get(self, run_id):
+        with self.lock:
+            run = self.runs.get(run_id)
+        if run is None:
+            raise ValueError("Unknown run id.")
+        return run
+
+
+class TraceStore(object):
+    """
+    The trace files of '/run_urm_program', in a temporary directory. The oldest files are deleted beyond
+    'max_traces', and every file with the directory on 'close', so that traces do not fill the disk.
+    """
+
+    def __init__(self, max_traces=64):
+        self.max_traces = max_traces
+        self.directory = tempfile.mkdtemp(prefix="urm-traces-")
+        self.traces = OrderedDict()
+        self.lock = threading.Lock()
+
+    def path(self, trace_id):
+        if not re.fullmatch(r"[0-9a-f]{32}", trace_id):
+            raise ValueError("Invalid trace id.")
+        return os.path.join(self.directory, f"{trace_id}.urmt")
+
+    def create(self):
+        """
+        A new trace id and the path its file is to be written to.
+        """
+        trace_id = uuid.uuid4().hex
+        with self.lock:
+            self.traces[trace_id] = self.path(trace_id)
+            while len(self.traces) > self.max_traces:
+                _, path = self.traces.popitem(last=False)
+                self._delete(path)
+        return trace_id, self.traces[trace_id]
+
+    def get(self, trace_id):
+        path = self.path(trace_id)
+        with self.lock:
+            if trace_id not in self.traces or not os.path.exists(path):
+                raise ValueError("Unknown trace id.")
+        return path
+
+    def close(self):
+        with self.lock:
+            self.traces.clear()
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    @staticmethod
+    def _delete(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
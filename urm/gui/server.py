@@ -3,19 +3,93 @@ import uvicorn
 import urm
 from .urm_dec import build_urm_program_from_data, serialize_urm_program
 import json
-from fastapi import Request
+from fastapi import Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
-from .load_programs import load_programs
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
+from .registry import ProgramRegistry, CachedFile
+from .jobs import JobQueue
+from .debug import DebugSessionStore
+from .runs import RunStore, TraceStore, executor
+import asyncio
 import os
+import contextlib
 import click
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 STATIC_DIR = os.path.join(current_dir, "urm-visualization/build_latest")
 # STATIC_DIR = "urm-visualization/build"
+# No run may hold a worker longer than this, whatever its safety limit; clients can ask for less with 'timeLimit'.
+MAX_TIME_LIMIT = 60.0
 
-app = FastAPI()
+
+def time_limit(data):
+    return min(float(data.get('timeLimit', MAX_TIME_LIMIT)), MAX_TIME_LIMIT)
+
+
+async def run_until_disconnected(request, token, function):
+    # Runs on the executor; the run is cancelled if the client goes away before it is done.
+    future = asyncio.get_event_loop().run_in_executor(executor, function)
+    while True:
+        done, _ = await asyncio.wait({future}, timeout=0.1)
+        if done:
+            return future.result()
+        if not token.cancelled and await request.is_disconnected():
+            token.cancel()
+
+
+def conditional_response(request, etag, build):
+    # Clients may keep the response but must revalidate it, and get a 304 while it is unchanged.
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    tags = [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]
+    if etag in tags or "*" in tags:
+        return Response(status_code=304, headers=headers)
+    response = build()
+    response.headers.update(headers)
+    return response
+
+
+async def forward_response(request, data, urm_program, safety_count, initialization_registers, param=None):
+    token = urm.CancellationToken()
+    budget = urm.Budget(seconds=time_limit(data), token=token)
+    if data.get('traceFile'):
+        # Keep the steps on disk and let the client page through them with /trace/{trace_id}.
+        trace_id, path = trace_store.create()
+        result = await run_until_disconnected(
+            request, token, lambda: urm.forward(param, initialization_registers, urm_program,
+                                                safety_count=safety_count,
+                                                trace=urm.trace.to_file(path),
+                                                detect_cycles=True, budget=budget))
+        return {"result": {
+            "trace_id": trace_id,
+            "num_of_steps": result.num_of_steps,
+            "serialized_program": serialize_urm_program(urm_program, safety_count=safety_count),
+        }}
+    result = await run_until_disconnected(
+        request, token, lambda: urm.forward(param, initialization_registers, urm_program,
+                                            safety_count=safety_count, cache=result_cache,
+                                            detect_cycles=True, budget=budget))
+    wrapped_result = {}
+    wrapped_result['registers_from_steps'] = []
+    wrapped_result['ops_from_steps'] = []
+    wrapped_result['serialized_program'] = serialize_urm_program(urm_program, safety_count=safety_count)
+    for item in result.registers_from_steps:
+        wrapped_result['registers_from_steps'].append(item.registers)
+    for item in result.ops_from_steps:
+        wrapped_result['ops_from_steps'].append(item)
+    # Already plain lists and strings: a JSONResponse skips FastAPI's encoder walking every step of the trace,
+    # which took far longer than a cached run.
+    return JSONResponse({"result": wrapped_result})
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    yield
+    # The trace files are only readable through this server, so they go with it.
+    trace_store.close()
+    job_queue.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -25,10 +99,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 app.mount("/static", StaticFiles(directory=f"{STATIC_DIR}/static"), name="static")
+run_store = RunStore()
+trace_store = TraceStore()
+result_cache = urm.ResultCache(max_entries=256, max_bytes=256 * 1024 * 1024)
+program_registry = ProgramRegistry(os.path.join(current_dir, "programs"))
+index_page = CachedFile(f"{STATIC_DIR}/index.html")
+# Jobs run in worker processes, so heavy programs use every core and never hold the event loop.
+job_queue = JobQueue(max_workers=min(4, os.cpu_count() or 1))
+debug_sessions = DebugSessionStore()
+
+
+def index_response(request):
+    content, etag = index_page.read()
+    return conditional_response(request, etag, lambda: HTMLResponse(content=content))
 
 @app.get("/")
-def read_root():
-    return HTMLResponse(content=open(f"{STATIC_DIR}/index.html", "r").read())
+def read_root(request: Request):
+    return index_response(request)
 
 @app.post("/get_max_register")
 async def get_haddr(request: Request):
@@ -48,29 +135,295 @@ async def run_urm_program(request: Request):
         initialization_registers = data['initialRegisters']
         initialization_registers = urm.Registers(initialization_registers)
         print(urm_program)
-        result = urm.forward(None, initialization_registers, urm_program, safety_count=safety_count)
-        wrapped_result = {}
-        wrapped_result['registers_from_steps'] = []
-        wrapped_result['ops_from_steps'] = []
-        wrapped_result['serialized_program'] = serialize_urm_program(urm_program, safety_count=safety_count)
-        for item in result.registers_from_steps:
-            wrapped_result['registers_from_steps'].append(item.registers)
-        for item in result.ops_from_steps:
-            wrapped_result['ops_from_steps'].append(item)
-        print(wrapped_result)
-        return {"result": wrapped_result}
+        return await forward_response(request, data, urm_program, safety_count, initialization_registers)
+    except Exception as e:
+        print(f"Error: {e}")
+        return {"error": str(e)}
+
+@app.post("/profile_urm_program")
+async def profile_urm_program(request: Request):
+    # Per-line counts for a heatmap over the program listing; a run stopped early still has its profile.
+    try:
+        data = await request.json()
+        urm_program, safety_count = build_urm_program_from_data(data['program'])
+        initialization_registers = urm.Registers(data['initialRegisters'])
+        token = urm.CancellationToken()
+        budget = urm.Budget(seconds=time_limit(data), token=token)
+        error = None
+        try:
+            profile = await run_until_disconnected(
+                request, token, lambda: urm.profile(None, initialization_registers, urm_program,
+                                                    safety_count=safety_count, budget=budget))
+        except (urm.SafetyLimitExceeded, urm.RunInterrupted) as e:
+            profile, error = e.trace, str(e)
+        return {"result": {**profile.to_dict(), "error": error,
+                           "serialized_program": serialize_urm_program(urm_program, safety_count=safety_count)}}
+    except Exception as e:
+        print(f"Error: {e}")
+        return {"error": str(e)}
+
+@app.get("/cache_stats")
+async def get_cache_stats():
+    return {"result": result_cache.stats()}
+
+@app.post("/runs")
+async def start_run(request: Request):
+    try:
+        data = await request.json()
+        urm_program, safety_count = build_urm_program_from_data(data['program'])
+        initialization_registers = urm.Registers(data['initialRegisters'])
+        run = run_store.start(urm_program, initialization_registers, safety_count, time_limit(data))
+        return {"result": {
+            "run_id": run.run_id,
+            "serialized_program": serialize_urm_program(urm_program, safety_count=safety_count),
+        }}
+    except Exception as e:
+        print(f"Error: {e}")
+        return {"error": str(e)}
+
+@app.get("/runs/{run_id}")
+async def get_run(run_id: str):
+    try:
+        return {"result": run_store.get(run_id).status()}
+    except Exception as e:
+        return {"error": str(e)}
+
+@app.post("/runs/{run_id}/cancel")
+async def cancel_run(run_id: str):
+    try:
+        run = run_store.get(run_id)
+        run.cancel()
+        return {"result": run.status()}
+    except Exception as e:
+        return {"error": str(e)}
+
+@app.get("/runs/{run_id}/steps")
+async def get_run_steps(run_id: str, offset: int = 0, limit: int = 100):
+    try:
+        return {"result": run_store.get(run_id).steps(offset, limit)}
+    except Exception as e:
+        return {"error": str(e)}
+
+@app.get("/runs/{run_id}/stream")
+async def stream_run_steps(run_id: str, offset: int = 0, batch: int = 100):
+    try:
+        run = run_store.get(run_id)
+    except Exception as e:
+        return {"error": str(e)}
+
+    async def lines():
+        # One JSON object per step, sent as soon as the step has run.
+        step = offset
+        while True:
+            done = run.done.is_set()
+            page = run.steps(step, batch)
+            for registers, op in zip(page["registers_from_steps"], page["ops_from_steps"]):
+                yield json.dumps({"step": step, "registers": registers, "op": op}) + "\n"
+                step += 1
+            if done and step >= run.available():
+                yield json.dumps({"done": True, **run.status()}) + "\n"
+                return
+            if not page["ops_from_steps"]:
+                await asyncio.sleep(0.05)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.get("/trace/{trace_id}")
+async def get_trace_steps(trace_id: str, offset: int = 0, limit: int = 100):
+    try:
+        path = trace_store.get(trace_id)
+        with urm.trace.TraceFile(path) as trace:
+            registers_from_steps, ops_from_steps = trace.page(offset, limit)
+            return {"result": {
+                "registers_from_steps": registers_from_steps,
+                "ops_from_steps": ops_from_steps,
+                "offset": offset,
+                "total": len(trace),
+            }}
     except Exception as e:
         print(f"Error: {e}")
         return {"error": str(e)}
 
 @app.get("/index")
 async def serve_react_app(request: Request):
-    return HTMLResponse(content=open(f"{STATIC_DIR}/index.html", "r").read())
+    return index_response(request)
 
 
 @app.get("/get_programs")
-async def get_programs():
-    return {"programs": load_programs(os.path.join(current_dir, "programs"))}
+async def get_programs(request: Request):
+    programs = program_registry.programs()
+    return conditional_response(request, program_registry.etag, lambda: JSONResponse({"programs": programs}))
+
+
+@app.get("/programs/{name}")
+async def get_program(name: str, request: Request):
+    try:
+        entry = program_registry.get(name)
+    except ValueError as e:
+        return {"error": str(e)}
+    return conditional_response(request, entry.etag, lambda: JSONResponse({"result": entry.data}))
+
+
+@app.post("/programs/{name}/run")
+async def run_program(name: str, request: Request):
+    # Runs a program of the registry; the body only holds the inputs, e.g. {"inputs": {"1": 3, "2": 4}}.
+    try:
+        entry = program_registry.get(name)
+        data = await request.json()
+        param = {int(register): value for register, value in data.get('inputs', {}).items()}
+        if 'initialRegisters' in data:
+            initialization_registers = urm.Registers(data['initialRegisters'])
+        else:
+            initialization_registers = urm.allocate(max([entry.num_registers] + [r + 1 for r in param]))
+        safety_count = data.get('safetyLimit', entry.safety_count)
+        return await forward_response(request, data, entry.instructions, safety_count, initialization_registers,
+                                      param=param)
+    except Exception as e:
+        print(f"Error: {e}")
+        return {"error": str(e)}
+
+
+def program_from_data(data):
+    # Either {"program": {...}, "initialRegisters": [...]} or {"name": "Add", "inputs": {"1": 3, "2": 4}}.
+    param = None
+    if 'name' in data:
+        entry = program_registry.get(data['name'])
+        urm_program, safety_count = entry.instructions, entry.safety_count
+        param = {int(register): value for register, value in data.get('inputs', {}).items()}
+        num = max([entry.num_registers] + [r + 1 for r in param])
+        initialization_registers = urm.Registers(data['initialRegisters']) if 'initialRegisters' in data \
+            else urm.allocate(num)
+    else:
+        urm_program, safety_count = build_urm_program_from_data(data['program'])
+        initialization_registers = urm.Registers(data['initialRegisters'])
+    return urm_program, initialization_registers, param, data.get('safetyLimit', safety_count)
+
+
+def client_id(request):
+    # Fairness is per client: an explicit 'X-Client-Id' header, or else the client's address.
+    return request.headers.get("x-client-id") or (request.client.host if request.client else "anonymous")
+
+
+@app.post("/jobs")
+async def submit_job(request: Request):
+    try:
+        data = await request.json()
+        urm_program, initialization_registers, param, safety_count = program_from_data(data)
+        job = job_queue.submit(client_id(request), urm_program, initialization_registers, param=param,
+                               safety_count=safety_count, time_limit=time_limit(data))
+        return {"result": job.status()}
+    except Exception as e:
+        print(f"Error: {e}")
+        return {"error": str(e)}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    try:
+        return {"result": job_queue.get(job_id).status()}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    try:
+        job = job_queue.get(job_id)
+        if not job.done:
+            return {"error": f"Job is {job.state}.", "result": job.status()}
+        if job.state == "cancelled":
+            return {"error": "Job was cancelled.", "result": job.status()}
+        if job.state == "failed":
+            return {"error": job.result["error"], "result": dict(job.status(), **job.result)}
+        return {"result": dict(job.status(), **job.result)}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    try:
+        return {"result": job_queue.cancel(job_id).status()}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def debug_command(entry, data):
+    # Runs on the executor, under the session's lock, since a command may execute many steps.
+    session = entry.session
+    command = data['command']
+    with entry.lock:
+        if command == "state":
+            return session.state()
+        if command == "break":
+            for line in data.get('lines', []):
+                session.add_breakpoint(line)
+            for condition in data.get('conditions', []):
+                session.add_condition(condition)
+            return session.state()
+        if command == "clear":
+            session.clear()
+            return session.state()
+        budget = urm.Budget(seconds=time_limit(data))
+        if command == "step":
+            return session.step(int(data.get('count', 1)), budget=budget)
+        if command == "run_to":
+            return session.run_to(line=data.get('line'), condition=data.get('condition'), budget=budget)
+        if command == "continue":
+            return session.resume(budget=budget)
+        if command == "goto":
+            return session.goto(int(data['step']), budget=budget)
+        if command == "back":
+            return session.back(int(data.get('count', 1)), budget=budget)
+    raise ValueError(f"Unknown debug command {command!r}.")
+
+
+@app.websocket("/debug")
+async def debug_socket(websocket: WebSocket):
+    # A step-through debugger: the program runs server-side only as far as the client asks, e.g.
+    # {"command": "start", "name": "Add", "inputs": {"1": 3, "2": 4}}, then {"command": "step", "count": 20},
+    # {"command": "break", "lines": [3], "conditions": ["R1 >= 5"]}, {"command": "continue"} or
+    # {"command": "run_to", "line": 5}. {"command": "goto", "step": 900} and {"command": "back", "count": 1}
+    # travel back in time. {"command": "attach", "session_id": ...} resumes a session after a
+    # reconnection; sessions left idle are evicted.
+    await websocket.accept()
+    entry = None
+    try:
+        while True:
+            data = await websocket.receive_json()
+            try:
+                command = data.get('command')
+                if command == "start":
+                    urm_program, initialization_registers, param, safety_count = program_from_data(data)
+                    entry = debug_sessions.create(urm_program, initialization_registers, param=param,
+                                                  safety_count=safety_count)
+                    await websocket.send_json({"result": {
+                        "session_id": entry.session_id,
+                        "serialized_program": serialize_urm_program(urm_program, safety_count=safety_count),
+                        **entry.session.state("start").to_dict(),
+                    }})
+                    continue
+                if command == "attach":
+                    entry = debug_sessions.get(data['session_id'])
+                    data = {"command": "state"}
+                elif entry is None:
+                    raise ValueError("No debug session: send 'start' or 'attach' first.")
+                elif command == "close":
+                    debug_sessions.close(entry.session_id)
+                    entry = None
+                    await websocket.send_json({"result": None})
+                    continue
+                else:
+                    # Also raises if the session was evicted while the client was idle.
+                    entry = debug_sessions.get(entry.session_id)
+                state = await asyncio.get_event_loop().run_in_executor(executor, lambda: debug_command(entry, data))
+                await websocket.send_json({"result": {"session_id": entry.session_id, **state.to_dict()}})
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                await websocket.send_json({"error": str(e)})
+    except WebSocketDisconnect:
+        pass
 
 
 @click.command()
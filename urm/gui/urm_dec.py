@@ -79,7 +79,6 @@ def serialize_urm_program(urm_program, safety_count):
     }
     
     for instruction in urm_program:
-        print(instruction)
         operator = instruction[0]
         params = instruction[1:]
         
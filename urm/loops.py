@@ -0,0 +1,90 @@
+"""
+Detection of counting loops in URM programs, used to accelerate their execution.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+from .urm_simulation import Instructions, URMSimulator, OP_S, OP_J
+
+
+@dataclass(frozen=True)
+class CountingLoop(object):
+    """
+    A loop that only increments registers until a counter reaches an unmodified bound.
+
+    The loop is entered at its exit test J(counter, bound, exit) (or J(bound, counter, exit)).
+    While the two registers differ, one iteration runs 'length' instructions, made up of the test,
+    S instructions and unconditional jumps, and returns to the test having added 'stride' to the
+    counter and leaving the bound untouched.
+    """
+    test_line: int  # Zero-based index of the exit test
+    exit_line: int  # Zero-based index the test jumps to when the loop is done
+    counter: int
+    bound: int
+    stride: int
+    length: int
+    increments: Tuple[Tuple[int, int], ...]  # (register, increment per iteration)
+
+    def registers(self) -> Tuple[int, ...]:
+        return tuple(register for register, _ in self.increments) + (self.bound,)
+
+    def iterations(self, counter_value: int, bound_value: int):
+        """
+        Number of iterations until the counter meets the bound, or None if it never does.
+        """
+        remaining = bound_value - counter_value
+        if remaining < 0 or remaining % self.stride:
+            return None
+        return remaining // self.stride
+
+
+def find_counting_loops(instructions: Instructions) -> Dict[int, CountingLoop]:
+    """
+    Finds the counting loops of a URM program.
+
+    A counting loop is a single-exit cycle whose exit test J(m, n, q) compares two different
+    registers, whose body only does S on registers or jumps unconditionally (J(k, k, q)), and in which
+    exactly one of the compared registers is incremented. Such a loop can be skipped by adding the
+    number of remaining iterations to every incremented register at once.
+
+    :param instructions: An Instructions object representing a URM program.
+    :return: A dictionary mapping the zero-based line of each loop's exit test to its CountingLoop.
+    """
+    table = URMSimulator.decode(instructions)
+    n = len(table)
+    loops = {}
+    for test_line, (op, m, k, exit_line) in enumerate(table):
+        if op != OP_J or m == k or m < 0 or k < 0:
+            continue
+        # Follow the path taken while the test fails, until it comes back to the test.
+        increments = {}
+        lines = set()
+        line = test_line + 1
+        length = 1
+        while line != test_line:
+            if line >= n or line in lines:
+                break
+            lines.add(line)
+            body_op, a, b, target = table[line]
+            if body_op == OP_S and a >= 0:
+                increments[a] = increments.get(a, 0) + 1
+                line = target
+            elif body_op == OP_J and a == b:
+                line = target
+            else:
+                break
+            length += 1
+        else:
+            if exit_line in lines:
+                continue
+            if increments.get(m) and not increments.get(k):
+                counter, bound = m, k
+            elif increments.get(k) and not increments.get(m):
+                counter, bound = k, m
+            else:
+                continue
+            loops[test_line] = CountingLoop(test_line=test_line, exit_line=exit_line, counter=counter,
+                                            bound=bound, stride=increments[counter], length=length,
+                                            increments=tuple(sorted(increments.items())))
+    return loops
@@ -0,0 +1,217 @@
+"""
+Memoised evaluation of URM programs used as subroutines.
+"""
+
+from typing import Dict, List, Sequence, Tuple
+
+from .urm_simulation import Instructions, URMSimulator, SafetyLimitExceeded
+from .urm_simulation import OP_Z, OP_S, OP_C, OP_J, OP_LOOP, OP_CALL
+from .loops import find_counting_loops
+
+
+def _live_in(table: Tuple[Tuple[int, int, int, int], ...], live_out: Sequence[int] = ()) -> set:
+    """
+    The registers a decoded table may read before writing them, by backward liveness analysis.
+
+    :param live_out: The registers read once the table has halted.
+    """
+    n = len(table)
+    live = [set() for _ in range(n)] + [set(live_out), set(live_out)]
+    changed = True
+    while changed:
+        changed = False
+        for line in range(n - 1, -1, -1):
+            op, a, b, target = table[line]
+            out = set(live[target])
+            if op == OP_J:
+                out |= live[line + 1]
+            if op == OP_Z:
+                out.discard(a)
+            elif op == OP_S:
+                out.add(a)
+            elif op == OP_C:
+                out.discard(b)
+                out.add(a)
+            elif a != b:
+                out |= {a, b}
+            if out != live[line]:
+                live[line] = out
+                changed = True
+    return live[0]
+
+
+class PureFunction(object):
+    """
+    A URM program marked as a function of its input registers, whose calls can be memoised.
+
+    Every call is placed with 'call', which relocates the program like 'reloc' and records where the
+    block starts and which registers it was given. Composing the result with 'concat', 'reloc' or
+    'Instructions' keeps that record, and 'run' with 'memoize=True' then executes each call through
+    the function's memo table: the key is the values of the logical input registers (and of any
+    output the program may leave unwritten), so calls on the same arguments hit whatever physical
+    registers they were relocated to. A hit writes the output registers and adds the steps the block
+    took when it was executed, so the step count and the safety check are the ones naive execution
+    would give.
+
+    By default every register the program writes is an output, which keeps the final registers
+    identical to naive execution. Registers written but left out of 'outputs' are treated as scratch
+    and keep their old values on a hit.
+    """
+
+    def __init__(self, instructions: Instructions, inputs: Sequence[int], outputs: Sequence[int] = None,
+                 max_entries: int = 4096):
+        """
+        :param instructions: The URM program, using only Z, S, C and J instructions.
+        :param inputs: The registers the result depends on. They must include every register the
+                       program may read before writing it.
+        :param outputs: The registers written back on a hit. Defaults to every register the program writes.
+        :param max_entries: The maximum number of memoised input values, the oldest are dropped first.
+        """
+        self.table = URMSimulator.decode(instructions)
+        for op, a, b, _ in self.table:
+            if op not in (OP_Z, OP_S, OP_C, OP_J):
+                raise ValueError("A function may only contain Z, S, C and J instructions.")
+            if a < 0 or b < 0:
+                raise ValueError("A function cannot use negative register indices.")
+        self.instructions = instructions
+        self.size = instructions.haddr() + 1 if instructions.haddr() is not None else 0
+        self.inputs = tuple(inputs)
+        missing = _live_in(self.table) - set(self.inputs)
+        if missing:
+            raise ValueError(f"Registers {sorted(missing)} are read before being written but are not inputs.")
+        written = sorted({a if op != OP_C else b for op, a, b, _ in self.table if op != OP_J})
+        self.outputs = tuple(written if outputs is None else outputs)
+        # An output left unwritten on some path keeps its old value, so that value is part of the key too.
+        self.key_registers = self.inputs + tuple(sorted(_live_in(self.table, self.outputs) - set(self.inputs)))
+        self.max_entries = max_entries
+        self.memo: Dict[Tuple[int, ...], Tuple[Tuple[int, ...], int]] = {}
+        self.hits = 0
+        self.misses = 0
+        self._prepared = {}
+
+    def __len__(self):
+        return len(self.table)
+
+    def __deepcopy__(self, memo):
+        # Copies of a program share its functions, and with them the memo tables.
+        return self
+
+    def call(self, alloc: Tuple[int, ...]) -> Instructions:
+        """
+        The program relocated to the registers in 'alloc', marked as a call of this function.
+
+        :param alloc: The physical register of each logical register, as for 'reloc'. Must not map
+                      two logical registers to the same physical one.
+        """
+        if len(set(alloc)) != len(alloc):
+            raise ValueError("A function call cannot share registers between its arguments.")
+        block = Instructions.relocation(self.instructions, alloc)
+        block.calls = [(0, self, tuple(alloc))] + block.calls
+        return block
+
+    def clear(self):
+        self.memo.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def _prepare(self, accelerate: bool):
+        if accelerate not in self._prepared:
+            table, loops = self.table, None
+            if accelerate:
+                loops = find_counting_loops(self.instructions)
+                table = tuple((OP_LOOP, a, b, target) if line in loops else (op, a, b, target)
+                              for line, (op, a, b, target) in enumerate(table))
+            table, calls = mark_calls(self.instructions, table, accelerate=accelerate)
+            self._prepared[accelerate] = (table, loops, calls)
+        return self._prepared[accelerate]
+
+    def apply(self, registers: List[int], alloc: Tuple[int, ...], steps_left: int, accelerate: bool = False,
+              budget=None) -> int:
+        """
+        Execute one call of the function on 'registers', in place, and return the steps it took.
+
+        :param steps_left: The steps left before the caller's safety count is exceeded.
+        :param accelerate: Whether counting loops inside the function are accelerated.
+        :param budget: The view of the caller's 'urm.budget.Budget' its calls are checked against, if any.
+        :raises SafetyLimitExceeded: With the steps taken within the call, if they exceed 'steps_left'.
+        :raises RunInterrupted: If the budget stops the call, with the state within the call.
+        """
+        key = tuple(registers[alloc[r]] for r in self.key_registers)
+        entry = self.memo.get(key)
+        # A call that would overrun the steps left is executed again, so it stops where naive execution would.
+        if entry is not None and entry[1] <= steps_left:
+            self.hits += 1
+        else:
+            self.misses += 1
+            table, loops, calls = self._prepare(accelerate)
+            values = [registers[r] for r in alloc]
+            steps = URMSimulator._execute_table(table, values, safety_count=steps_left, loops=loops, calls=calls,
+                                                budget=budget)
+            entry = (tuple(values[r] for r in self.outputs), steps)
+            if len(self.memo) >= self.max_entries:
+                del self.memo[next(iter(self.memo))]
+            self.memo[key] = entry
+        for r, value in zip(self.outputs, entry[0]):
+            registers[alloc[r]] = value
+        return entry[1]
+
+
+def mark_calls(instructions: Instructions, table: Tuple[Tuple[int, int, int, int], ...],
+               accelerate: bool = False) -> Tuple[tuple, Dict[int, tuple]]:
+    """
+    Mark the first line of every memoisable call in 'instructions' with OP_CALL.
+
+    A recorded call is only used if its lines still decode to the function's own instructions
+    under its allocation, with every jump landing inside the block or where the function's own
+    exits go, so instructions edited after composition fall back to plain execution. Where calls
+    start on the same line, the longest one is used.
+
+    :param table: The decoded table to mark, e.g. with counting loops already marked.
+    :param accelerate: Whether the functions accelerate their own counting loops.
+    :return: The marked table and the calls keyed by their first line, as expected by '_execute_table',
+             or the table unchanged and None if there are none.
+    """
+    decoded = URMSimulator.decode(instructions)
+    calls: Dict[int, tuple] = {}
+    resume: Dict[int, int] = {}
+    for start, function, alloc in getattr(instructions, 'calls', []):
+        if start in calls and len(calls[start][0]) >= len(function):
+            continue
+        target = _resume_target(decoded, start, function, alloc)
+        if target is not None:
+            calls[start] = (function, alloc, accelerate)
+            resume[start] = target
+    if not calls:
+        return table, None
+    marked = list(table)
+    for start, target in resume.items():
+        marked[start] = (OP_CALL, 0, 0, target)
+    return tuple(marked), calls
+
+
+def _resume_target(decoded, start: int, function: PureFunction, alloc: Tuple[int, ...]):
+    """
+    The line a call continues from, or None if the block no longer executes as the function.
+
+    Leaving the function through its END line is checked against the safety count inside the call,
+    so only its unchecked exits (jumps past the end) need a matching target in the program. That is
+    the line after the block, or, for a block ending the program, possibly the unchecked exit.
+    """
+    n, m = len(decoded), len(function)
+    if m == 0 or start < 0 or start + m > n or len(alloc) < function.size or len(set(alloc)) != len(alloc):
+        return None
+    exits = set()
+    for line, (op, a, b, target) in enumerate(function.table):
+        actual = decoded[start + line]
+        if actual[0] != op or actual[1] != alloc[a] or (op in (OP_C, OP_J) and actual[2] != alloc[b]):
+            return None
+        if op == OP_J:
+            if target > m:
+                exits.add(actual[3])
+            elif actual[3] != start + target:
+                return None
+    if not exits:
+        return start + m
+    if len(exits) == 1 and (exits == {start + m} or (start + m == n and exits == {n + 1})):
+        return exits.pop()
+    return None
@@ -0,0 +1,241 @@
+"""
+Removal of dead and redundant instructions from URM programs.
+"""
+
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from .urm_simulation import Instructions, InstructionArray, Registers, URMSimulator, SafetyLimitExceeded
+from .urm_simulation import OP_Z, OP_S, OP_C, OP_J
+from .analysis import _successors, _reachable
+
+
+@dataclass
+class OptimizationResult(object):
+    """
+    Store an optimised program with what each pass did to it.
+    """
+    instructions: Instructions
+    changes: Dict[str, int]  # Instructions removed or rewritten, by pass
+    steps: List[Tuple[int, int]] = field(default_factory=list)  # (before, after) for each verification input
+
+
+def _to_instructions(instructions: Sequence[tuple]) -> Instructions:
+    return Instructions(list(instructions))
+
+
+def _jump_target(line: int, n: int) -> int:
+    """
+    The one-based jump target of a decoded target line, as 'decode' reads it back.
+    """
+    if line < n:
+        return line + 1
+    return n + 1 if line == n else 0
+
+
+def _delete(instructions: Sequence[tuple], lines: Iterable[int]) -> List[tuple]:
+    """
+    Remove 'lines', which must fall through to the next line or be unreachable, fixing the jumps.
+
+    A jump to a removed line continues from the next line that is kept, as execution did.
+    """
+    lines = set(lines)
+    n = len(instructions)
+    kept = [line for line in range(n) if line not in lines]
+    remap = [0] * (n + 1)
+    position = len(kept)
+    for line in range(n, -1, -1):
+        if line < n and line not in lines:
+            position -= 1
+        remap[line] = position
+    new_n = len(kept)
+    result = []
+    for line in kept:
+        instruction = instructions[line]
+        if instruction[0] == 'J':
+            q = instruction[3]
+            if 1 <= q <= n + 1:
+                q = remap[q - 1] + 1
+            elif q > n + 1:
+                q = new_n + 2  # Still past the END line, so still leaving without the final check
+            instruction = ('J', instruction[1], instruction[2], q)
+        result.append(instruction)
+    return result
+
+
+def self_copies(instructions: Sequence[tuple]) -> Tuple[List[tuple], int]:
+    """
+    Remove every C(i, i), which leaves the registers unchanged.
+    """
+    lines = [line for line, instruction in enumerate(instructions)
+             if instruction[0] == 'C' and len(instruction) == 3 and instruction[1] == instruction[2]]
+    return _delete(instructions, lines), len(lines)
+
+
+def jumps_to_next(instructions: Sequence[tuple]) -> Tuple[List[tuple], int]:
+    """
+    Remove every jump to the line right after it, which continues there either way.
+    """
+    table = URMSimulator.decode(_to_instructions(instructions))
+    lines = [line for line, (op, _, _, target) in enumerate(table) if op == OP_J and target == line + 1]
+    return _delete(instructions, lines), len(lines)
+
+
+def jump_threading(instructions: Sequence[tuple]) -> Tuple[List[tuple], int]:
+    """
+    Point every jump that lands on an unconditional jump J(k, k, q) straight at the end of the chain.
+    """
+    table = URMSimulator.decode(_to_instructions(instructions))
+    n = len(table)
+    result, changed = list(instructions), 0
+    for line, (op, a, b, target) in enumerate(table):
+        if op != OP_J:
+            continue
+        seen = {line}
+        final = target
+        while final < n and final not in seen and table[final][0] == OP_J and table[final][1] == table[final][2]:
+            seen.add(final)
+            final = table[final][3]
+        if final in seen:
+            final = target  # A cycle of unconditional jumps: keep the original target
+        if final != target:
+            result[line] = ('J', a, b, _jump_target(final, n))
+            changed += 1
+    return result, changed
+
+
+def redundant_zeros(instructions: Sequence[tuple]) -> Tuple[List[tuple], int]:
+    """
+    Remove every Z(r) on a register that is already 0 on every path reaching it.
+    """
+    table = URMSimulator.decode(_to_instructions(instructions))
+    n = len(table)
+    successors = _successors(table)
+    # Registers known to hold 0 when each line is reached; None until a path reaches the line.
+    zero_in: List = [None] * n
+    if n:
+        zero_in[0] = frozenset()
+    pending = [0] if n else []
+    while pending:
+        line = pending.pop()
+        known = zero_in[line]
+        op, a, b, _ = table[line]
+        if op == OP_Z:
+            known = known | {a} if a >= 0 else known
+        elif op == OP_S:
+            known = known - {a} if a >= 0 else frozenset()
+        elif op == OP_C:
+            if b < 0:
+                known = frozenset()
+            else:
+                known = known | {b} if a in known else known - {b}
+        for successor in successors[line]:
+            if successor >= n:
+                continue
+            merged = known if zero_in[successor] is None else zero_in[successor] & known
+            if merged != zero_in[successor]:
+                zero_in[successor] = merged
+                pending.append(successor)
+    lines = [line for line, (op, a, _, _) in enumerate(table)
+             if op == OP_Z and zero_in[line] is not None and a in zero_in[line]]
+    return _delete(instructions, lines), len(lines)
+
+
+def unreachable(instructions: Sequence[tuple]) -> Tuple[List[tuple], int]:
+    """
+    Remove every line no run can reach.
+    """
+    table = URMSimulator.decode(_to_instructions(instructions))
+    reachable = _reachable(_successors(table))
+    lines = [line for line in range(len(table)) if line not in reachable]
+    return _delete(instructions, lines), len(lines)
+
+
+# The passes in the order 'optimize' applies them by default.
+PASSES: Dict[str, Callable[[Sequence[tuple]], Tuple[List[tuple], int]]] = {
+    'self_copies': self_copies,
+    'jumps_to_next': jumps_to_next,
+    'jump_threading': jump_threading,
+    'redundant_zeros': redundant_zeros,
+    'unreachable': unreachable,
+}
+
+
+def _final_registers(instructions: Instructions, param: Dict[int, int], initial_registers: Registers,
+                     safety_count: int):
+    result = URMSimulator.run_fast(param, initial_registers, instructions, safety_count=safety_count)
+    if result.last_registers is None:
+        registers = URMSimulator._prepare_registers(param, initial_registers, instructions)
+        return list(registers.registers), 0
+    return list(result.last_registers.registers), result.num_of_steps
+
+
+def optimize(instructions: Instructions, passes: Sequence[str] = tuple(PASSES), inputs: Iterable[Dict[int, int]] = (),
+             initial_registers: Registers = None, safety_count: int = 1000, max_rounds: int = 8) -> OptimizationResult:
+    """
+    Removes dead and redundant instructions from a URM program.
+
+    The selected passes run in order, repeatedly, until a round changes nothing, since removing
+    code can expose more (e.g. threading a jump leaves its old target unreachable). Every pass keeps
+    the final registers of every run that halts; runs only take fewer steps, so 'num_of_steps' and
+    the point at which the safety count is exceeded may change. Memoised function calls recorded on
+    the program are dropped, since their lines may move.
+
+    :param instructions: An Instructions object representing a URM program.
+    :param passes: Names of the passes to apply, from 'PASSES'.
+    :param inputs: Input dictionaries to check every pass on by differential execution: each input
+                   that halts on the original program must give the same final registers after the
+                   pass. The steps before and after optimisation are reported in the result.
+    :param initial_registers: The registers the inputs are applied to. Defaults to zeroed registers
+                              covering every register used by the instructions.
+    :param safety_count: The maximum number of steps of each verification run.
+    :param max_rounds: The maximum number of times the passes are repeated.
+
+    :return: An OptimizationResult with the optimised program, of the same class as 'instructions'.
+
+    Raises:
+        ValueError: If a pass name is unknown.
+        RuntimeError: If a pass changes the final registers of one of the inputs.
+    """
+    unknown = [name for name in passes if name not in PASSES]
+    if unknown:
+        raise ValueError(f"Unknown optimisation passes: {', '.join(unknown)}")
+    inputs = list(inputs)
+    if initial_registers is None:
+        highest = instructions.haddr()
+        initial_registers = Registers.allocate(highest + 1 if highest is not None else 0)
+
+    # Only the inputs the original program halts on can be compared.
+    expected = []
+    for param in inputs:
+        try:
+            expected.append((param, _final_registers(instructions, param, initial_registers, safety_count)))
+        except (SafetyLimitExceeded, RuntimeError):
+            pass
+
+    current = list(instructions)
+    changes = {name: 0 for name in passes}
+    for _ in range(max_rounds):
+        changed = False
+        for name in passes:
+            optimized, count = PASSES[name](current)
+            if not count:
+                continue
+            program = _to_instructions(optimized)
+            for param, (registers, _) in expected:
+                try:
+                    result, _ = _final_registers(program, param, initial_registers, safety_count)
+                except (SafetyLimitExceeded, RuntimeError) as e:
+                    result = e
+                if result != registers:
+                    raise RuntimeError(f"Optimisation pass '{name}' changed the result for input {param}")
+            current = optimized
+            changes[name] += count
+            changed = True
+        if not changed:
+            break
+
+    program = InstructionArray(current) if isinstance(instructions, InstructionArray) else _to_instructions(current)
+    steps = [(before, _final_registers(program, param, initial_registers, safety_count)[1])
+             for param, (_, before) in expected]
+    return OptimizationResult(instructions=program, changes=changes, steps=steps)
@@ -0,0 +1,158 @@
+"""
+Process-pool execution of one URM program over large input sweeps.
+"""
+
+import os
+from collections import deque
+from collections.abc import Sized
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+
+from .urm_simulation import Instructions, Registers, URMResult, URMSimulator
+
+# Set once per worker process by '_init_worker', so the program is not shipped with every task.
+_worker_state = None
+
+
+def _init_worker(instructions: Instructions, initial_registers: Registers, safety_count: int, trace: bool):
+    global _worker_state
+    _worker_state = (instructions, initial_registers, safety_count, trace)
+
+
+def _run_chunk(chunk: List[Tuple[int, Dict[int, int]]]) -> List[Tuple[int, Union[URMResult, Exception]]]:
+    instructions, initial_registers, safety_count, trace = _worker_state
+    execute = URMSimulator.forward if trace else URMSimulator.run_fast
+    results = []
+    for index, param in chunk:
+        try:
+            result = execute(param, initial_registers, instructions, safety_count=safety_count)
+        except Exception as e:
+            # Keep the failure with its input rather than losing the rest of the chunk.
+            result = e
+        results.append((index, result))
+    return results
+
+
+class ParallelMap(object):
+    """
+    An iterator over the results of 'map_forward', yielding (index, result) pairs.
+
+    'result' is the URMResult of the input at 'index', or the exception its run raised (for example
+    the ValueError of an exceeded safety count). Iterating in order yields the inputs in the order
+    they were given; otherwise they come as their chunks complete. Calling 'cancel', leaving a 'with'
+    block or closing the iteration early drops the chunks that have not started yet.
+
+    The pool starts when iteration begins, and the inputs are read and submitted a chunk at a time,
+    with at most 'max_in_flight' chunks submitted and not yet yielded, so a sweep over a long or
+    unbounded iterable never holds it in memory.
+    """
+
+    def __init__(self, instructions: Instructions, inputs: Iterable[Dict[int, int]], initial_registers: Registers,
+                 safety_count: int, workers: int, chunksize: int, ordered: bool, trace: bool,
+                 max_in_flight: int = None):
+        self.workers = workers or os.cpu_count() or 1
+        if chunksize is None:
+            # Inputs of unknown length are sent in chunks of a fixed size.
+            chunksize = max(1, -(-len(inputs) // (self.workers * 4))) if isinstance(inputs, Sized) else 64
+        if chunksize < 1:
+            raise ValueError("chunksize must be a positive integer")
+        self.max_in_flight = max_in_flight or self.workers * 2
+        if self.max_in_flight < 1:
+            raise ValueError("max_in_flight must be a positive integer")
+        self.chunksize = chunksize
+        self.ordered = ordered
+        self.cancelled = False
+        self._inputs = inputs
+        self._initargs = (instructions, initial_registers, safety_count, trace)
+        self._executor = None
+        self._futures = deque()
+
+    def _chunks(self) -> Iterator[List[Tuple[int, Dict[int, int]]]]:
+        items = enumerate(self._inputs)
+        while True:
+            chunk = list(islice(items, self.chunksize))
+            if not chunk:
+                return
+            yield chunk
+
+    def _submit(self, chunks: Iterator[List[Tuple[int, Dict[int, int]]]]):
+        while len(self._futures) < self.max_in_flight and not self.cancelled:
+            chunk = next(chunks, None)
+            if chunk is None:
+                return
+            self._futures.append(self._executor.submit(_run_chunk, chunk))
+
+    def __iter__(self) -> Iterator[Tuple[int, Union[URMResult, Exception]]]:
+        if self.cancelled or self._executor is not None:
+            return
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             initargs=self._initargs)
+        chunks = self._chunks()
+        try:
+            self._submit(chunks)
+            while self._futures and not self.cancelled:
+                if self.ordered:
+                    future = self._futures.popleft()
+                else:
+                    future = next(iter(wait(self._futures, return_when=FIRST_COMPLETED).done))
+                    self._futures.remove(future)
+                results = future.result()
+                # The next chunk runs while these results are consumed.
+                self._submit(chunks)
+                for item in results:
+                    yield item
+        finally:
+            self.cancel()
+
+    def cancel(self):
+        """
+        Cancel every chunk that has not started and shut the pool down.
+        """
+        if self.cancelled:
+            return
+        self.cancelled = True
+        for future in self._futures:
+            future.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.cancel()
+
+
+def map_forward(instructions: Instructions, inputs: Iterable[Dict[int, int]], initial_registers: Registers = None,
+                safety_count: int = 1000, workers: int = None, chunksize: int = None, ordered: bool = True,
+                trace: bool = False, max_in_flight: int = None) -> ParallelMap:
+    """
+    Executes one URM program over many inputs in a pool of worker processes.
+
+    The program and the initial registers are sent to each worker once, when it starts, and the inputs
+    are dispatched in chunks. Each input runs with the same semantics as 'forward', so the final
+    registers and step counts match the serial path exactly; a run that fails (e.g. by exceeding the
+    safety count) is reported with its input instead of stopping the whole sweep.
+
+    :param instructions: An Instructions object representing the set of URM instructions to be executed.
+    :param inputs: An iterable of dictionaries mapping register indices to input values, one per run.
+    :param initial_registers: A Registers object the inputs are applied to. Defaults to zeroed registers
+                              covering every register used by the instructions.
+    :param safety_count: An integer specifying the maximum number of steps to simulate for each input.
+    :param workers: The number of worker processes. Defaults to the number of CPUs.
+    :param chunksize: The number of inputs sent to a worker at a time. Defaults to about four chunks per worker,
+                      or to 64 inputs if 'inputs' has no length.
+    :param ordered: If True, results are yielded in input order, otherwise as soon as their chunk completes.
+    :param trace: If True, each input runs through 'forward' and keeps its per-step trace, otherwise
+                  through 'run_fast'.
+    :param max_in_flight: The number of chunks submitted ahead of the results being consumed. Defaults to two
+                          per worker.
+
+    :return: A ParallelMap yielding (index, URMResult or exception) pairs.
+    """
+    if initial_registers is None:
+        highest = instructions.haddr()
+        initial_registers = Registers.allocate(highest + 1 if highest is not None else 0)
+    return ParallelMap(instructions, inputs, initial_registers, safety_count=safety_count, workers=workers,
+                       chunksize=chunksize, ordered=ordered, trace=trace, max_in_flight=max_in_flight)
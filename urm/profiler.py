@@ -0,0 +1,154 @@
+"""
+Profiling of URM runs: how often each line runs, each jump is taken and each register is written.
+"""
+
+import json
+from array import array
+from dataclasses import dataclass, asdict
+from typing import Dict, List
+
+from .urm_simulation import Instructions, Registers, URMSimulator
+from .trace import TracePolicy
+from .cycles import backward_jumps
+
+
+@dataclass(frozen=True)
+class HotLoop(object):
+    """
+    The lines from 'start' to 'end', closed by a backward jump on 'end', and the work done in them.
+    """
+    start: int  # Zero-based line jumped back to
+    end: int  # Zero-based line of the backward jump
+    iterations: int  # Times the jump was taken
+    steps: int  # Steps executed on the lines of the loop
+
+
+class Profile(TracePolicy):
+    """
+    A trace policy counting, in arrays indexed by line, how often every line is executed and how often
+    every jump is taken or not, and, indexed by register, how often every register is written.
+
+    No step is kept, so a profile takes memory proportional to the program, not to the run. Pass it
+    as the 'trace' of 'forward', or use 'urm.profile'; when the safety count is exceeded the profile
+    is the 'trace' of the exception, showing where the program was stuck.
+    """
+
+    def __init__(self, instructions: Instructions):
+        super().__init__()
+        self.instructions = instructions
+        n = len(instructions)
+        self.hits = array('q', bytes(8 * n))
+        self.taken = array('q', bytes(8 * n))
+        self.not_taken = array('q', bytes(8 * n))
+        self.writes = array('q')
+        self.num_of_steps = 0
+        self._line = 0
+
+    def start(self, values):
+        n = len(self.instructions)
+        self.hits = array('q', bytes(8 * n))
+        self.taken = array('q', bytes(8 * n))
+        self.not_taken = array('q', bytes(8 * n))
+        self.writes = array('q', bytes(8 * len(values)))
+        self.num_of_steps = 0
+        self._line = 0
+
+    def record(self, step, line, instruction, values):
+        # 'line' is where execution continues; the line executed is the previous one.
+        executed = self._line
+        self.hits[executed] += 1
+        op = instruction[0]
+        if op == 'J':
+            # Jumps write no register, so the values after the step are the ones it compared.
+            if values[instruction[1]] == values[instruction[2]]:
+                self.taken[executed] += 1
+            else:
+                self.not_taken[executed] += 1
+        elif op == 'C':
+            self.writes[instruction[2]] += 1
+        elif op == 'Z' or op == 'S':
+            self.writes[instruction[1]] += 1
+        self._line = line
+        self.num_of_steps = step
+
+    def hot_loops(self) -> List[HotLoop]:
+        """
+        Every loop closed by a backward jump that was taken, the one with the most steps first.
+        """
+        table = URMSimulator.decode(self.instructions)
+        loops = []
+        for end in sorted(backward_jumps(table)):
+            if self.taken[end]:
+                start = table[end][3]
+                loops.append(HotLoop(start=start, end=end, iterations=self.taken[end],
+                                     steps=sum(self.hits[start:end + 1])))
+        return sorted(loops, key=lambda loop: -loop.steps)
+
+    def summary(self) -> str:
+        """
+        A table of the program with the counts of every line, followed by the hot loops and the
+        register writes. Lines are numbered from 1, as in 'Instructions.summary'.
+        """
+        row_format = "{:<5}\t{:<3}\t{:<4}\t{:<4}\t{:<7}\t{:>10}\t{:>6}\t{:>10}\t{:>10}\n"
+        header_line = '-' * 96
+        table = row_format.format("Line", "Op", "Arg1", "Arg2", "Jump To", "Hits", "%", "Taken",
+                                  "Not taken") + header_line + '\n'
+        total = max(self.num_of_steps, 1)
+        for index, instruction in enumerate(self.instructions):
+            args = [''] * 3
+            for i, arg in enumerate(instruction[1:]):
+                args[i] = str(arg)
+            jump = instruction[0] == 'J'
+            table += row_format.format(index + 1, instruction[0], *args, self.hits[index],
+                                       f"{100 * self.hits[index] / total:.1f}",
+                                       self.taken[index] if jump else '', self.not_taken[index] if jump else '')
+        table += header_line + '\n' + f"Steps: {self.num_of_steps}\n"
+        loops = self.hot_loops()
+        if loops:
+            table += "Hot loops:\n"
+            for loop in loops:
+                table += (f"  Lines {loop.start + 1}-{loop.end + 1}: {loop.iterations} iterations, "
+                          f"{loop.steps} steps ({100 * loop.steps / total:.1f}%)\n")
+        table += "Register writes: " + ", ".join(f"R{register}={count}" for register, count in
+                                                 enumerate(self.writes) if count) + '\n'
+        return table
+
+    def to_dict(self) -> Dict:
+        """
+        The profile as JSON-serialisable lists indexed by zero-based line and register. 'heat' is the
+        hit count of each line relative to the most executed one, for overlaying on a listing.
+        """
+        most = max(self.hits, default=0)
+        return {
+            "num_of_steps": self.num_of_steps,
+            "hits": self.hits.tolist(),
+            "taken": self.taken.tolist(),
+            "not_taken": self.not_taken.tolist(),
+            "writes": self.writes.tolist(),
+            "heat": [hits / most if most else 0.0 for hits in self.hits],
+            "hot_loops": [asdict(loop) for loop in self.hot_loops()],
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), separators=(',', ':'))
+
+
+def profile(param: Dict[int, int], initial_registers: Registers, instructions: Instructions,
+            safety_count: int = 1000, budget=None) -> Profile:
+    """
+    Runs a URM program like 'forward' and returns its Profile.
+
+    :param param: A dictionary mapping register indices (int) to their input values (int).
+    :param initial_registers: The initial registers, copied and left unmodified.
+    :param instructions: An Instructions object representing a URM program.
+    :param safety_count: An integer specifying the maximum number of steps to simulate.
+    :param budget: An optional 'urm.budget.Budget' limiting the time the run may take.
+
+    Raises:
+        SafetyLimitExceeded: If the program runs for more than 'safety_count' steps, with the
+                             profile of the steps that ran as its 'trace'.
+    """
+    policy = Profile(instructions)
+    URMSimulator.forward(param, initial_registers, instructions, safety_count=safety_count, trace=policy,
+                         budget=budget)
+    return policy
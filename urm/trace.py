@@ -0,0 +1,628 @@
+"""
+Trace policies deciding which steps of a URM run 'forward' keeps.
+"""
+
+import json
+import mmap
+import struct
+from array import array
+from collections import abc, deque
+from typing import Callable, List, Sequence, Tuple
+
+from .urm_simulation import Registers, URMSimulator
+
+# NumPy is an optional dependency, only needed to read trace files; it is imported by the first TraceFile.
+np = None
+
+
+def _import_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("Reading trace files requires NumPy, install it with 'pip install urm[batch]'.")
+        np = numpy
+    return np
+
+# A recorded step: (step number, line continued from, executed instruction, register values).
+# Step 0 is the initial state, which has no line nor instruction.
+Entry = Tuple[int, int, tuple, tuple]
+
+
+class TraceEntries(abc.Sequence):
+    """
+    A read-only sequence over recorded trace entries, building each item only when it is accessed.
+    """
+
+    def __init__(self, entries: Sequence[Entry], build: Callable):
+        self._entries = entries
+        self._build = build
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._build(entry) for entry in list(self._entries)[index]]
+        return self._build(self._entries[index])
+
+    def __iter__(self):
+        return (self._build(entry) for entry in list(self._entries))
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+def _build_registers(entry: Entry) -> Registers:
+    return Registers(list(entry[3]))
+
+
+def _build_op(entry: Entry) -> str:
+    if entry[0] == 0:
+        return 'Initial'
+    return URMSimulator.format_op(entry[1], entry[2])
+
+
+class TracePolicy(object):
+    """
+    Base class of the trace policies: keeps nothing.
+
+    'forward' calls 'start' with the initial register values, 'record' after every step and 'finish'
+    once the run stops, whether it halted or exceeded its safety count. The register values passed
+    in are live and must be copied if kept. 'start' discards whatever an earlier run recorded, so a
+    policy given to several runs holds the trace of the last one.
+    """
+
+    def __init__(self):
+        self.entries = []
+
+    def start(self, values: List[int]):
+        self.entries = []
+
+    def record(self, step: int, line: int, instruction: tuple, values: List[int]):
+        pass
+
+    def finish(self, values: List[int]):
+        pass
+
+    @property
+    def steps(self) -> List[int]:
+        """
+        The step number of each kept entry, 0 being the initial state.
+        """
+        return [entry[0] for entry in self.entries]
+
+    @property
+    def ops_from_steps(self) -> TraceEntries:
+        return TraceEntries(self.entries, _build_op)
+
+    @property
+    def registers_from_steps(self) -> TraceEntries:
+        return TraceEntries(self.entries, _build_registers)
+
+
+class FullTrace(TracePolicy):
+    """
+    Keep the initial state and every step.
+    """
+
+    def start(self, values):
+        self.entries = [(0, None, None, tuple(values))]
+
+    def record(self, step, line, instruction, values):
+        self.entries.append((step, line, instruction, tuple(values)))
+
+
+class FinalTrace(TracePolicy):
+    """
+    Keep only the last state, the initial one if no step ran.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._last = (0, None, None)
+
+    def start(self, values):
+        self.entries = []
+        self._last = (0, None, None)
+
+    def record(self, step, line, instruction, values):
+        self._last = (step, line, instruction)
+
+    def finish(self, values):
+        self.entries = [self._last + (tuple(values),)]
+
+
+class EveryKTrace(TracePolicy):
+    """
+    Keep the initial state, every k-th step and the last step.
+    """
+
+    def __init__(self, k: int):
+        super().__init__()
+        if not isinstance(k, int) or k < 1:
+            raise ValueError("k must be a positive integer")
+        self.k = k
+        self._last = (0, None, None)
+
+    def start(self, values):
+        self.entries = [(0, None, None, tuple(values))]
+        self._last = (0, None, None)
+
+    def record(self, step, line, instruction, values):
+        self._last = (step, line, instruction)
+        if step % self.k == 0:
+            self.entries.append((step, line, instruction, tuple(values)))
+
+    def finish(self, values):
+        if self.entries[-1][0] != self._last[0]:
+            self.entries.append(self._last + (tuple(values),))
+
+
+class RingTrace(TracePolicy):
+    """
+    Keep the last n states, e.g. to see what led to an exceeded safety count.
+    """
+
+    def __init__(self, n: int):
+        super().__init__()
+        if not isinstance(n, int) or n < 1:
+            raise ValueError("n must be a positive integer")
+        self.n = n
+        self.entries = deque(maxlen=n)
+
+    def start(self, values):
+        self.entries = deque([(0, None, None, tuple(values))], maxlen=self.n)
+
+    def record(self, step, line, instruction, values):
+        self.entries.append((step, line, instruction, tuple(values)))
+
+
+class StreamTrace(TracePolicy):
+    """
+    Keep nothing, but call 'callback(step, registers, op)' for the initial state and every step.
+    """
+
+    def __init__(self, callback: Callable[[int, Registers, str], None]):
+        super().__init__()
+        self.callback = callback
+
+    def start(self, values):
+        self.callback(0, Registers(list(values)), 'Initial')
+
+    def record(self, step, line, instruction, values):
+        self.callback(step, Registers(list(values)), URMSimulator.format_op(line, instruction))
+
+
+class DeltaTrace(TracePolicy):
+    """
+    Keep every step as a compact delta, with a full checkpoint every 'checkpoint_interval' steps.
+
+    A URM instruction changes at most one register, so each step is stored as three integers in
+    arrays: the line execution continues from, the register written (-1 for a jump) and its new value.
+    Indexing the trace rebuilds the registers at any step from the nearest checkpoint before it, in
+    O(checkpoint_interval). Register values must fit in 64 bits.
+    """
+
+    _MAGIC = b'URMD'
+    _VERSION = 1
+
+    def __init__(self, checkpoint_interval: int = 256):
+        super().__init__()
+        if not isinstance(checkpoint_interval, int) or checkpoint_interval < 1:
+            raise ValueError("checkpoint_interval must be a positive integer")
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoints = []
+        self.lines = array('q')
+        self.written = array('q')
+        self.values = array('q')
+        self.instructions = {}  # Executed instruction by line, to rebuild the op strings
+
+    def start(self, values):
+        self.checkpoints = [tuple(values)]
+        self.lines = array('q')
+        self.written = array('q')
+        self.values = array('q')
+        self.instructions = {}
+
+    def record(self, step, line, instruction, values):
+        executed = self.lines[-1] if self.lines else 0
+        self.instructions.setdefault(executed, instruction)
+        op = instruction[0]
+        register = instruction[1] if op in ('Z', 'S') else instruction[2] if op == 'C' else None
+        if step % self.checkpoint_interval == 0:
+            self.checkpoints.append(tuple(values))
+        if register is None:
+            self.written.append(-1)
+            self.values.append(0)
+        else:
+            # Store negative (wrapped) register indices as absolute ones, -1 marks steps writing nothing.
+            register = register + len(values) if register < 0 else register
+            self.written.append(register)
+            self.values.append(values[register])
+        # Appended last: a step only counts once everything needed to replay it is stored, so the
+        # trace can be read from another thread while it is being recorded.
+        self.lines.append(line)
+
+    def __len__(self):
+        return len(self.lines) + 1
+
+    def __getitem__(self, step: int) -> Registers:
+        """
+        The registers after 'step' steps, step 0 being the initial state.
+        """
+        if step < 0:
+            step += len(self)
+        if not 0 <= step < len(self):
+            raise IndexError("trace index out of range")
+        checkpoint = step // self.checkpoint_interval
+        registers = list(self.checkpoints[checkpoint])
+        for i in range(checkpoint * self.checkpoint_interval, step):
+            if self.written[i] != -1:
+                registers[self.written[i]] = self.values[i]
+        return Registers(registers)
+
+    def op(self, step: int) -> str:
+        """
+        The op string of 'step', as 'execute_instructions' reports it.
+        """
+        if step < 0:
+            step += len(self)
+        if step == 0:
+            return 'Initial'
+        executed = self.lines[step - 2] if step > 1 else 0
+        return URMSimulator.format_op(self.lines[step - 1], self.instructions[executed])
+
+    def page(self, offset: int, limit: int) -> Tuple[List[List[int]], List[str]]:
+        """
+        The registers and op strings of steps offset to offset + limit - 1, replayed from step 'offset'.
+        """
+        offset = max(0, offset)
+        stop = min(len(self), offset + max(0, limit))
+        if offset >= stop:
+            return [], []
+        state = self[offset].registers
+        registers, ops = [list(state)], [self.op(offset)]
+        for step in range(offset + 1, stop):
+            if self.written[step - 1] != -1:
+                state[self.written[step - 1]] = self.values[step - 1]
+            registers.append(list(state))
+            ops.append(self.op(step))
+        return registers, ops
+
+    @property
+    def steps(self):
+        return list(range(len(self)))
+
+    @property
+    def ops_from_steps(self) -> TraceEntries:
+        return TraceEntries(range(len(self)), self.op)
+
+    @property
+    def registers_from_steps(self) -> TraceEntries:
+        return TraceEntries(range(len(self)), self.__getitem__)
+
+    @staticmethod
+    def from_trace(trace: TracePolicy, checkpoint_interval: int = 256) -> "DeltaTrace":
+        """
+        Delta-encode a trace that kept every step, such as the default "full" one.
+        """
+        if isinstance(trace, DeltaTrace):
+            return trace
+        if trace.steps != list(range(len(trace.entries))):
+            raise ValueError("Only a trace keeping every step can be delta-encoded")
+        delta = DeltaTrace(checkpoint_interval)
+        delta.start(trace.entries[0][3])
+        for step, line, instruction, values in list(trace.entries)[1:]:
+            delta.record(step, line, instruction, values)
+        return delta
+
+    def save(self, path: str):
+        """
+        Write the trace to a binary file, read back by 'DeltaTrace.load'.
+        """
+        instructions = json.dumps([[line, list(instruction)] for line, instruction in self.instructions.items()])
+        instructions = instructions.encode('utf-8')
+        num_registers = len(self.checkpoints[0])
+        with open(path, 'wb') as f:
+            f.write(self._MAGIC)
+            f.write(struct.pack('<5q', self._VERSION, self.checkpoint_interval, num_registers, len(self.lines),
+                                len(instructions)))
+            f.write(instructions)
+            f.write(array('q', [v for checkpoint in self.checkpoints for v in checkpoint]).tobytes())
+            for column in (self.lines, self.written, self.values):
+                f.write(column.tobytes())
+
+    @staticmethod
+    def load(path: str) -> "DeltaTrace":
+        """
+        Read a trace written by 'DeltaTrace.save'.
+        """
+        with open(path, 'rb') as f:
+            if f.read(4) != DeltaTrace._MAGIC:
+                raise ValueError(f"{path} is not a URM delta trace file")
+            version, interval, num_registers, num_steps, size = struct.unpack('<5q', f.read(40))
+            if version != DeltaTrace._VERSION:
+                raise ValueError(f"Unsupported delta trace version: {version}")
+            delta = DeltaTrace(interval)
+            delta.instructions = {line: tuple(instruction)
+                                  for line, instruction in json.loads(f.read(size).decode('utf-8'))}
+            flat = array('q')
+            flat.frombytes(f.read(8 * num_registers * (num_steps // interval + 1)))
+            delta.checkpoints = [tuple(flat[i:i + num_registers]) for i in range(0, len(flat), num_registers)]
+            for column in (delta.lines, delta.written, delta.values):
+                column.frombytes(f.read(8 * num_steps))
+        return delta
+
+
+class TraceFileWriter(TracePolicy):
+    """
+    Write every step to a binary trace file as it runs, keeping nothing in memory.
+
+    The file holds a header, the initial registers, one fixed-width record of four int64
+    (step, executed line, register written or -1, new value) per step, and the executed instructions
+    as a JSON trailer. Records are buffered and flushed every 'buffer_steps' steps. Read it back
+    with 'TraceFile'; writing needs no NumPy.
+
+    'ops_from_steps' and 'registers_from_steps' read the file through one TraceFile, opened on first
+    access and kept until 'close' or the next run.
+    """
+
+    MAGIC = b'URMT'
+    VERSION = 1
+    HEADER = struct.Struct('<5q')  # version, registers, records, end line, trailer offset
+
+    def __init__(self, path: str, buffer_steps: int = 4096):
+        super().__init__()
+        self.path = path
+        self.buffer_steps = buffer_steps
+        self.num_registers = 0
+        self.num_of_steps = 0
+        self._file = None
+        self._buffer = array('q')
+        self._line = 0
+        self._instructions = {}
+        self._reader = None
+
+    def start(self, values):
+        self.close()
+        self.num_registers = len(values)
+        self.num_of_steps = 0
+        self._buffer = array('q')
+        self._line = 0
+        self._instructions = {}
+        self._file = open(self.path, 'wb')
+        self._file.write(self.MAGIC + self.HEADER.pack(self.VERSION, self.num_registers, 0, 0, 0))
+        self._file.write(array('q', values).tobytes())
+
+    def record(self, step, line, instruction, values):
+        executed, self._line = self._line, line
+        self._instructions.setdefault(executed, instruction)
+        op = instruction[0]
+        register = instruction[1] if op in ('Z', 'S') else instruction[2] if op == 'C' else None
+        if register is None:
+            self._buffer.extend((step, executed, -1, 0))
+        else:
+            register = register + len(values) if register < 0 else register
+            self._buffer.extend((step, executed, register, values[register]))
+        self.num_of_steps = step
+        if len(self._buffer) >= 4 * self.buffer_steps:
+            self._file.write(self._buffer.tobytes())
+            self._buffer = array('q')
+
+    def finish(self, values):
+        self._file.write(self._buffer.tobytes())
+        self._buffer = array('q')
+        trailer_offset = self._file.tell()
+        self._file.write(json.dumps([[line, list(instruction)]
+                                     for line, instruction in self._instructions.items()]).encode('utf-8'))
+        self._file.seek(len(self.MAGIC))
+        self._file.write(self.HEADER.pack(self.VERSION, self.num_registers, self.num_of_steps, self._line,
+                                          trailer_offset))
+        self._file.close()
+
+    @property
+    def steps(self):
+        return list(range(self.num_of_steps + 1))
+
+    @property
+    def file(self) -> "TraceFile":
+        """
+        The TraceFile of the written trace, opened once. Requires NumPy.
+        """
+        if self._reader is None:
+            self._reader = TraceFile(self.path)
+        return self._reader
+
+    @property
+    def ops_from_steps(self) -> TraceEntries:
+        return TraceEntries(range(self.num_of_steps + 1), lambda step: self.file.op(step))
+
+    @property
+    def registers_from_steps(self) -> TraceEntries:
+        return TraceEntries(range(self.num_of_steps + 1), lambda step: self.file[step])
+
+    def close(self):
+        """
+        Close the TraceFile opened to read the trace, if any.
+        """
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class TraceFile(object):
+    """
+    A trace file written by 'TraceFileWriter', memory-mapped rather than loaded.
+
+    'steps', 'lines', 'written' and 'values' are NumPy views over the records, one entry per step, so
+    they can be sliced and searched without reading the whole file. Requires NumPy.
+    """
+
+    def __init__(self, path: str):
+        _import_numpy()
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:4] != TraceFileWriter.MAGIC:
+            raise ValueError(f"{path} is not a URM trace file")
+        header = TraceFileWriter.HEADER
+        version, num_registers, num_records, self.end_line, trailer_offset = header.unpack_from(self._mmap, 4)
+        if version != TraceFileWriter.VERSION:
+            raise ValueError(f"Unsupported trace file version: {version}")
+        offset = 4 + header.size
+        self.initial = np.frombuffer(self._mmap, dtype='<i8', count=num_registers, offset=offset)
+        offset += 8 * num_registers
+        self.records = np.frombuffer(self._mmap, dtype='<i8', count=4 * num_records, offset=offset).reshape(-1, 4)
+        self.steps, self.lines, self.written, self.values = self.records.T
+        self.instructions = {line: tuple(instruction)
+                             for line, instruction in json.loads(self._mmap[trailer_offset:].decode('utf-8'))}
+
+    def __len__(self):
+        return len(self.records) + 1
+
+    def __getitem__(self, step: int) -> Registers:
+        """
+        The registers after 'step' steps, step 0 being the initial state.
+        """
+        return Registers([int(v) for v in self._state(step)])
+
+    def _state(self, step: int) -> "np.ndarray":
+        if step < 0:
+            step += len(self)
+        if not 0 <= step < len(self):
+            raise IndexError("trace index out of range")
+        state = self.initial.copy()
+        written = self.written[:step]
+        for register in range(len(state)):
+            writes = np.flatnonzero(written == register)
+            if writes.size:
+                state[register] = self.values[writes[-1]]
+        return state
+
+    def op(self, step: int) -> str:
+        """
+        The op string of 'step', as 'execute_instructions' reports it.
+        """
+        if step < 0:
+            step += len(self)
+        if step == 0:
+            return 'Initial'
+        line = int(self.lines[step]) if step < len(self.records) else self.end_line
+        return URMSimulator.format_op(line, self.instructions[int(self.lines[step - 1])])
+
+    def page(self, offset: int, limit: int) -> Tuple[List[List[int]], List[str]]:
+        """
+        The registers and op strings of steps offset to offset + limit - 1, replayed from step 'offset'.
+        """
+        offset = max(0, offset)
+        stop = min(len(self), offset + max(0, limit))
+        if offset >= stop:
+            return [], []
+        state = [int(v) for v in self._state(offset)]
+        registers, ops = [list(state)], [self.op(offset)]
+        for step in range(offset + 1, stop):
+            register = int(self.written[step - 1])
+            if register != -1:
+                state[register] = int(self.values[step - 1])
+            registers.append(list(state))
+            ops.append(self.op(step))
+        return registers, ops
+
+    def register_history(self, register: int) -> Tuple["np.ndarray", "np.ndarray"]:
+        """
+        The steps writing 'register' and the values they wrote.
+        """
+        writes = self.written == register
+        return self.steps[writes], self.values[writes]
+
+    def first_step(self, register: int, condition: Callable) -> int:
+        """
+        The first step after which 'condition' holds for 'register', or None.
+
+        :param condition: A vectorised predicate on register values, e.g. lambda v: v > 100.
+        """
+        if condition(self.initial[register:register + 1])[0]:
+            return 0
+        steps, values = self.register_history(register)
+        hits = np.flatnonzero(condition(values))
+        return int(steps[hits[0]]) if hits.size else None
+
+    @property
+    def ops_from_steps(self) -> TraceEntries:
+        return TraceEntries(range(len(self)), self.op)
+
+    @property
+    def registers_from_steps(self) -> TraceEntries:
+        return TraceEntries(range(len(self)), self.__getitem__)
+
+    def close(self):
+        self.initial = self.records = self.steps = self.lines = self.written = self.values = None
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def every_k(k: int) -> EveryKTrace:
+    """
+    A trace policy keeping the initial state, every k-th step and the last step.
+    """
+    return EveryKTrace(k)
+
+
+def ring(n: int) -> RingTrace:
+    """
+    A trace policy keeping the last n states, in constant memory.
+    """
+    return RingTrace(n)
+
+
+def delta(checkpoint_interval: int = 256) -> DeltaTrace:
+    """
+    A trace policy keeping every step as a (line, register, value) delta, with periodic checkpoints.
+    """
+    return DeltaTrace(checkpoint_interval)
+
+
+def to_file(path: str) -> TraceFileWriter:
+    """
+    A trace policy writing every step to the binary trace file 'path', read back with 'TraceFile'.
+    """
+    return TraceFileWriter(path)
+
+
+def stream(callback: Callable[[int, Registers, str], None]) -> StreamTrace:
+    """
+    A trace policy handing every state to 'callback(step, registers, op)' instead of keeping it.
+    """
+    return StreamTrace(callback)
+
+
+_NAMED_POLICIES = {'full': FullTrace, 'none': TracePolicy, 'final': FinalTrace}
+
+
+def trace_policy(trace) -> TracePolicy:
+    """
+    Resolve the 'trace' argument of 'forward' to a trace policy. A name gives a new policy; an instance
+    is returned as is, and its 'start' discards what an earlier run recorded in it.
+
+    :param trace: "full", "none", "final" or a TracePolicy instance.
+    """
+    if trace is None:
+        return TracePolicy()
+    if isinstance(trace, TracePolicy):
+        return trace
+    if trace in _NAMED_POLICIES:
+        return _NAMED_POLICIES[trace]()
+    raise ValueError(f"Unknown trace policy: {trace!r}")
@@ -3,7 +3,8 @@ Created by Jingyu Yan on 2023/12/19.
 """
 
 import copy
-from typing import List, Tuple, Generator, Dict
+from array import array
+from typing import List, Tuple, Generator, Dict, Sequence
 from dataclasses import dataclass
 import time
 from functools import wraps
@@ -43,6 +44,8 @@ class Instructions(object):
     Each instruction in the list is a tuple representing a specific operation in the URM.
     """
 
+    __slots__ = ('instructions', 'calls')
+
     def __init__(self, *inst, ):
         """
         Initializes the Instructions object.
@@ -52,10 +55,13 @@ class Instructions(object):
                      by its arguments. If None is provided, initializes with an empty list.
         """
         self.instructions = list()
+        # Memoisable function calls, as (first line, urm.memo.PureFunction, allocation), see 'urm.memo'.
+        self.calls = list()
         for item in inst:
             if isinstance(item, list):
                 self.instructions += item
             elif isinstance(item, Instructions):
+                self._extend_calls(item, len(self.instructions))
                 self.instructions += item.instructions
             elif isinstance(item, tuple):
                 self.instructions.append(item)
@@ -117,10 +123,14 @@ class Instructions(object):
         if isinstance(item, list):
             self.instructions += item
         elif isinstance(item, Instructions):
+            self._extend_calls(item, len(self.instructions))
             self.instructions += item.instructions
         else:
             self.instructions.append(item)
 
+    def _extend_calls(self, other, offset: int):
+        self.calls += [(line + offset, function, alloc) for line, function, alloc in getattr(other, 'calls', [])]
+
     def haddr(self):
         highest_register = -1
         for instruction in self.instructions:
@@ -133,6 +143,8 @@ class Instructions(object):
 
     @staticmethod
     def normalize(instructions):
+        if isinstance(instructions, InstructionArray):
+            return instructions._normalized()
         normalized_instructions = Instructions()
         for instruction in instructions:
             if instruction[0] == 'J':  # Check if it's a jump instruction
@@ -142,11 +154,14 @@ class Instructions(object):
                 normalized_instructions.append(('J', m, n, k))
             else:
                 normalized_instructions.append(instruction)
+        normalized_instructions._extend_calls(instructions, 0)
 
         return normalized_instructions
 
     @staticmethod
     def concatenation(p1, p2):
+        if isinstance(p1, InstructionArray) and isinstance(p2, InstructionArray):
+            return p1._concatenated(p2)
         if not p1.instructions:  # P is empty
             return Instructions(p2)
         else:
@@ -169,12 +184,17 @@ class Instructions(object):
                     # Non-jump instructions remain the same
                     concatenated.append(instruction)
 
-            return Instructions(concatenated)
+            concatenated = Instructions(concatenated)
+            concatenated._extend_calls(normalized_p1, 0)
+            concatenated._extend_calls(p2, n)
+            return concatenated
 
     @staticmethod
     def relocation(instructions, alloc: Tuple[int]):
         if not isinstance(alloc, tuple) or len(alloc) != instructions.haddr() + 1:
             raise ValueError("invalid allocation")
+        if isinstance(instructions, InstructionArray):
+            return instructions._relocated(alloc)
         relocated_instructions = []
         for i in instructions:
             if i[0] == 'Z' or i[0] == 'S':
@@ -183,7 +203,159 @@ class Instructions(object):
                 relocated_instructions.append((i[0], alloc[i[1]], alloc[i[2]]))
             elif i[0] == 'J':
                 relocated_instructions.append((i[0], alloc[i[1]], alloc[i[2]], i[3]))
-        return Instructions(relocated_instructions)
+        relocated = Instructions(relocated_instructions)
+        relocated.calls = [(line, function, tuple(alloc[r] for r in call_alloc))
+                           for line, function, call_alloc in instructions.calls
+                           if all(0 <= r < len(alloc) for r in call_alloc)]
+        return relocated
+
+
+class InstructionArray(Instructions):
+    """
+    An immutable URM program stored as fixed-width integer columns (opcode, a, b, target).
+
+    It keeps the tuple API of 'Instructions' (indexing, iteration, 'haddr', 'concat', 'reloc',
+    'normalize') while holding each column in a flat array, so a program of any size is four buffers
+    rather than a list of tuples. Since it never changes, copies share the same object, slices are
+    views of the columns without copying them, and the decoded table is built only once.
+    'concatenation', 'relocation' and 'normalize' of InstructionArray programs build the new columns
+    without going through tuples and return InstructionArray programs, sharing the columns they leave
+    unchanged. Both classes define '__slots__', so a program carries no instance dictionary.
+    """
+
+    __slots__ = ('_op', '_a', '_b', '_q', '_haddr', '_table')
+
+    def __init__(self, *inst):
+        """
+        :param inst: The same tuples, lists and Instructions objects 'Instructions' accepts. Only
+                     Z, S, C, J and END instructions can be stored.
+        """
+        program = Instructions(*inst)
+        columns = (array('b'), array('q'), array('q'), array('q'))
+        for line, instruction in enumerate(program):
+            columns[0].append(_OPCODES.get(instruction[0], OP_UNKNOWN))
+            if columns[0][-1] == OP_UNKNOWN or len(instruction) != _ARITY[columns[0][-1]]:
+                raise ValueError(f"Malformed instruction at line {line}: {instruction}")
+            args = tuple(instruction[1:]) + (0,) * (4 - len(instruction))
+            try:
+                for column, arg in zip(columns[1:], args):
+                    column.append(arg)
+            except (TypeError, OverflowError) as e:
+                raise ValueError(f"Malformed instruction at line {line}: {e}")
+        self._set(*(memoryview(column) for column in columns), program.calls)
+
+    def _set(self, op, a, b, q, calls):
+        self._op, self._a, self._b, self._q = op, a, b, q
+        self._haddr = self._table = False
+        self.calls = calls
+
+    @classmethod
+    def _from_columns(cls, op, a, b, q, calls=()):
+        program = cls.__new__(cls)
+        program._set(op, a, b, q, list(calls))
+        return program
+
+    @classmethod
+    def _from_bytes(cls, op, a, b, q, calls):
+        return cls._from_columns(*(memoryview(array(typecode, data)) for typecode, data in
+                                   zip('bqqq', (op, a, b, q))), calls)
+
+    def __reduce__(self):
+        return InstructionArray._from_bytes, (self._op.tobytes(), self._a.tobytes(), self._b.tobytes(),
+                                              self._q.tobytes(), self.calls)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    @property
+    def instructions(self):
+        return list(self)
+
+    def __len__(self):
+        return len(self._op)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return InstructionArray(list(self)[index])
+            return InstructionArray._from_columns(self._op[start:stop], self._a[start:stop], self._b[start:stop],
+                                                  self._q[start:stop])
+        op = self._op[index]
+        return (_OP_NAMES[op], self._a[index], self._b[index], self._q[index])[:_ARITY[op]]
+
+    def __iter__(self):
+        for line in range(len(self)):
+            yield self[line]
+
+    def __setitem__(self, index, value):
+        raise TypeError("InstructionArray programs are immutable.")
+
+    def append(self, item):
+        raise TypeError("InstructionArray programs are immutable.")
+
+    def haddr(self):
+        if self._haddr is False:
+            # Only END lines address no register; the 'b' of Z and S and both operands of END are
+            # stored as 0, which cannot raise the maximum of a program with another instruction.
+            if self._op.tobytes().count(bytes([OP_END])) == len(self):
+                self._haddr = None
+            else:
+                self._haddr = max(max(self._a), max(self._b))
+        return self._haddr
+
+    def _decode(self):
+        if self._table is False:
+            n = len(self)
+            table = []
+            for line, (op, a, b, q) in enumerate(zip(self._op, self._a, self._b, self._q)):
+                if op == OP_J:
+                    if q < 0:
+                        raise ValueError(f"invalid jump target {q}")
+                    table.append((op, a, b, q - 1 if 1 <= q <= n + 1 else n + 1))
+                elif op == OP_END:
+                    table.append((op, 0, 0, line))
+                else:
+                    table.append((op, a, b if op == OP_C else 0, line + 1))
+            self._table = tuple(table)
+        return self._table
+
+    def _normalized(self):
+        n = len(self)
+        q = array('q', [n + 1 if op == OP_J and not 1 <= k <= n else k for op, k in zip(self._op, self._q)])
+        return InstructionArray._from_columns(self._op, self._a, self._b, memoryview(q), self.calls)
+
+    def _concatenated(self, other):
+        if not len(self):
+            return other
+        p1 = self._normalized()
+        n = len(p1)
+        q2 = array('q', [k + n if k != 0 else k for k in other._q])
+        columns = []
+        for typecode, first, second in zip('bqqq', (p1._op, p1._a, p1._b, p1._q), (other._op, other._a, other._b, q2)):
+            column = array(typecode)
+            column.frombytes(memoryview(first).cast('B'))
+            column.frombytes(memoryview(second).cast('B'))
+            columns.append(memoryview(column))
+        concatenated = InstructionArray._from_columns(*columns, p1.calls)
+        concatenated._extend_calls(other, n)
+        return concatenated
+
+    def _relocated(self, alloc: Tuple[int, ...]):
+        # Relocation drops the instructions that are not Z, S, C or J.
+        keep = [line for line, op in enumerate(self._op) if op != OP_END]
+        op = self._op if len(keep) == len(self) else memoryview(array('b', [self._op[line] for line in keep]))
+        a = array('q', [alloc[self._a[line]] for line in keep])
+        b = array('q', [alloc[self._b[line]] if op[i] == OP_C or op[i] == OP_J else 0 for i, line in enumerate(keep)])
+        q = self._q if len(keep) == len(self) else memoryview(array('q', [self._q[line] for line in keep]))
+        relocated = InstructionArray._from_columns(op, memoryview(a), memoryview(b), q)
+        relocated.calls = [(line, function, tuple(alloc[r] for r in call_alloc))
+                           for line, function, call_alloc in self.calls
+                           if all(0 <= r < len(alloc) for r in call_alloc)]
+        return relocated
 
 
 class Registers(object):
@@ -194,6 +366,8 @@ class Registers(object):
     Each register can hold an integer value. The registers are indexed starting from 0.
     """
 
+    __slots__ = ('registers',)
+
     def __init__(self, lis: List[int]):
         """
         Initializes the Registers object with a given list of integers.
@@ -249,15 +423,129 @@ class Registers(object):
         return reg
 
 
+class _SparseValues(dict):
+    """
+    Register values keyed by index, in which registers never written hold 0.
+    """
+    __slots__ = ()
+
+    def __missing__(self, index):
+        return 0
+
+
+class SparseRegisters(Registers):
+    """
+    'SparseRegisters' holds only the registers that have been given a value, in a dictionary.
+
+    Every other register holds 0 and the registers grow to whatever index a program uses, so a program
+    addressing R1000 does not need 1001 allocated registers. 'registers' still returns the dense list,
+    up to the highest register holding a value. 'run' executes directly on the dictionary; 'forward',
+    'execute_instructions' and 'forward_batch' expand it to dense registers first, since they keep
+    every register at every step.
+    """
+
+    __slots__ = ('values',)
+
+    def __init__(self, values: Dict[int, int] = None):
+        """
+        :param values: A dictionary mapping register indices to their initial values.
+
+        :raises ValueError: If an index or a value is not a natural number.
+        """
+        self.values = _SparseValues()
+        for index, value in (values or {}).items():
+            self[index] = value
+
+    @property
+    def registers(self):
+        return [self.values[index] for index in range(len(self))]
+
+    def __reduce__(self):
+        # The 'registers' slot inherited from Registers is hidden by the property, so copies and pickles
+        # are rebuilt from the values alone.
+        return SparseRegisters, (dict(self.values),)
+
+    def __str__(self):
+        return str(dict(sorted(self.values.items())))
+
+    def __getitem__(self, index):
+        return self.values[index]
+
+    def __setitem__(self, index, value):
+        if not isinstance(index, int) or index < 0:
+            raise ValueError("Sparse register indices must be natural numbers")
+        if not isinstance(value, int):
+            raise ValueError("Only integers can be assigned")
+        if value < 0:
+            raise ValueError("An integer greater than 0 must be entered")
+        self.values[index] = value
+
+    def __len__(self):
+        return max(self.values) + 1 if self.values else 0
+
+    def dense(self, num: int = 0) -> Registers:
+        """
+        The same registers as a dense 'Registers' object of at least 'num' registers.
+        """
+        return Registers([self.values[index] for index in range(max(num, len(self)))])
+
+
+OP_Z = 0  # Zero
+OP_S = 1  # Successor
+OP_C = 2  # Copy
+OP_J = 3  # Jump
+OP_END = 4  # Explicit 'END' marker inside a program
+OP_UNKNOWN = 5  # Unrecognised op: counted as a step but never advances
+OP_LOOP = 6  # Exit test of a counting loop, see 'urm.loops'
+OP_CALL = 7  # First line of a memoised function call, see 'urm.memo'
+OP_DIVERGE = 8  # Line from which the program can never halt, see 'urm.analysis'
+OP_WATCH = 9  # Backward jump at which a cycle detector observes the state, see 'urm.cycles'
+
+_OPCODES = {'Z': OP_Z, 'S': OP_S, 'C': OP_C, 'J': OP_J, 'END': OP_END}
+_OP_NAMES = ('Z', 'S', 'C', 'J', 'END')
+_ARITY = (2, 2, 3, 4, 1)  # Length of the instruction tuples, by opcode
+
+
+class SafetyLimitExceeded(ValueError):
+    """
+    Raised when a URM program runs for more steps than its safety count allows.
+
+    'num_of_steps' is the number of steps executed when the limit was hit. When raised by 'forward',
+    'trace' holds the trace policy of the run, e.g. the last states kept by a 'ring' policy.
+    """
+
+    def __init__(self, message: str = "The number of cycles exceeded the safe number.", num_of_steps: int = None,
+                 trace=None):
+        super().__init__(message)
+        self.num_of_steps = num_of_steps
+        self.trace = trace
+
+
 @dataclass
 class URMResult(object):
     """
     Store URM simulator calculation results.
+
+    'ops_from_steps' and 'registers_from_steps' hold the steps kept by the trace policy of the run,
+    built on access; 'trace' is that policy, whose 'steps' gives the step number of each entry.
     """
     num_of_steps: int
-    ops_from_steps: List[str]
-    registers_from_steps: List[Registers]
+    ops_from_steps: Sequence[str]
+    registers_from_steps: Sequence[Registers]
     last_registers: Registers
+    trace: "TracePolicy" = None
+
+    def delta_trace(self, checkpoint_interval: int = 256) -> "DeltaTrace":
+        """
+        The trace of the run in the delta-encoded format of 'urm.trace.DeltaTrace'.
+
+        The run must have kept every step, i.e. used the "full" or a delta trace policy.
+        """
+        from .trace import DeltaTrace
+
+        if self.trace is None:
+            raise ValueError("This result has no trace")
+        return DeltaTrace.from_trace(self.trace, checkpoint_interval)
 
 
 class URMSimulator(object):
@@ -267,7 +555,7 @@ class URMSimulator(object):
     """
 
     @staticmethod
-    def _execute_zero(registers: Registers, n: int) -> Registers:
+    def _execute_zero(registers: List[int], n: int) -> List[int]:
         """
         Set the value of register number n to 0.
         """
@@ -275,7 +563,7 @@ class URMSimulator(object):
         return registers
 
     @staticmethod
-    def _execute_successor(registers: Registers, n: int) -> Registers:
+    def _execute_successor(registers: List[int], n: int) -> List[int]:
         """
         Increment the value of register number n.
         """
@@ -283,7 +571,7 @@ class URMSimulator(object):
         return registers
 
     @staticmethod
-    def _execute_copy(registers: Registers, j: int, k: int) -> Registers:
+    def _execute_copy(registers: List[int], j: int, k: int) -> List[int]:
         """
         Copy the value of register number j to register number k.
         """
@@ -291,7 +579,7 @@ class URMSimulator(object):
         return registers
 
     @staticmethod
-    def _execute_jump(registers: Registers, m: int, n: int, q: int, current_line: int) -> int:
+    def _execute_jump(registers: List[int], m: int, n: int, q: int, current_line: int) -> int:
         """
         Jump to line 'q' if values in registers 'm' and 'n' are equal, else go to the next line.
         """
@@ -300,26 +588,78 @@ class URMSimulator(object):
         else:
             return current_line + 1
 
+    @staticmethod
+    def format_op(line: int, instruction: Tuple) -> str:
+        """
+        Describe an executed instruction the way 'execute_instructions' reports it, e.g. '[3]S(0)'.
+
+        :param line: The zero-based line execution continues from after the instruction.
+        :param instruction: The executed instruction.
+        """
+        return f"[{line}]{instruction[0]}" + "(" + ", ".join(map(str, instruction[1:])) + ")"
+
     @staticmethod
     def execute_instructions(instructions: Instructions, initial_registers: Registers,
-                             safety_count: int = 1000) -> Generator:
+                             safety_count: int = 1000, budget=None) -> Generator:
         """
         Execute a set of URM (Unlimited Register Machine) instructions.
 
         :param instructions: The set of URM instructions to execute.
-        :param initial_registers: The initial state of the registers.
+        :param initial_registers: The initial state of the registers, updated in place. SparseRegisters
+                                  are executed on dense registers covering the program, and every write
+                                  is copied back to them.
         :param safety_count: Maximum number of iterations to prevent infinite loops.
+        :param budget: An optional 'urm.budget.Budget' limiting the time the run may take.
         :return: Generator yielding the state of the registers after each instruction.
         """
-        registers = initial_registers
-        exec_instructions = copy.deepcopy(instructions)
+        if not isinstance(initial_registers, SparseRegisters):
+            for line, instruction in URMSimulator._steps(instructions, initial_registers, safety_count, budget):
+                yield copy.deepcopy(initial_registers), URMSimulator.format_op(line, instruction)
+            return
+        sparse = initial_registers
+        highest = instructions.haddr()
+        registers = sparse.dense(highest + 1 if highest is not None else 0)
+        for line, instruction in URMSimulator._steps(instructions, registers, safety_count, budget):
+            if instruction[0] in ('Z', 'S', 'C'):
+                written = instruction[2] if instruction[0] == 'C' else instruction[1]
+                sparse[written] = registers[written]
+            yield copy.deepcopy(sparse), URMSimulator.format_op(line, instruction)
+
+    @staticmethod
+    def _steps(instructions: Instructions, initial_registers: Registers, safety_count: int = 1000,
+               budget=None, start: Tuple[int, int] = (0, 0)) -> Generator:
+        """
+        Execute a set of URM instructions, modifying 'initial_registers' in place. They must be dense:
+        the list of SparseRegisters is a copy.
+
+        :param budget: An optional 'urm.budget.Budget', checked every 'budget.interval' steps.
+        :param start: The line to start from and the number of steps already executed, as for
+                      '_execute_table'.
+
+        :return: Generator yielding, after each instruction, the line execution continues from and the
+                 executed instruction. The registers are not copied.
+        """
+        if isinstance(initial_registers, SparseRegisters):
+            raise TypeError("SparseRegisters must be expanded with 'dense' before they are stepped through.")
+        # Z, S and C can only ever store natural numbers, so the values are written directly instead of
+        # through the validating 'Registers.__setitem__'.
+        registers = initial_registers.registers
+        # The instruction tuples are immutable, so a shallow copy is enough to append the END marker.
+        exec_instructions = list(instructions)
         exec_instructions.append(('END',))
-        current_line = 0
-        count = 0
+        current_line, count = start
+        # The budget is checked when the count passes 'limit', so a run without one pays nothing for it.
+        limit = safety_count
+        if budget is not None:
+            budget.start()
+            limit = min(safety_count, count + budget.interval)
 
         while current_line < len(exec_instructions):
-            if count > safety_count:
-                raise ValueError("The number of cycles exceeded the safe number.")
+            if count > limit:
+                if count > safety_count:
+                    raise SafetyLimitExceeded(num_of_steps=count)
+                budget.check(count, current_line, registers)
+                limit = min(safety_count, count + budget.interval)
 
             instruction = exec_instructions[current_line]
             op = instruction[0]
@@ -344,11 +684,153 @@ class URMSimulator(object):
             except Exception as e:
                 raise RuntimeError(f"Error executing instruction at line {current_line}: {e}")
 
-            yield copy.deepcopy(registers), f"[{current_line}]{op}" + "(" + ", ".join(map(str, instruction[1:])) + ")"
+            yield current_line, instruction
 
     @staticmethod
-    def forward(param: Dict[int, int], initial_registers: Registers, instructions: Instructions,
-                safety_count: int = 1000) -> URMResult:
+    def decode(instructions: Instructions) -> Tuple[Tuple[int, int, int, int], ...]:
+        """
+        Pre-decode a set of URM instructions into a flat table of integer tuples.
+
+        Each entry is (opcode, a, b, target), where 'target' is the absolute index of the line to
+        continue from (the next line for Z, S and C, the jump destination for J). Index n is the
+        implicit END line and index n + 1 leaves the program without a final safety check, which is
+        exactly how 'execute_instructions' treats jumps to 0 or past the end.
+
+        :param instructions: The set of URM instructions to decode.
+        :return: A tuple of (opcode, a, b, target) entries, one per instruction.
+        """
+        if isinstance(instructions, InstructionArray):
+            return instructions._decode()
+        n = len(instructions)
+        table = []
+        for line, instruction in enumerate(instructions):
+            op = _OPCODES.get(instruction[0], OP_UNKNOWN)
+            try:
+                if op == OP_Z or op == OP_S:
+                    table.append((op, instruction[1], 0, line + 1))
+                elif op == OP_C:
+                    table.append((op, instruction[1], instruction[2], line + 1))
+                elif op == OP_J:
+                    q = instruction[3]
+                    if q < 0:
+                        raise ValueError(f"invalid jump target {q}")
+                    target = q - 1 if 1 <= q <= n + 1 else n + 1
+                    table.append((op, instruction[1], instruction[2], target))
+                else:
+                    table.append((op, 0, 0, line))
+            except (IndexError, TypeError) as e:
+                raise ValueError(f"Malformed instruction at line {line}: {e}")
+        return tuple(table)
+
+    @staticmethod
+    def _execute_table(table: Tuple[Tuple[int, int, int, int], ...], registers: List[int],
+                       safety_count: int = 1000, loops: Dict = None, calls: Dict = None, detector=None,
+                       budget=None, start: Tuple[int, int] = (0, 0)) -> int:
+        """
+        Run a decoded instruction table over a plain list of register values, in place.
+
+        No registers are copied, validated or formatted on the way; only the step count is kept.
+
+        :param table: The decoded instructions, as returned by 'decode'.
+        :param registers: The register values, modified in place.
+        :param safety_count: Maximum number of iterations to prevent infinite loops.
+        :param loops: The counting loops of the table keyed by the line of their exit test, for
+                      the lines marked with OP_LOOP.
+        :param calls: The memoised function calls of the table keyed by their first line, as
+                      (function, allocation, accelerate) tuples, for the lines marked with OP_CALL.
+        :param detector: The 'urm.cycles.CycleDetector' observing the state at the lines marked with OP_WATCH.
+        :param budget: An optional 'urm.budget.Budget', checked every 'budget.interval' steps.
+        :param start: The line to start from and the number of steps already executed, e.g. as saved
+                      in a 'urm.checkpoint.Checkpoint'.
+        :return: The number of steps executed, those before 'start' included.
+        """
+        n = len(table)
+        pc, count = start
+        limit = safety_count
+        # Calls only ever see a view of the budget, and a call it stops is reported as stopped before the call.
+        call_budget, interrupted = None, ()
+        if budget is not None:
+            budget.start()
+            limit = min(safety_count, count + budget.interval)
+            if calls:
+                from .budget import RunInterrupted, _CallBudget
+                call_budget, interrupted = _CallBudget(budget), RunInterrupted
+        try:
+            while pc < n:
+                if count > limit:
+                    if count > safety_count:
+                        raise SafetyLimitExceeded(num_of_steps=count)
+                    budget.check(count, pc, registers)
+                    limit = min(safety_count, count + budget.interval)
+                op, a, b, target = table[pc]
+                if op == OP_S:
+                    registers[a] += 1
+                    pc = target
+                elif op == OP_J:
+                    pc = target if registers[a] == registers[b] else pc + 1
+                elif op == OP_Z:
+                    registers[a] = 0
+                    pc = target
+                elif op == OP_C:
+                    registers[b] = registers[a]
+                    pc = target
+                elif op == OP_LOOP:
+                    if registers[a] == registers[b]:
+                        pc = target
+                    else:
+                        # Skip every remaining iteration at once; the safety check at the top of
+                        # the loop then sees the same step count naive execution would reach. A skip
+                        # past the safety count stops where naive execution would first exceed it.
+                        loop = loops[pc]
+                        iterations = loop.iterations(registers[loop.counter], registers[loop.bound])
+                        if iterations is None or count + iterations * loop.length > safety_count:
+                            raise SafetyLimitExceeded(num_of_steps=max(count, safety_count + 1))
+                        for register, increment in loop.increments:
+                            registers[register] += iterations * increment
+                        count += iterations * loop.length
+                        continue
+                elif op == OP_CALL:
+                    function, alloc, accelerate = calls[pc]
+                    try:
+                        count += function.apply(registers, alloc, safety_count - count, accelerate, call_budget)
+                    except SafetyLimitExceeded as e:
+                        raise SafetyLimitExceeded(num_of_steps=count + e.num_of_steps)
+                    except interrupted:
+                        # Stopped at the call's first line, with the run's state, where it can be resumed from.
+                        budget.check(count, pc, registers)
+                        raise
+                    pc = target
+                    continue
+                elif op == OP_END:
+                    return count
+                elif op == OP_DIVERGE:
+                    # Every step from here on is counted one by one, so the count first exceeded is this.
+                    raise SafetyLimitExceeded(num_of_steps=safety_count + 1)
+                elif op == OP_WATCH:
+                    detector.observe(count, pc, registers)
+                    pc = target if registers[a] == registers[b] else pc + 1
+                elif op == OP_UNKNOWN and detector is not None:
+                    # Never advances, so it closes a cycle as a jump to itself would.
+                    detector.observe(count, pc, registers)
+                count += 1
+        except IndexError as e:
+            raise RuntimeError(f"Error executing instruction at line {pc}: {e}")
+        if pc == n and count > safety_count:
+            raise SafetyLimitExceeded(num_of_steps=count)
+        return count
+
+    @staticmethod
+    def _prepare_registers(param: Dict[int, int], initial_registers: Registers,
+                           instructions: Instructions, sparse: bool = False) -> Registers:
+        """
+        Copy the initial registers, apply the input parameters and check the register count.
+
+        :param sparse: If True, SparseRegisters are kept as they are and grow as needed, otherwise
+                       they are expanded to dense registers covering every register of the program.
+        """
+        if isinstance(initial_registers, SparseRegisters) and not sparse:
+            highest = instructions.haddr()
+            initial_registers = initial_registers.dense(highest + 1 if highest is not None else 0)
         registers = copy.deepcopy(initial_registers)
         if isinstance(param, dict):
             for key, value in param.items():
@@ -362,24 +844,97 @@ class URMSimulator(object):
                     raise ValueError("Input Index must be a natural number")
                 registers[key] = value
 
-        registers_list = [copy.deepcopy(registers), ]
-        ops_info = ['Initial']
-        if len(registers) < instructions.haddr():
+        if isinstance(registers, SparseRegisters):
+            if any(op <= OP_J and (a < 0 or b < 0) for op, a, b, _ in URMSimulator.decode(instructions)):
+                raise ValueError("Sparse registers cannot be addressed with negative indices.")
+        elif instructions.haddr() is not None and len(registers) < instructions.haddr():
             raise ValueError("The number of registers requested cannot satisfy this set of instructions.")
-        gen = URMSimulator.execute_instructions(instructions=instructions, initial_registers=registers,
-                                                safety_count=safety_count)
+        return registers
+
+    @staticmethod
+    def forward(param: Dict[int, int], initial_registers: Registers, instructions: Instructions,
+                safety_count: int = 1000, trace="full", detect_cycles: bool = False, budget=None) -> URMResult:
+        from .budget import RunInterrupted
+        from .trace import trace_policy
+
+        policy = trace_policy(trace)
+        registers = URMSimulator._prepare_registers(param, initial_registers, instructions)
+        policy.start(registers.registers)
+        gen = URMSimulator._steps(instructions=instructions, initial_registers=registers, safety_count=safety_count,
+                                  budget=budget)
         num_of_steps = 0
-        last_registers = None
-        for registers_moment, command in gen:
-            num_of_steps += 1
-            ops_info.append(command)
-            registers_list.append(registers_moment)
-            last_registers = registers_moment
-        result = URMResult(ops_from_steps=ops_info, registers_from_steps=registers_list, last_registers=last_registers,
-                           num_of_steps=num_of_steps)
+        watched, detector = (), None
+        if detect_cycles:
+            from .cycles import CycleDetector, backward_jumps
+            # The states are observed where '_execute_table' observes them: before a backward jump runs,
+            # once it has passed the safety check.
+            watched, detector = backward_jumps(URMSimulator.decode(instructions)), CycleDetector()
+            if 0 in watched:
+                detector.observe(0, 0, registers.registers)
+        try:
+            for line, instruction in gen:
+                num_of_steps += 1
+                policy.record(num_of_steps, line, instruction, registers.registers)
+                if line in watched and num_of_steps <= safety_count:
+                    detector.observe(num_of_steps, line, registers.registers)
+        except (SafetyLimitExceeded, RunInterrupted) as e:
+            e.trace = policy
+            raise
+        finally:
+            policy.finish(registers.registers)
+        last_registers = copy.deepcopy(registers) if num_of_steps > 0 else None
+        result = URMResult(ops_from_steps=policy.ops_from_steps, registers_from_steps=policy.registers_from_steps,
+                           last_registers=last_registers, num_of_steps=num_of_steps, trace=policy)
 
         return result
 
+    @staticmethod
+    def run_fast(param: Dict[int, int], initial_registers: Registers, instructions: Instructions,
+                 safety_count: int = 1000, accelerate: bool = False, memoize: bool = False,
+                 detect_cycles: bool = False, budget=None, start: Tuple[int, int] = (0, 0)) -> URMResult:
+        """
+        Execute a set of URM instructions without tracing the individual steps.
+
+        The instructions are decoded once and run over a plain list of integers, so no registers
+        are copied and no op strings are built per step. The final registers and the step count
+        are identical to 'forward'; the per-step lists of the result are left empty.
+
+        With 'accelerate', counting loops found by 'urm.loops.find_counting_loops' are collapsed
+        into a single addition per register instead of being stepped through. With 'memoize', calls
+        of 'urm.memo.PureFunction' blocks are looked up in the function's memo table. SparseRegisters
+        are run on their dictionary of values, in which unwritten registers read as 0. With
+        'detect_cycles', the state is observed by a 'urm.cycles.CycleDetector' at every backward jump.
+        'start' continues a run from a line and step count instead of its beginning, see 'urm.checkpoint'.
+        """
+        registers = URMSimulator._prepare_registers(param, initial_registers, instructions, sparse=True)
+        table = URMSimulator.decode(instructions)
+        sparse = isinstance(registers, SparseRegisters)
+        values = registers.values if sparse else list(registers.registers)
+        loops = None
+        if accelerate:
+            from .loops import find_counting_loops
+            # Loops touching registers that do not exist are left to fail naively, on the right line.
+            loops = {line: loop for line, loop in find_counting_loops(instructions).items()
+                     if sparse or all(register < len(values) for register in loop.registers())}
+            table = tuple((OP_LOOP, a, b, target) if line in loops else (op, a, b, target)
+                          for line, (op, a, b, target) in enumerate(table))
+        calls = None
+        if memoize:
+            from .memo import mark_calls
+            table, calls = mark_calls(instructions, table, accelerate=accelerate)
+        detector = None
+        if detect_cycles:
+            from .cycles import CycleDetector, watch_table
+            table, detector = watch_table(table), CycleDetector()
+        num_of_steps = URMSimulator._execute_table(table, values, safety_count=safety_count, loops=loops,
+                                                   calls=calls, detector=detector, budget=budget, start=start)
+        if sparse:
+            last_registers = registers if num_of_steps > 0 else None
+        else:
+            last_registers = Registers(values) if num_of_steps > 0 else None
+        return URMResult(ops_from_steps=[], registers_from_steps=[], last_registers=last_registers,
+                         num_of_steps=num_of_steps)
+
 
 def urm_op(func):
     """
@@ -494,7 +1049,8 @@ def allocate(num: int) -> Registers:
 
 
 def forward(param: Dict[int, int], initial_registers: Registers, instructions: Instructions,
-            safety_count: int = 1000) -> URMResult:
+            safety_count: int = 1000, trace="full", cache=None, detect_cycles: bool = False,
+            budget=None) -> URMResult:
     """
     Executes a URM (Unlimited Register Machine) simulation with given parameters, initial registers, and instructions.
 
@@ -509,6 +1065,17 @@ def forward(param: Dict[int, int], initial_registers: Registers, instructions: I
     :param instructions: An Instructions object representing the set of URM instructions to be executed.
     :param safety_count: An integer specifying the maximum number of steps to simulate.
                          This prevents infinite loops in the simulation.
+    :param trace: Which steps to keep: "full" (every step, the default), "none", "final", or a policy
+                  from 'urm.trace' such as every_k(k), ring(n) or stream(callback). Memory use is
+                  constant in the number of steps for every policy but "full" and every_k.
+    :param cache: An optional 'urm.cache.ResultCache'. A run already in the cache is returned from it
+                  without being executed again; only the "full", "final" and "none" policies can be cached.
+    :param detect_cycles: If True, the run stops with 'urm.cycles.NonTerminating' as soon as it reaches
+                          a state, line and registers, it has already been in, and so would never halt.
+                          The states are only compared at backward jumps, with Brent's algorithm, so a
+                          large 'safety_count' can be used without a stuck program running up to it.
+    :param budget: An optional 'urm.budget.Budget' bounding the wall-clock time of the run and stopping it
+                   when its CancellationToken is cancelled, checked every 'budget.interval' steps.
 
     :return: An URMResult object that contains information about the simulation,
              including the number of steps executed, the operations performed in each step,
@@ -518,6 +1085,52 @@ def forward(param: Dict[int, int], initial_registers: Registers, instructions: I
         AssertionError: If the input parameters are not a dictionary with integer keys and values,
                         or if the initial values are not non-negative integers,
                         or if the number of registers is insufficient for the given instructions.
+        SafetyLimitExceeded: If the program runs for more than 'safety_count' steps. The exception
+                             carries the trace policy, so a 'ring' keeps the states leading up to it.
+        NonTerminating: With 'detect_cycles', if the program provably never halts; a SafetyLimitExceeded
+                        naming the step at which the repeated state was first reached.
+        RunInterrupted: If the budget stops the run, as a RunTimeout or a RunCancelled carrying the step
+                        count, line, registers and trace policy at that point. Such runs are never cached.
     """
+    if cache is not None:
+        return cache.forward(param=param, initial_registers=initial_registers, instructions=instructions,
+                             safety_count=safety_count, trace=trace, detect_cycles=detect_cycles, budget=budget)
     return URMSimulator.forward(param=param, initial_registers=initial_registers, instructions=instructions,
-                                safety_count=safety_count)
+                                safety_count=safety_count, trace=trace, detect_cycles=detect_cycles, budget=budget)
+
+
+def run(param: Dict[int, int], initial_registers: Registers, instructions: Instructions,
+        safety_count: int = 1000, accelerate: bool = False, memoize: bool = False, cache=None,
+        detect_cycles: bool = False, budget=None) -> URMResult:
+    """
+    Executes a URM simulation on the fast path, returning only the final registers and the step count.
+
+    The instructions are pre-decoded into an integer opcode table and executed over a plain list of
+    register values, skipping the per-step register copies and op strings that 'forward' records.
+    Use it when only the outcome of a run matters; the result is identical to that of 'forward'
+    except that 'ops_from_steps' and 'registers_from_steps' are empty.
+
+    :param param: A dictionary mapping register indices (int) to their input values (int).
+    :param initial_registers: A Registers object representing the initial state of all registers.
+                              It is copied and left unmodified. SparseRegisters are executed on as they
+                              are, growing to any register the program uses, and returned sparse.
+    :param instructions: An Instructions object representing the set of URM instructions to be executed.
+    :param safety_count: An integer specifying the maximum number of steps to simulate.
+    :param accelerate: If True, counting loops (see 'urm.loops') are jumped over in one go. The number
+                       of steps reported is still the one naive execution would have taken.
+    :param memoize: If True, calls of functions marked with 'urm.memo.PureFunction' reuse the outputs and
+                    step counts of earlier calls on the same inputs instead of executing again.
+    :param cache: An optional 'urm.cache.ResultCache' to look the run up in before executing it.
+    :param detect_cycles: If True, a run reaching a state it has already been in stops at once with
+                          'urm.cycles.NonTerminating', as for 'forward'.
+    :param budget: An optional 'urm.budget.Budget' limiting the time the run may take, as for 'forward'.
+
+    :return: An URMResult object holding the number of steps executed and the final state of the registers.
+    """
+    if cache is not None:
+        return cache.run(param=param, initial_registers=initial_registers, instructions=instructions,
+                         safety_count=safety_count, accelerate=accelerate, memoize=memoize,
+                         detect_cycles=detect_cycles, budget=budget)
+    return URMSimulator.run_fast(param=param, initial_registers=initial_registers, instructions=instructions,
+                                 safety_count=safety_count, accelerate=accelerate, memoize=memoize,
+                                 detect_cycles=detect_cycles, budget=budget)